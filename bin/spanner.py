@@ -3,6 +3,7 @@
 import os
 import sys
 import argparse
+import importlib
 import logging
 import inspect
 import warnings
@@ -13,8 +14,6 @@ import pandas.core.common as com
 from dateutil.parser import parse as _parse_date
 
 from span.spanner.db import Db, DbCreator, DbReader, DbUpdater, DbDeleter
-from span.spanner.analyzer import CorrelationAnalyzer, _parse_artifact_ranges
-from span.spanner.converters import Converter
 from span.spanner.utils import _init_db
 from span.spanner.defaults import SPAN_DB
 
@@ -23,6 +22,16 @@ def _find_below_common_data_path(path, common_data_path):
     pass
 
 
+def _lazy_run(module_name, class_name):
+    """Return a function that runs a command, importing its module (and
+    everything that module needs) only if the command is actually run.
+    """
+    def run(args):
+        module = importlib.import_module(module_name)
+        return getattr(module, class_name)().run(args)
+    return run
+
+
 def build_analyze_parser(subparsers):
     def build_correlation_parser(subparsers):
         parser = subparsers.add_parser('correlation', help='perform cross '
@@ -41,8 +50,8 @@ def build_analyze_parser(subparsers):
         xcorr = parser.add_argument_group('cross correlation')
         cleaning.add_argument('-c', '--remove-first-pc', action='store_true',
                               help='remove the first principal component of '
-                              'the data. warning: this drastically slows down '
-                              'the analysis')
+                              'the data, computed in a streaming pass over '
+                              'the channel covariance')
         cleaning.add_argument('-S', '--store-h5', action='store_true',
                               help='store the raw data in HDF5 format for '
                               'later use')
@@ -89,7 +98,8 @@ def build_analyze_parser(subparsers):
         xcorr.add_argument(
             '-k', '--keep-auto', action='store_true', help='keep the '
             'autocorrelation values')
-        parser.set_defaults(run=CorrelationAnalyzer().run)
+        parser.set_defaults(run=_lazy_run('span.spanner.analyzer',
+                                           'CorrelationAnalyzer'))
 
     parser = subparsers.add_parser('analyze', help='perform an analysis on a '
                                    'TDT tank file')
@@ -104,6 +114,7 @@ class DateParseAction(argparse.Action):
 
 class ArtifactRangesAction(argparse.Action):
     def __call__(self, parser, namespace, values, option_string=None):
+        from span.spanner.analyzer import _parse_artifact_ranges
         setattr(namespace, self.dest, _parse_artifact_ranges(values))
 
 
@@ -135,7 +146,8 @@ def build_convert_parser(subparsers):
                         ' data set, default: gz', choices=('gz', 'bz2'))
     parser.add_argument('-R', '--order', default='C',
                         help='memory layout of underlying array')
-    parser.set_defaults(run=Converter().run)
+    parser.set_defaults(run=_lazy_run('span.spanner.converters',
+                                       'Converter'))
 
 
 def build_db_parser(subparsers):
@@ -18,7 +18,81 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 
-from span.tdt import *
-from span.utils import *
-from span.xcorr import *
-from span.stats import *
+"""Spike train analysis.
+
+The names exported by the subpackages are available directly from
+:mod:`span`, but a subpackage is only imported the first time one of its names
+is accessed. This keeps ``import span`` cheap for tools that only need a
+small part of the package.
+"""
+
+import importlib
+import sys
+import types
+
+
+# keep these in sync with the __all__ of each subpackage
+_EXPORTS = {
+    'span.tdt': ('SpikeDataFrame', 'spike_xcorr', 'TdtDataTypes',
+                 'PandasTank', 'TdtTank', 'ElectrodeMap', 'TdtEventTypes',
+                 'NeuroNexusMap', 'build_catalog', 'find_tanks',
+                 'SpikeTrains'),
+    'span.utils': ('name2num', 'ndtuples', 'iscomplex', 'get_fft_funcs',
+                   'isvector', 'assert_nonzero_existing_file', 'clear_refrac',
+                   'ispower2', 'thunkify', 'detrend_none', 'detrend_mean',
+                   'detrend_linear', 'cartesian', 'nextpow2',
+                   'samples_per_ms', 'compose', 'compose2', 'composemap',
+                   'num2name', 'create_repeating_multi_index', 'OrderedDict',
+                   '_diag_inds_n', 'LOCAL_TZ', 'remove_first_pc', 'bold',
+                   'randcolors', 'red', 'blue', 'green', 'magenta', 'white',
+                   'yellow', 'puts', 'remove_first_pc_streaming',
+                   'first_pc_threshold', 'mask_first_pc', 'bin_samples',
+                   'bin_samples_multi', 'bin_spikes', 'bin_spikes_multi'),
+    'span.xcorr': ('xcorr',),
+    'span.stats': ('cch_perm',),
+}
+
+_SUBPACKAGES = 'tdt', 'utils', 'xcorr', 'stats', 'testing', 'spanner'
+
+_ATTRIBUTES = dict((name, module) for module, names in _EXPORTS.items()
+                   for name in names)
+
+__all__ = tuple(sorted(_ATTRIBUTES))
+
+
+class _LazyModule(types.ModuleType):
+    """Module that imports the subpackage defining an attribute on first
+    access.
+    """
+    def __getattr__(self, name):
+        try:
+            module_name = _ATTRIBUTES[name]
+        except KeyError:
+            if name in _SUBPACKAGES:
+                return importlib.import_module('{0}.{1}'.format(__name__,
+                                                                name))
+            raise AttributeError('module {0!r} has no attribute '
+                                 '{1!r}'.format(__name__, name))
+
+        value = getattr(importlib.import_module(module_name), name)
+        setattr(self, name, value)
+        return value
+
+    def __setattr__(self, name, value):
+        # importing a subpackage binds it here, but a name exported by that
+        # subpackage wins (span.xcorr is the function, not the package)
+        if (name in _ATTRIBUTES and isinstance(value, types.ModuleType) and
+                value.__name__ == _ATTRIBUTES[name]):
+            value = getattr(value, name)
+        super(_LazyModule, self).__setattr__(name, value)
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(_ATTRIBUTES) |
+                      set(_SUBPACKAGES))
+
+
+# hold a reference to the original module so that its globals aren't cleared
+_lazy = _LazyModule(__name__)
+_lazy.__dict__.update(sys.modules[__name__].__dict__)
+_lazy._module = sys.modules[__name__]
+sys.modules[__name__] = _lazy
@@ -67,33 +67,57 @@ def _parse_artifact_ranges(s):
     return [_colon_to_slice(spl) for spl in split]
 
 
-def get_xcorr(sp, threshold, sd, binsize='S', how='sum',
-              firing_rate_threshold=1.0, refractory_period=2, nan_auto=True,
-              detrend='mean', scale_type='normalize', which_lag=0):
-    thr = sp.threshold(threshold * sd)
-    thr.clear_refrac(refractory_period, inplace=True)
-
-    binned = thr.resample(binsize, how=how)
+def _xcorr_binned(sp, binned, threshold, firing_rate_threshold=1.0,
+                  nan_auto=True, detrend='mean', scale_type='normalize',
+                  which_lag=0):
     binned.loc[:, binned.mean() < firing_rate_threshold] = np.nan
 
-    xc = thr.xcorr(binned, detrend=getattr(span, 'detrend_' + detrend),
-                   scale_type=scale_type, nan_auto=nan_auto)
+    # xc(j, i) at lag k is the conjugate of xc(i, j) at lag -k, so only at
+    # lag 0 does the lower triangle of pairs repeat the upper one
+    pairs = 'upper' if which_lag == 0 else 'all'
+    xc = sp.xcorr(binned, detrend=getattr(span, 'detrend_' + detrend),
+                  scale_type=scale_type, nan_auto=nan_auto, lags=[which_lag],
+                  pairs=pairs)
     s = xc.loc[which_lag]
     s.name = threshold
     return s
 
 
+def get_xcorr(sp, threshold, sd, binsize='S', how='sum',
+              firing_rate_threshold=1.0, refractory_period=2, nan_auto=True,
+              detrend='mean', scale_type='normalize', which_lag=0):
+    if how == 'sum':
+        binned = sp.bin_spikes(threshold * sd, binsize, refractory_period)
+    else:
+        thr = sp.threshold(threshold * sd)
+        thr.clear_refrac(refractory_period, inplace=True)
+        binned = thr.bin(binsize, how=how)
+
+    return _xcorr_binned(sp, binned, threshold, firing_rate_threshold,
+                         nan_auto, detrend, scale_type, which_lag)
+
+
 def get_xcorr_multi_thresh(sp, threshes, sd, distance_map, binsize='S',
                            how='sum', firing_rate_threshold=1.0,
                            refractory_period=2, nan_auto=True, detrend='mean',
                            scale_type='normalize', which_lag=0):
-    xcs = pd.concat([get_xcorr(sp, threshold=thresh, sd=sd, binsize=binsize,
-                               how=how,
-                               firing_rate_threshold=firing_rate_threshold,
-                               refractory_period=refractory_period,
-                               nan_auto=nan_auto, detrend=detrend,
-                               scale_type=scale_type, which_lag=0) for thresh
-                     in threshes], axis=1)
+    if how == 'sum':
+        # bin at every threshold in a single pass over the raw data
+        levels = pd.DataFrame(np.outer(threshes, sd), index=threshes,
+                              columns=sd.index)
+        binned = sp.bin_spikes_multi(levels, binsize, refractory_period)
+        xcs = [_xcorr_binned(sp, binned[thresh], thresh,
+                             firing_rate_threshold, nan_auto, detrend,
+                             scale_type) for thresh in binned.items]
+    else:
+        xcs = [get_xcorr(sp, threshold=thresh, sd=sd, binsize=binsize,
+                         how=how, firing_rate_threshold=firing_rate_threshold,
+                         refractory_period=refractory_period,
+                         nan_auto=nan_auto, detrend=detrend,
+                         scale_type=scale_type, which_lag=0)
+               for thresh in threshes]
+
+    xcs = pd.concat(xcs, axis=1)
     dname = distance_map.name
     xcs[dname] = distance_map
     xcs.sort(dname, inplace=True)
@@ -158,7 +182,8 @@ def compute_xcorr_with_args(args):
     em = ElectrodeMap(NeuroNexusMap.values, args.within_shank,
                       args.between_shank)
     # make a tank
-    tank = TdtTank(filename, em, clean=args.remove_first_pc)
+    tank = TdtTank(filename, em,
+                   clean='streaming' if args.remove_first_pc else False)
 
     try:
         xcs = pd.read_hdf(h5name, xcs_name)
@@ -5,7 +5,6 @@ import numbers
 import pandas as pd
 from numpy import nan
 
-from span import ElectrodeMap, TdtTank, NeuroNexusMap
 from span.utils import bold, blue, red
 from span.spanner.utils import error, _pop_column_to_name
 from span.spanner.defaults import SPAN_DB_PATH, SPAN_DB
@@ -72,6 +71,8 @@ class SpanCommand(object):
                 #spikes = tank.spik
                 #raw_store.put('raw', spikes)
                 #meta = self._get_meta(tank)
+        from span import ElectrodeMap, TdtTank, NeuroNexusMap
+
         em = ElectrodeMap(NeuroNexusMap.values, 50, 125)
         tank = TdtTank(os.path.normpath(self.filename), em)
         spikes = tank.spik
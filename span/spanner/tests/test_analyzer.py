@@ -0,0 +1,42 @@
+import unittest
+
+import numpy as np
+from pandas.util.testing import assert_series_equal
+
+import span
+from span.spanner.analyzer import _xcorr_binned
+from span.testing import create_spike_df
+
+
+class TestXcorrBinned(unittest.TestCase):
+    def setUp(self):
+        self.sp = create_spike_df()
+        thr = self.sp.threshold(2 * self.sp.std())
+        self.binned = thr.clear_refrac(2).bin('10L')
+
+    def _expected(self, lag):
+        xc = self.sp.xcorr(self.binned.copy(), detrend=span.detrend_mean,
+                           scale_type='normalize', nan_auto=True, lags=[lag],
+                           pairs='all')
+        return xc.loc[lag]
+
+    def test_lag_zero(self):
+        s = _xcorr_binned(self.sp, self.binned.copy(), 2.0,
+                          firing_rate_threshold=0)
+        expected = self._expected(0)
+
+        # the lower triangle repeats the upper one at lag 0
+        self.assertLess(s.size, expected.size)
+        assert_series_equal(s, expected.reindex(s.index), check_names=False)
+
+    def test_nonzero_lag(self):
+        for lag in (1, -2):
+            s = _xcorr_binned(self.sp, self.binned.copy(), 2.0,
+                              firing_rate_threshold=0, which_lag=lag)
+            expected = self._expected(lag)
+            self.assertEqual(s.size, expected.size)
+            assert_series_equal(s, expected, check_names=False)
+
+            # the pairs (i, j) and (j, i) differ away from lag 0
+            assert not np.allclose(s.values, self._expected(-lag).values,
+                                   equal_nan=True)
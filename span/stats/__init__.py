@@ -1 +1,3 @@
 from span.stats.perm_test import *
+
+__all__ = 'cch_perm',
@@ -21,7 +21,9 @@ from span.tdt.spikedataframe import SpikeDataFrame, spike_xcorr
 from span.tdt.spikeglobals import TdtDataTypes, NeuroNexusMap, TdtEventTypes
 from span.tdt.tank import TdtTank, PandasTank
 from span.tdt.recording import ElectrodeMap
+from span.tdt.catalog import build_catalog, find_tanks
+from span.tdt.spiketrains import SpikeTrains
 
 __all__ = ('SpikeDataFrame', 'spike_xcorr', 'TdtDataTypes',
            'PandasTank', 'TdtTank', 'ElectrodeMap', 'TdtEventTypes',
-           'NeuroNexusMap')
+           'NeuroNexusMap', 'build_catalog', 'find_tanks', 'SpikeTrains')
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+
+# catalog.py ---
+
+# Copyright (C) 2012 Copyright (C) 2012 Phillip Cloud <cpcloud@gmail.com>
+
+# Author: Phillip Cloud <cpcloud@gmail.com>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Examples
+--------
+>>> import span
+>>> catalog = span.build_catalog('some/data/tree', 'catalog.h5')
+>>> catalog[catalog.age > 20]
+"""
+import multiprocessing
+import os
+import warnings
+
+import pandas as pd
+from pandas import DataFrame
+
+from span.tdt.tank import TdtTank
+
+
+_STAT_COLUMNS = 'tsq_size', 'tsq_mtime', 'tev_size', 'tev_mtime'
+
+
+def find_tanks(root):
+    """Find every tank in a directory tree.
+
+    Parameters
+    ----------
+    root : str
+
+    Returns
+    -------
+    paths : list of str
+        The path of each tank sans extension, i.e., of each TSQ file that has
+        a TEV file next to it.
+    """
+    tsq_ext = os.extsep + TdtTank._header_ext
+    tev_ext = os.extsep + TdtTank._raw_ext
+    paths = []
+
+    for dirpath, _, filenames in os.walk(root):
+        names = frozenset(filenames)
+
+        for filename in filenames:
+            base, ext = os.path.splitext(filename)
+
+            if ext == tsq_ext and base + tev_ext in names:
+                paths.append(os.path.join(dirpath, base))
+
+    return sorted(paths)
+
+
+def _tank_stats(path):
+    tsq = os.stat(path + os.extsep + TdtTank._header_ext)
+    tev = os.stat(path + os.extsep + TdtTank._raw_ext)
+    return tsq.st_size, tsq.st_mtime, tev.st_size, tev.st_mtime
+
+
+def _catalog_record(path):
+    """Compute the catalog row of a single tank.
+
+    A tank that can't be read gets a row with the reason in its ``error``
+    column instead of raising, so that one broken tank doesn't take down the
+    whole pool.
+    """
+    try:
+        stats = _tank_stats(path)
+    except Exception as e:
+        return path, {'error': repr(e)}
+
+    record = dict(zip(_STAT_COLUMNS, stats))
+
+    try:
+        tank = TdtTank(path, None, cache=False, metadata_only=True)
+        record.update({'basename': tank.name, 'age': tank.age,
+                       'site': tank.site, 'date': tank.date,
+                       'start': tank.start, 'end': tank.end,
+                       'duration': tank.duration,
+                       'stores': ','.join(tank.data_names), 'error': None})
+        fs = tank.fs.dropna()
+        record.update(('fs_' + name, rate) for name, rate in fs.iteritems())
+    except Exception as e:
+        record['error'] = repr(e)
+
+    return path, record
+
+
+def build_catalog(root, filename=None, key='catalog', processes=None,
+                  chunksize=16):
+    """Build an inventory of every tank in a directory tree.
+
+    Parameters
+    ----------
+    root : str
+        Top of the directory tree to search for tanks.
+    filename : str, optional
+        HDF5 file the catalog is stored in. If it already has a catalog,
+        only tanks whose TSQ or TEV file changed size or modification time
+        since are opened again. Defaults to not storing the catalog.
+    key : str, optional
+        Key of the catalog in `filename`.
+    processes : int, optional
+        Number of worker processes, ``1`` scans in this process. Defaults to
+        the number of CPUs.
+    chunksize : int, optional
+        Number of tanks handed to a worker at a time.
+
+    Returns
+    -------
+    catalog : DataFrame
+        One row per tank, indexed by its path sans extension, with the same
+        fields as :func:`span.spanner.analyzer.tank_to_prec` that don't
+        depend on the electrode array, the data stores, their sampling rates
+        in ``fs_<store>`` columns and the sizes and modification times of
+        the TSQ and TEV files. Tanks that couldn't be read are listed too,
+        with the reason in their ``error`` column, which is null for every
+        other tank. They are opened again once their files change.
+    """
+    paths = find_tanks(root)
+    previous = None
+
+    if filename is not None and os.path.exists(filename):
+        try:
+            previous = pd.read_hdf(filename, key)
+        except KeyError:
+            pass
+
+    todo = paths
+
+    if previous is not None:
+        previous = previous.reindex([p for p in paths
+                                     if p in previous.index])
+        current = DataFrame.from_records([_tank_stats(p)
+                                          for p in previous.index],
+                                         index=previous.index,
+                                         columns=_STAT_COLUMNS)
+        unchanged = (previous[list(_STAT_COLUMNS)] == current).all(axis=1)
+        previous = previous[unchanged]
+        todo = [p for p in paths if p not in previous.index]
+
+    if processes == 1 or len(todo) <= 1:
+        results = list(map(_catalog_record, todo))
+    else:
+        pool = multiprocessing.Pool(processes)
+
+        try:
+            results = pool.map(_catalog_record, todo, chunksize)
+        finally:
+            pool.close()
+            pool.join()
+
+    failed = [p for p, r in results if r['error'] is not None]
+
+    if failed:
+        warnings.warn('unable to read {0} tank(s): '
+                      '{1}'.format(len(failed), ', '.join(failed)))
+
+    scanned = DataFrame.from_dict(dict(results), orient='index')
+
+    if previous is not None:
+        scanned = pd.concat([previous, scanned])
+
+    catalog = scanned.sort_index()
+    catalog.index.name = 'path'
+
+    if filename is not None:
+        catalog.to_hdf(filename, key)
+
+    return catalog
@@ -17,68 +17,235 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from libc.stdio cimport fopen, fclose, fread, fseek, SEEK_SET, FILE
 from libc.stdlib cimport malloc, free
+from posix.fcntl cimport (open as c_open, posix_fadvise, O_RDONLY,
+                          POSIX_FADV_SEQUENTIAL)
+from posix.types cimport off_t
+from posix.unistd cimport pread, close
+
+from numpy cimport (int8_t as i1, int16_t as i2, int32_t as i4,
+                    int64_t as i8, float32_t as f4, float64_t as f8)
 
 cimport cython
-from cython cimport floating, integral
 from cython.parallel cimport prange, parallel
 
 ctypedef Py_ssize_t ip
 
+ctypedef fused sample_t:
+    f4
+    f8
+    i1
+    i2
+    i4
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline int _copy_block(char* chunk, int fmt, ip start, ip col,
+                            ip block_size, sample_t[:, :] out) nogil:
+    cdef ip j
+
+    # fmt is the TDT data format code, see span.tdt.spikeglobals.TdtDataTypes
+    if fmt == 0:
+        for j in range(block_size):
+            out[start + j, col] = <sample_t> (<f4*> chunk)[j]
+    elif fmt == 1:
+        for j in range(block_size):
+            out[start + j, col] = <sample_t> (<i4*> chunk)[j]
+    elif fmt == 2:
+        for j in range(block_size):
+            out[start + j, col] = <sample_t> (<i2*> chunk)[j]
+    elif fmt == 3:
+        for j in range(block_size):
+            out[start + j, col] = <sample_t> (<i1*> chunk)[j]
+    elif fmt == 4:
+        for j in range(block_size):
+            out[start + j, col] = <sample_t> (<f8*> chunk)[j]
+    else:
+        return -1
+    return 0
+
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-cpdef int _read_tev_raw(const char* filename, integral[:] fp_locs,
-                        ip block_size, floating[:, :] spikes) nogil except -1:
+cdef inline int _pread_full(int fd, char* buf, ip nbytes, off_t pos) nogil:
+    """Read exactly `nbytes` bytes at `pos`, retrying after short reads."""
+    cdef ssize_t got
+
+    while nbytes > 0:
+        got = pread(fd, buf, nbytes, pos)
+
+        if got <= 0:
+            return -1
+
+        buf += got
+        pos += got
+        nbytes -= got
+
+    return 0
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cpdef int _read_tev_scatter(const char* filename, i8[:] fp_locs,
+                            ip[:] columns, ip[:] slots, ip[:] runs,
+                            ip block_size, int fmt, ip itemsize,
+                            sample_t[:, :] out) nogil except -1:
+    """Read blocks from a TEV file straight into their place in `out`.
+
+    Block ``i`` is read from byte ``fp_locs[i]`` and written to rows
+    ``slots[i] * block_size`` through ``(slots[i] + 1) * block_size`` of
+    column ``columns[i]`` of `out`, converting from the TDT data format
+    `fmt` to the type of `out` on the way.
+
+    The blocks must be sorted by `fp_locs`. Blocks ``runs[k]`` through
+    ``runs[k + 1] - 1`` are fetched with a single ``pread``, which covers
+    any bytes lying between them.
+    """
     cdef:
-        ip n = fp_locs.shape[0], f_bytes = sizeof(floating), pos
-        ip i, j, num_bytes = block_size * f_bytes
-        floating* chunk = NULL
-        FILE* f = NULL
+        ip nruns = runs.shape[0] - 1, i, k, bufsize = 0
+        ip num_bytes = block_size * itemsize
+        off_t pos
+        char* buf = NULL
+        int fd
 
-    with nogil, parallel():
-        chunk = <floating*> malloc(num_bytes)
+        # written through a pointer so that it's shared between threads
+        int err = 0
+        int* perr = &err
 
-        if chunk is NULL:
-            with gil:
-                raise MemoryError('Unable to allocate chunk')
+    for k in range(nruns):
+        if runs[k + 1] > runs[k]:
+            bufsize = max(bufsize, fp_locs[runs[k + 1] - 1] -
+                          fp_locs[runs[k]] + num_bytes)
 
-        f = fopen(filename, "rb")
+    fd = c_open(filename, O_RDONLY)
 
-        if f is NULL:
-            free(chunk)
-            chunk = NULL
+    if fd == -1:
+        with gil:
+            raise IOError('Unable to open file %s' % filename)
 
-            with gil:
-                raise IOError('Unable to open file %s' % filename)
+    # a hint, the read is correct either way
+    posix_fadvise(fd, 0, 0, POSIX_FADV_SEQUENTIAL)
 
-        # static < guided < dynamic < runtime FOR THIS CASE
-        for i in prange(n, schedule='static'):
-            pos = fp_locs[i]
+    with nogil, parallel():
+        buf = <char*> malloc(bufsize)
+
+        for k in prange(nruns, schedule='dynamic'):
+            if runs[k + 1] == runs[k]:
+                continue
+
+            pos = fp_locs[runs[k]]
+
+            if buf is NULL:
+                perr[0] = 1
+            elif _pread_full(fd, buf, fp_locs[runs[k + 1] - 1] - pos +
+                             num_bytes, pos) == -1:
+                perr[0] = 2
+            else:
+                for i in range(runs[k], runs[k + 1]):
+                    if _copy_block(buf + (fp_locs[i] - pos), fmt,
+                                   slots[i] * block_size, columns[i],
+                                   block_size, out) == -1:
+                        perr[0] = 4
+
+        free(buf)
+        buf = NULL
+
+    close(fd)
+
+    if err == 1:
+        with gil:
+            raise MemoryError('Unable to allocate a %d byte read buffer' %
+                              bufsize)
+    elif err == 2:
+        with gil:
+            raise IOError('Unable to read a block from %s' % filename)
+    elif err == 4:
+        with gil:
+            raise ValueError('Unknown TDT data format %d' % fmt)
 
-            if fseek(f, pos, SEEK_SET) == -1:
-                free(chunk)
-                fclose(f)
+    return 0
 
-                with gil:
-                    raise IOError('Unable to seek to file position %d' % pos)
 
-            if not fread(chunk, num_bytes, 1, f):
-                free(chunk)
-                fclose(f)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cpdef int _read_tev_multi(const char* filename, i8[:] fp_locs, i8[:] starts,
+                          ip[:] block_sizes, int[:] fmts, ip[:] itemsizes,
+                          ip[:] runs, sample_t[:, :] out) nogil except -1:
+    """Read blocks of several events from a TEV file in one pass.
+
+    Block ``i`` has ``block_sizes[i]`` samples of TDT data format ``fmts[i]``
+    and is written to rows ``starts[i]`` through
+    ``starts[i] + block_sizes[i] - 1`` of the single column `out`. The
+    blocks must be sorted by `fp_locs` and grouped into `runs` like for
+    :func:`_read_tev_scatter`.
+    """
+    cdef:
+        ip nruns = runs.shape[0] - 1, i, k, bufsize = 0
+        off_t pos, end
+        char* buf = NULL
+        int fd
+
+        # written through a pointer so that it's shared between threads
+        int err = 0, bad_fmt = 0
+        int* perr = &err
+        int* pbad_fmt = &bad_fmt
+
+    for k in range(nruns):
+        if runs[k + 1] > runs[k]:
+            end = 0
 
-                with gil:
-                    raise IOError('Unable to read any more bytes from '
-                                  '%s' % filename)
+            for i in range(runs[k], runs[k + 1]):
+                end = max(end, fp_locs[i] + block_sizes[i] * itemsizes[i])
 
-            for j in range(block_size):
-                spikes[i, j] = chunk[j]
+            bufsize = max(bufsize, end - fp_locs[runs[k]])
 
-        fclose(f)
-        f = NULL
+    fd = c_open(filename, O_RDONLY)
 
-        free(chunk)
-        chunk = NULL
+    if fd == -1:
+        with gil:
+            raise IOError('Unable to open file %s' % filename)
+
+    posix_fadvise(fd, 0, 0, POSIX_FADV_SEQUENTIAL)
+
+    with nogil, parallel():
+        buf = <char*> malloc(bufsize)
+
+        for k in prange(nruns, schedule='dynamic'):
+            if runs[k + 1] == runs[k]:
+                continue
+
+            pos = fp_locs[runs[k]]
+            end = pos
+
+            for i in range(runs[k], runs[k + 1]):
+                end = max(end, fp_locs[i] + block_sizes[i] * itemsizes[i])
+
+            if buf is NULL:
+                perr[0] = 1
+            elif _pread_full(fd, buf, end - pos, pos) == -1:
+                perr[0] = 2
+            else:
+                for i in range(runs[k], runs[k + 1]):
+                    if _copy_block(buf + (fp_locs[i] - pos), fmts[i],
+                                   starts[i], 0, block_sizes[i], out) == -1:
+                        perr[0] = 4
+                        pbad_fmt[0] = fmts[i]
+
+        free(buf)
+        buf = NULL
+
+    close(fd)
+
+    if err == 1:
+        with gil:
+            raise MemoryError('Unable to allocate a %d byte read buffer' %
+                              bufsize)
+    elif err == 2:
+        with gil:
+            raise IOError('Unable to read a block from %s' % filename)
+    elif err == 4:
+        with gil:
+            raise ValueError('Unknown TDT data format %d' % bad_fmt)
 
     return 0
@@ -47,7 +47,6 @@ array that *is* numbered that way.
 import numbers
 
 import numpy as np
-from scipy.spatial.distance import squareform, pdist
 from pandas import DataFrame, MultiIndex, Series, Index
 
 from span.utils import ndtuples, create_repeating_multi_index
@@ -110,6 +109,8 @@ def distance_map(nshanks, electrodes_per_shank, within_shank, between_shank,
         '"p" must be a real number'
     assert p > 0, '"p" must be a positive number'
 
+    from scipy.spatial.distance import squareform, pdist
+
     args = [electrodes_per_shank]
 
     if nshanks > 1:
@@ -196,6 +197,42 @@ class ElectrodeMap(object):
         df.columns.name = 'shank'
         return df
 
+    def select(self, channels=None, shanks=None):
+        """Return the columns of the electrodes on some channels or shanks.
+
+        Parameters
+        ----------
+        channels : int or sequence of int, optional
+            Channel numbers to select.
+        shanks : int or sequence of int, optional
+            Shank numbers to select.
+
+        Raises
+        ------
+        ValueError
+            * If nothing is selected
+
+        Returns
+        -------
+        columns : array_like
+            Positions in :attr:`index` of the selected electrodes, in electrode
+            map order. All positions are returned if neither `channels` nor
+            `shanks` are given.
+        """
+        mask = np.ones(self.nchannel, dtype=bool)
+
+        if channels is not None:
+            mask &= np.in1d(self.channel, np.atleast_1d(channels))
+
+        if shanks is not None:
+            mask &= np.in1d(self.shank, np.atleast_1d(shanks))
+
+        if not mask.any():
+            raise ValueError('no electrodes on channels %s and shanks %s' %
+                             (channels, shanks))
+
+        return np.flatnonzero(mask)
+
     @property
     def _repr_pad(self):
         # force padding to be at least 2
@@ -29,15 +29,23 @@ Example
 >>> assert isinstance(sp, span.SpikeDataFrame)
 """
 import abc
+import datetime
 import functools
 import numbers
 import types
 
 import numpy as np
-from pandas import Series, DataFrame, DatetimeIndex, concat
-from span.utils import samples_per_ms, clear_refrac, LOCAL_TZ
+from pandas import Series, DataFrame, DatetimeIndex, Panel, concat, tslib
+from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import Nano
+from span.utils import (samples_per_ms, clear_refrac, bin_samples,
+                        bin_samples_multi, bin_spikes, bin_spikes_multi,
+                        OrderedDict, LOCAL_TZ)
+from span.utils.utils import _to_seconds
 from span.xcorr import xcorr as _xcorr
 import six
+from six.moves import xrange
+import pytz
 
 
 class SpikeDataFrameBase(DataFrame):
@@ -76,11 +84,21 @@ class SpikeDataFrame(SpikeDataFrameBase):
     """Class encapsulting a Pandas DataFrame with extensions for analyzing
     spike train data.
 
-    See the pandas DataFrame documentation for constructor details.
+    See the pandas DataFrame documentation for constructor details. In
+    addition to those, `start` and `fs` may be given to describe a frame
+    indexed by sample number instead of by time: sample ``i`` was then
+    recorded at ``start + i / fs``. Timestamps are only computed when asked
+    for through :attr:`time_index`.
     """
+    _metadata = ['isclean', '_start', '_fs']
+
     def __init__(self, *args, **kwargs):
+        start = kwargs.pop('start', None)
+        fs = kwargs.pop('fs', None)
         super(SpikeDataFrame, self).__init__(*args, **kwargs)
         self.isclean = False
+        self._start = start
+        self._fs = fs
 
     @property
     def _constructor(self):
@@ -96,11 +114,100 @@ class SpikeDataFrame(SpikeDataFrameBase):
 
     @property
     def fs(self):
+        """Sampling rate in Hz.
+
+        Raises
+        ------
+        ValueError
+            If the frame wasn't given a sampling rate and isn't indexed by
+            time, since the spacing of any other index says nothing about
+            time.
+        """
+        if self._fs is not None:
+            return self._fs
+
+        if not isinstance(self.index, DatetimeIndex):
+            raise ValueError('sampling rate of a frame indexed by %s is '
+                             'unknown, pass fs to the constructor'
+                             % type(self.index).__name__)
+
         if self.index.freq is not None:
             return 1e9 / self.index.freq.n
         return 1e9 / (self.index.values[1] -
                       self.index.values[0]).astype('m8[ns]').astype(int)
 
+    @property
+    def start(self):
+        """Time of sample 0, or of the first row of a time indexed frame."""
+        if self._start is not None:
+            return self._start
+        return self.index[0]
+
+    @property
+    def time_index(self):
+        """The index as a DatetimeIndex.
+
+        For frames indexed by sample number this computes the timestamps,
+        which take 8 bytes per sample.
+        """
+        if self._fs is None or isinstance(self.index, DatetimeIndex):
+            return self.index
+
+        ns = int(1e9 / self._fs)
+        samples = np.asarray(self.index.values, dtype=np.int64)
+        dt = np.datetime64(self.start) + samples * np.timedelta64(ns, 'ns')
+
+        # the frequency only holds for contiguous samples
+        contiguous = (samples.size < 2 or
+                      samples[-1] - samples[0] == samples.size - 1 and
+                      np.all(np.diff(samples) == 1))
+        freq = ns * Nano() if contiguous else None
+        return DatetimeIndex(dt, freq=freq, name='datetime', tz=LOCAL_TZ)
+
+    def to_time_index(self):
+        """Return a copy of the frame indexed by :attr:`time_index`.
+
+        The data are not copied.
+        """
+        df = self.copy(deep=False)
+        df.index = self.time_index
+        return self._with_metadata(df)
+
+    def time_slice(self, start=None, end=None):
+        """Select the samples recorded in a time window.
+
+        Parameters
+        ----------
+        start, end : number or timedelta, optional
+            Bounds of the window relative to :attr:`start`, numbers are in
+            seconds. Defaults to the first and past the last sample.
+
+        Returns
+        -------
+        sliced : SpikeDataFrame
+            A view of the samples in ``[start, end)``. Only the positions of
+            the bounds are searched for, the index is never converted to
+            timestamps.
+        """
+        lo, hi = (None if t is None else self._position(t)
+                  for t in (start, end))
+        return self._with_metadata(self.iloc[lo:hi])
+
+    def _position(self, t):
+        if isinstance(t, datetime.timedelta):
+            t = t.total_seconds()
+
+        if isinstance(self.index, DatetimeIndex):
+            values = self.index.asi8
+            return values.searchsorted(values[0] + int(round(t * 1e9)))
+
+        return self.index.searchsorted(int(np.ceil(t * self.fs)))
+
+    def _with_metadata(self, df):
+        for name in self._metadata:
+            setattr(df, name, getattr(self, name))
+        return df
+
     def threshold(self, threshes):
         """Threshold spikes.
 
@@ -118,6 +225,13 @@ class SpikeDataFrame(SpikeDataFrameBase):
         -------
         threshed : array_like
         """
+        threshes, cmpf = self._thresholds(threshes)
+        return self._with_metadata(self._constructor(cmpf(self.values,
+                                                          threshes),
+                                                     self.index,
+                                                     self.columns))
+
+    def _thresholds(self, threshes):
         if np.isscalar(threshes):
             threshes = np.repeat(threshes, self.nchannels)
 
@@ -127,12 +241,68 @@ class SpikeDataFrame(SpikeDataFrameBase):
                              'threshold for each '
                              'channel'.format(self.nchannels))
 
-        cmpf = self.lt if np.all(threshes < 0) else self.gt
+        if isinstance(threshes, Series):
+            threshes = threshes.reindex(self.columns)
 
-        thr = threshes.item() if threshes.size == 1 else threshes
-        threshes = Series(thr, index=self.columns)
+        threshes = np.asarray(threshes)
 
-        return cmpf(threshes, axis=1)
+        # compare in the sample type so that float32 data aren't upcast
+        if self.values.dtype.kind == 'f':
+            threshes = threshes.astype(self.values.dtype)
+
+        cmpf = np.less if np.all(threshes < 0) else np.greater
+        return threshes, cmpf
+
+    def spike_trains(self, threshes, ms=2):
+        """Threshold and clear the refractory period without ever building
+        a dense array of booleans.
+
+        Parameters
+        ----------
+        threshes : array_like
+            As for :meth:`threshold`.
+        ms : real, optional
+            As for :meth:`clear_refrac`.
+
+        Returns
+        -------
+        trains : SpikeTrains
+            The sample number of every spike of every channel.
+
+        See Also
+        --------
+        span.tdt.SpikeTrains
+        """
+        from span.tdt.spiketrains import SpikeTrains
+        return SpikeTrains.from_frame(self, threshes, ms)
+
+    def std(self, axis=0, skipna=True, level=None, ddof=1, **kwargs):
+        """Compute the standard deviation of each channel.
+
+        Samples narrower than 64 bits are reduced in chunks of rows, so that
+        ``float32`` and integer data are never copied to ``float64`` as a
+        whole. The sums are still accumulated in double precision.
+
+        Parameters
+        ----------
+        axis : int, optional
+        skipna : bool, optional
+        level : int or str, optional
+        ddof : int, optional
+
+        Returns
+        -------
+        sd : Series
+        """
+        values = self.values
+
+        if (axis not in (0, 'index') or level is not None or kwargs or
+                values.dtype.kind not in 'fiu' or values.dtype.itemsize >= 8):
+            return super(SpikeDataFrame, self).std(axis=axis, skipna=skipna,
+                                                   level=level, ddof=ddof,
+                                                   **kwargs)
+
+        return Series(_chunked_std(values, ddof, skipna), index=self.columns)
 
     def clear_refrac(self, ms=2, inplace=False):
         """Remove spikes from the refractory period of all channels.
@@ -176,13 +346,113 @@ class SpikeDataFrame(SpikeDataFrameBase):
             return
 
         ms_fs = samples_per_ms(self.fs, ms)
-        df = self.copy() if not inplace else self
+        df = self._with_metadata(self.copy()) if not inplace else self
         values = df.values
         clear_refrac(values, ms_fs)
 
         if not inplace:
             return df
 
+    def bin_spikes(self, threshes, binsize='S', ms=2):
+        """Threshold, clear the refractory period and bin in a single pass.
+
+        Gives the same counts as
+        ``self.threshold(threshes).clear_refrac(ms).bin(binsize)`` without
+        creating any intermediate frames.
+
+        Parameters
+        ----------
+        threshes : array_like
+            As for :meth:`threshold`.
+        binsize : str, optional
+            A pandas offset alias, bins are aligned like those of
+            ``resample``.
+        ms : real, optional
+            Length of the refractory period in milliseconds.
+
+        Returns
+        -------
+        binned : DataFrame
+            Spike counts indexed by the start of each bin.
+        """
+        threshes, _ = self._thresholds(threshes)
+        window = samples_per_ms(self.fs, ms) if ms else 0
+        first, bin_width, offset, freq, tz = self._bin_alignment(binsize)
+        counts = bin_spikes(self.values, threshes, window, bin_width, offset)
+        return DataFrame(counts, self._bin_index(first, freq, tz,
+                                                 counts.shape[0]),
+                         self.columns)
+
+    def bin_spikes_multi(self, threshes, binsize='S', ms=2):
+        """Run :meth:`bin_spikes` at several thresholds in a single pass.
+
+        Parameters
+        ----------
+        threshes : DataFrame or array_like
+            One row of thresholds per threshold level, with a column per
+            channel. The columns of a DataFrame are matched to the channels
+            by name.
+        binsize : str, optional
+            As for :meth:`bin_spikes`.
+        ms : real, optional
+            As for :meth:`bin_spikes`.
+
+        Returns
+        -------
+        binned : Panel
+            One item of spike counts per threshold level, labeled by the
+            index of `threshes` if it's a DataFrame.
+        """
+        items = None
+
+        if isinstance(threshes, DataFrame):
+            items = threshes.index
+            threshes = threshes.reindex(columns=self.columns)
+
+        threshes = np.atleast_2d(np.asarray(threshes))
+
+        if threshes.ndim != 2 or threshes.shape[1] != self.nchannels:
+            raise ValueError('threshes must have a column for each of the '
+                             '{0} channels'.format(self.nchannels))
+
+        if self.values.dtype.kind == 'f':
+            threshes = threshes.astype(self.values.dtype)
+
+        window = samples_per_ms(self.fs, ms) if ms else 0
+        first, bin_width, offset, freq, tz = self._bin_alignment(binsize)
+        counts = bin_spikes_multi(self.values, threshes, window, bin_width,
+                                  offset)
+        return Panel(counts, items=items,
+                     major_axis=self._bin_index(first, freq, tz,
+                                                counts.shape[1]),
+                     minor_axis=self.columns)
+
+    def _bin_alignment(self, binsize):
+        """Place bins of length `binsize` like ``resample`` would, see
+        :func:`_align_bins`.
+        """
+        # sample spacing in whole nanoseconds, like the time index has it
+        period = int(1e9 / self.fs)
+
+        if isinstance(self.index, DatetimeIndex):
+            tz = self.index.tz
+            t0 = _wall_ns(self.index.asi8[0], tz)
+
+            if self.index.freq is not None:
+                period = self.index.freq.n
+        else:
+            t0 = (np.datetime64(self.start, 'ns').astype(np.int64) +
+                  int(self.index[0]) * period)
+            tz = LOCAL_TZ
+
+        return _align_bins(t0, period, tz, binsize)
+
+    @staticmethod
+    def _bin_index(first, freq, tz, nbins):
+        # wall clock times, which DatetimeIndex localizes to tz
+        index = first + np.arange(nbins) * freq.nanos
+        return DatetimeIndex(index.astype('M8[ns]'), freq=freq, tz=tz)
+
     def prune_spikes(self, remove_null=True):
         """Reduce a cleared spike array to the minimum necessary to bin and
         compute correlations.
@@ -212,11 +482,96 @@ class SpikeDataFrame(SpikeDataFrameBase):
         return b
 
     def bin(self, bin_size, how='sum', *args, **kwargs):
-        return self.resample(bin_size, how=how, *args, **kwargs)
+        """Aggregate the samples in bins of equal length.
+
+        Sums are computed directly from sample positions, which is a lot
+        faster than ``resample``. Anything else is passed on to
+        ``resample``.
+
+        Parameters
+        ----------
+        bin_size : int or str
+            Either a number of samples, with bins starting at the first
+            row, or a pandas offset alias, with bins aligned like those of
+            ``resample``.
+        how : str, optional
+            How to aggregate each bin.
+        args, kwargs : tuple, dict
+            Passed to ``resample``.
+
+        Returns
+        -------
+        binned : SpikeDataFrame
+            Indexed by the start of each bin.
+        """
+        if isinstance(bin_size, (numbers.Integral, np.integer)):
+            if how != 'sum' or args or kwargs:
+                raise ValueError('bins of a number of samples can only be '
+                                 'summed')
+
+            sums = bin_samples(self.values, bin_size)
+            return self._binned(self._constructor(sums,
+                                                  self.index[::bin_size],
+                                                  self.columns))
+
+        if how == 'sum' and not args and not kwargs:
+            first, bin_width, offset, freq, tz = self._bin_alignment(bin_size)
+            sums = bin_samples(self.values, bin_width, offset)
+            index = self._bin_index(first, freq, tz, sums.shape[0])
+            return self._binned(self._constructor(sums, index, self.columns))
+
+        df = self if isinstance(self.index, DatetimeIndex) else \
+            self.to_time_index()
+        return self._binned(self._constructor(df.resample(bin_size, how=how,
+                                                          *args, **kwargs)))
+
+    def _binned(self, df):
+        """Carry the metadata of the frame over to its bins.
+
+        Bins indexed by time get their sampling rate from the index, bins
+        indexed by sample number keep the start and rate of the samples.
+        """
+        df = self._with_metadata(df)
+
+        if isinstance(df.index, DatetimeIndex):
+            df._start = df._fs = None
+
+        return df
+
+    def bin_multi(self, bin_sizes):
+        """Sum the samples in bins of several lengths at once.
+
+        A single cumulative sum of the data is shared by every bin size,
+        which makes a bin size sweep cost about as much as one bin size.
+
+        Parameters
+        ----------
+        bin_sizes : sequence of str
+            Pandas offset aliases, bins are aligned like those of
+            :meth:`bin`.
+
+        Returns
+        -------
+        binned : OrderedDict
+            The sums of each bin size as a SpikeDataFrame, keyed by bin
+            size.
+        """
+        alignments = [self._bin_alignment(bin_size) for bin_size in bin_sizes]
+        widths = [alignment[1] for alignment in alignments]
+        offsets = [alignment[2] for alignment in alignments]
+        sums = bin_samples_multi(self.values, widths, offsets)
+        binned = OrderedDict()
+
+        for bin_size, alignment, total in zip(bin_sizes, alignments, sums):
+            first, _, _, freq, tz = alignment
+            index = self._bin_index(first, freq, tz, total.shape[0])
+            binned[bin_size] = self._binned(self._constructor(total, index,
+                                                              self.columns))
+        return binned
 
     @classmethod
     def xcorr(cls, binned, maxlags=None, detrend=None, scale_type=None,
-              sortlevel='shank i', nan_auto=False):
+              sortlevel='shank i', nan_auto=False, lags=None, pairs='all'):
         """Compute the cross correlation of binned data.
 
         Parameters
@@ -243,6 +598,13 @@ class SpikeDataFrame(SpikeDataFrameBase):
             If ``True`` then the autocorrelation values will be ``NaN``.
             Defaults to ``False``.
 
+        lags : array_like, optional
+            Compute only these lags instead of every lag up to `maxlags`.
+            A few lags, e.g., just lag 0, skip the FFT and are much faster.
+
+        pairs : {'all', 'upper', 'strict_upper'}, optional
+            As for :func:`span.xcorr.xcorr`.
+
         Raises
         ------
         AssertionError
@@ -274,9 +636,9 @@ class SpikeDataFrame(SpikeDataFrameBase):
             'scale_type must be a string or None'
 
         xc = _xcorr(binned, maxlags=maxlags, detrend=detrend,
-                    scale_type=scale_type)
+                    scale_type=scale_type, lags=lags, pairs=pairs)
 
-        if nan_auto:
+        if nan_auto and 0 in xc.index:
             # HACK for channel names
             xc0 = xc.ix[0]
             names = xc0.index.names
@@ -350,4 +712,110 @@ class SpikeDataFrame(SpikeDataFrameBase):
         return self._call_super_method('sort_index', *args, **kwargs)
 
 
+_DAY_NS = 86400 * 10 ** 9
+
+
+def _align_bins(t0, period, tz, binsize):
+    """Place bins of length `binsize` like ``resample`` would.
+
+    Parameters
+    ----------
+    t0 : int
+        Wall clock time of the first sample in nanoseconds, like the values
+        of a naive ``DatetimeIndex``.
+    period : int
+        Sample spacing in nanoseconds.
+    tz : str or tzinfo
+        Time zone of the bin labels.
+    binsize : str, number or timedelta
+        Pandas offset alias, or a number of seconds.
+
+    Returns
+    -------
+    first : int
+        Wall clock time of the start of the first bin in nanoseconds.
+    bin_width, offset : float
+        Width of a bin and position of the first sample within its bin, in
+        samples.
+    freq : DateOffset
+        The offset of `binsize`.
+    tz : str or tzinfo
+    """
+    if isinstance(binsize, (numbers.Real, np.number, datetime.timedelta,
+                            np.timedelta64)):
+        freq = Nano(int(round(_to_seconds(binsize) * 1e9)))
+    else:
+        freq = to_offset(binsize)
+
+    bin_ns = freq.nanos
+
+    # resample anchors bins that evenly divide a day to midnight and starts
+    # any others at the first sample
+    first = t0 if _DAY_NS % bin_ns else t0 - t0 % bin_ns
+    return (first, float(bin_ns) / period, float(t0 - first) / period, freq,
+            tz)
+
+
+def _wall_ns(ns, tz):
+    """Convert nanoseconds since the epoch to wall clock nanoseconds in
+    `tz`.
+    """
+    if tz is None:
+        return ns
+
+    if isinstance(tz, basestring):
+        tz = pytz.timezone(tz)
+
+    return tslib.tz_convert(np.array([ns], dtype=np.int64), pytz.utc, tz)[0]
+
+
+def _chunked_std(values, ddof=1, skipna=True, chunksize=2 ** 16):
+    """Two pass standard deviation of the columns of `values`.
+
+    Parameters
+    ----------
+    values : array_like
+        2D array of samples.
+    ddof : int, optional
+    skipna : bool, optional
+    chunksize : int, optional
+        Number of rows converted to a floating point type at a time.
+
+    Returns
+    -------
+    sd : array_like
+        The standard deviation of each column of `values`.
+    """
+    nrows, ncols = values.shape
+    # float32 can't hold every int32 sample, or their deviations, exactly
+    work_dtype = values.dtype if values.dtype.kind == 'f' else np.float64
+    sumf = np.nansum if skipna else np.sum
+    chunks = [values[i:i + chunksize] for i in xrange(0, nrows, chunksize)]
+
+    count = np.zeros(ncols, dtype=np.int64)
+    total = np.zeros(ncols)
+
+    for chunk in chunks:
+        count += chunk.shape[0]
+
+        if skipna and values.dtype.kind == 'f':
+            count -= np.isnan(chunk).sum(axis=0)
+
+        total += sumf(chunk, axis=0, dtype=np.float64)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (total / count).astype(work_dtype)
+        sqdev = np.zeros(ncols)
+
+        for chunk in chunks:
+            dev = chunk.astype(work_dtype, copy=False) - mean
+            sqdev += sumf(dev * dev, axis=0, dtype=np.float64)
+
+        denom = count - ddof
+        sd = np.sqrt(sqdev / denom)
+
+    sd[denom <= 0] = np.nan
+    return sd
+
+
 spike_xcorr = SpikeDataFrame.xcorr
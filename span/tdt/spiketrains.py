@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+
+# spiketrains.py ---
+
+# Copyright (C) 2012 Copyright (C) 2012 Phillip Cloud <cpcloud@gmail.com>
+
+# Author: Phillip Cloud <cpcloud@gmail.com>
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Examples
+--------
+>>> import span
+>>> tank = span.TdtTank('basename/of/some/tank/file')
+>>> sp = tank.spik
+>>> trains = sp.spike_trains(4 * sp.std())
+>>> xc = trains.xcorr('S', detrend=span.detrend_mean, scale_type='normalize')
+"""
+import datetime
+import numbers
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, DatetimeIndex, MultiIndex, Series
+
+from span.tdt.spikedataframe import SpikeDataFrame, _align_bins, _wall_ns
+from span.utils import samples_per_ms, OrderedDict, LOCAL_TZ
+from span.utils.utils import _bin_starts, _nbins, _to_seconds
+from span.utils._clear_refrac import _clear_refrac_sparse
+
+
+class SpikeTrains(object):
+    """The spike times of every channel of a recording, stored sparsely.
+
+    The spikes of column ``k`` are the sorted sample numbers
+    ``indices[indptr[k]:indptr[k + 1]]``, like the rows of a CSR matrix.
+
+    Parameters
+    ----------
+    indices : array_like
+        Sample numbers of the spikes, channel after channel.
+    indptr : array_like
+        Offsets of each channel's spikes in `indices`, of length
+        ``len(columns) + 1``.
+    nsamples : int
+        Number of samples of the thresholded data.
+    fs : float
+        Sampling rate.
+    columns : Index
+        The channels, usually the ``(shank, channel)`` MultiIndex of an
+        ElectrodeMap.
+    start : datetime, optional
+        Time of sample 0.
+    """
+    def __init__(self, indices, indptr, nsamples, fs, columns, start=None):
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.intp)
+        self.nsamples = int(nsamples)
+        self.fs = fs
+        self.columns = columns
+        self.start = start
+
+        assert self.indptr.size == len(columns) + 1, \
+            'indptr must have one more element than there are columns'
+        assert self.indptr[-1] == self.indices.size, \
+            'indptr must end at the number of spikes'
+
+    @classmethod
+    def from_frame(cls, data, threshes, ms=2):
+        """Threshold a SpikeDataFrame and clear the refractory period.
+
+        Parameters
+        ----------
+        data : SpikeDataFrame
+        threshes : array_like
+            As for :meth:`span.tdt.SpikeDataFrame.threshold`.
+        ms : real, optional
+            As for :meth:`span.tdt.SpikeDataFrame.clear_refrac`.
+
+        Returns
+        -------
+        trains : SpikeTrains
+        """
+        if not isinstance(ms, numbers.Real):
+            raise TypeError('ms must be a real number')
+
+        if ms < 0:
+            raise ValueError('refractory period must be a nonnegative real '
+                             'number')
+
+        threshes, cmpf = data._thresholds(threshes)
+        values = data.values
+
+        # one channel at a time, so at most nsamples booleans exist at once
+        trains = [np.flatnonzero(cmpf(values[:, k], thresh))
+                  for k, thresh in enumerate(threshes)]
+        counts = np.array([train.size for train in trains], dtype=np.intp)
+        indices = np.concatenate(trains).astype(np.int64)
+        indptr = np.r_[0, counts.cumsum()].astype(np.intp)
+        fs = data.fs
+
+        if ms:
+            keep = np.empty(indices.size, dtype=np.uint8)
+            _clear_refrac_sparse(indices, indptr, samples_per_ms(fs, ms),
+                                 keep)
+            keep = keep.view(np.bool_)
+            channel = np.repeat(np.arange(counts.size), counts)
+            counts = np.bincount(channel[keep], minlength=counts.size)
+            indices = indices[keep]
+            indptr = np.r_[0, counts.cumsum()].astype(np.intp)
+
+        return cls(indices, indptr, data.nsamples, fs, data.columns,
+                   _first_sample_time(data))
+
+    @property
+    def nchannels(self):
+        return len(self.columns)
+
+    @property
+    def nspikes(self):
+        return self.indices.size
+
+    @property
+    def counts(self):
+        """The number of spikes of each channel."""
+        return Series(np.diff(self.indptr), index=self.columns)
+
+    def __getitem__(self, k):
+        """The spikes of the `k`-th column."""
+        return self.indices[self.indptr[k]:self.indptr[k + 1]]
+
+    def _channels(self):
+        return np.repeat(np.arange(self.nchannels), np.diff(self.indptr))
+
+    def bin(self, binsize):
+        """Count the spikes in bins of equal length.
+
+        Parameters
+        ----------
+        binsize : number, timedelta or str
+            Length of a bin, numbers are in seconds, strings are pandas
+            offset aliases, e.g., ``'S'`` or ``'10L'``.
+
+        Returns
+        -------
+        binned : DataFrame
+            A row per bin, a column per channel. If the start of the
+            recording is known the bins are aligned and indexed like those of
+            :meth:`span.tdt.SpikeDataFrame.bin`, otherwise they start at
+            sample 0 and are indexed by bin number.
+        """
+        alignment = self._bin_alignment(binsize)
+        _, width, offset, _, _ = alignment
+        nbins = _nbins(self.nsamples, width, offset)
+        bins = ((self.indices + offset) / width).astype(np.intp)
+        flat = self._channels() * nbins + bins
+        counts = np.bincount(flat, minlength=self.nchannels * nbins)
+        return self._binned(counts.reshape(self.nchannels, nbins).T,
+                            alignment)
+
+    def bin_multi(self, binsizes):
+        """Count the spikes in bins of several lengths at once.
+
+        The number of spikes before any sample is found by a binary search
+        of the spike times, so every bin size is a cheap difference of
+        these prefix counts at its bin edges.
+
+        Parameters
+        ----------
+        binsizes : sequence
+            Bin lengths as for :meth:`bin`.
+
+        Returns
+        -------
+        binned : OrderedDict
+            The counts of each bin size, as :meth:`bin` returns them, keyed
+            by bin size.
+        """
+        # a single sorted array of the spikes of every channel
+        keys = self._channels() * self.nsamples + self.indices
+        offsets = np.arange(self.nchannels)[:, np.newaxis] * self.nsamples
+        binned = OrderedDict()
+
+        for binsize in binsizes:
+            alignment = self._bin_alignment(binsize)
+            _, width, offset, _, _ = alignment
+            edges = np.append(_bin_starts(self.nsamples, width, offset),
+                              self.nsamples)
+            before = np.searchsorted(keys, offsets + edges)
+            binned[binsize] = self._binned(np.diff(before, axis=1).T,
+                                           alignment)
+
+        return binned
+
+    def _bin_alignment(self, binsize):
+        if self.start is None:
+            return None, _to_seconds(binsize) * self.fs, 0.0, None, None
+
+        # the same bins as SpikeDataFrame.bin gives the frame these came from
+        start = pd.Timestamp(self.start)
+
+        if start.tz is None:
+            t0, tz = start.value, LOCAL_TZ
+        else:
+            t0, tz = _wall_ns(start.value, start.tz), start.tz
+
+        return _align_bins(t0, int(1e9 / self.fs), tz, binsize)
+
+    def _binned(self, counts, alignment):
+        first, _, _, freq, tz = alignment
+        nbins = counts.shape[0]
+
+        if first is not None:
+            index = SpikeDataFrame._bin_index(first, freq, tz, nbins)
+        else:
+            index = pd.Index(np.arange(nbins), name='bin')
+
+        return DataFrame(counts, index, self.columns)
+
+    def xcorr(self, binsize, **kwargs):
+        """Bin the spikes and cross correlate every pair of channels.
+
+        Parameters
+        ----------
+        binsize : number, timedelta or str
+            As for :meth:`bin`.
+        kwargs : dict
+            Passed to :meth:`span.tdt.SpikeDataFrame.xcorr`.
+
+        Returns
+        -------
+        xc : DataFrame
+        """
+        return SpikeDataFrame.xcorr(self.bin(binsize), **kwargs)
+
+    def jitter(self, window):
+        """Move every spike to a random sample within its jitter window.
+
+        Parameters
+        ----------
+        window : number, timedelta or str
+            Length of the jitter windows, which start at sample 0.
+
+        Returns
+        -------
+        jittered : SpikeTrains
+        """
+        width = max(int(round(_to_seconds(window) * self.fs)), 1)
+        jittered = self.indices // width * width
+        jittered += np.random.randint(0, width, size=jittered.size)
+        np.minimum(jittered, self.nsamples - 1, out=jittered)
+
+        # restore the order within each channel
+        order = np.lexsort((jittered, self._channels()))
+        return self.__class__(jittered[order], self.indptr.copy(),
+                              self.nsamples, self.fs, self.columns,
+                              self.start)
+
+    def to_dense(self):
+        """Return the spikes as an ``(nsamples, nchannels)`` array of
+        booleans.
+        """
+        dense = np.zeros((self.nsamples, self.nchannels), dtype=np.bool_)
+        dense[self.indices, self._channels()] = True
+        return dense
+
+    def save(self, filename):
+        """Write the spike trains to a NumPy ``.npz`` file.
+
+        Parameters
+        ----------
+        filename : str or file
+        """
+        columns = self.columns
+
+        if isinstance(columns, MultiIndex):
+            levels = [columns.get_level_values(i)
+                      for i in range(columns.nlevels)]
+        else:
+            levels = [columns]
+
+        start = '' if self.start is None else str(pd.Timestamp(self.start))
+        arrays = dict(('level_%d' % i, np.asarray(level))
+                      for i, level in enumerate(levels))
+        np.savez(filename, indices=self.indices, indptr=self.indptr,
+                 nsamples=self.nsamples, fs=self.fs, start=np.array(start),
+                 names=np.array(['' if name is None else str(name)
+                                 for name in columns.names]), **arrays)
+
+    @classmethod
+    def load(cls, filename):
+        """Read spike trains written by :meth:`save`.
+
+        Parameters
+        ----------
+        filename : str or file
+
+        Returns
+        -------
+        trains : SpikeTrains
+        """
+        with np.load(filename) as npz:
+            names = [name or None for name in npz['names']]
+            levels = [npz['level_%d' % i] for i in range(len(names))]
+
+            if len(levels) > 1:
+                columns = MultiIndex.from_arrays(levels, names=names)
+            else:
+                columns = pd.Index(levels[0], name=names[0])
+
+            start = npz['start'].item()
+            start = pd.Timestamp(start) if start else None
+
+            return cls(npz['indices'], npz['indptr'], npz['nsamples'].item(),
+                       npz['fs'].item(), columns, start)
+
+
+def _first_sample_time(data):
+    """The time of the first row of `data` without building timestamps."""
+    if isinstance(data.index, DatetimeIndex):
+        return data.index[0] if data.nsamples else None
+
+    if data._start is None or not data.nsamples:
+        return data._start
+
+    offset = datetime.timedelta(seconds=data.index[0] / data.fs)
+    return data._start + offset
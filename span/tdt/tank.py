@@ -27,23 +27,30 @@ Examples
 >>> path = 'some/path/to/a/tank/file'
 >>> tank = span.tdt.PandasTank(path)
 """
+import datetime
+import hashlib
 import numbers
 import os
 import re
+import tempfile
+import time
+from zipfile import BadZipfile
 
 import numpy as np
 import pandas as pd
+import six
 from numpy import nan as NA
-from pandas import DataFrame, DatetimeIndex, Series
+from pandas import DataFrame, Series
 from pandas.core import common as com
 from pandas.core.base import StringMixin
 
-from span.tdt._read_tev import _read_tev_raw
+from span.tdt._read_tev import _read_tev_scatter, _read_tev_multi
 from span.tdt.spikedataframe import SpikeDataFrame
 from span.tdt.spikeglobals import TdtEventTypes, TdtDataTypes
-from span.utils import (thunkify, fromtimestamp, assert_nonzero_existing_file,
-                        ispower2, OrderedDict, num2name, LOCAL_TZ,
-                        remove_first_pc)
+from span.utils import (thunkify, assert_nonzero_existing_file,
+                        ispower2, OrderedDict, num2name,
+                        remove_first_pc, remove_first_pc_streaming)
+from span.utils.utils import _create_ns_datetime_index, _to_seconds
 
 
 def _first_int_group(regex, name):
@@ -60,6 +67,53 @@ class TdtTank(StringMixin):
     ----------
     path : str
         The path to the tank file sans extension.
+    electrode_map : ElectrodeMap
+        The geometry of the electrode array used in the recording.
+    clean : bool or str, optional
+        Whether to remove the first principal component of the data.
+        ``'streaming'`` computes it from the channel covariance in chunks
+        instead of with a full SVD of the data.
+    mmap : bool, optional
+        Read events through a read-only memory map of the TEV file instead of
+        copying every block into an intermediate array.
+    cache : bool or str, optional
+        Keep the parsed TSQ file in a cache file and reuse it as long as the
+        TSQ file's size and modification time are unchanged. ``True`` puts
+        the cache file next to the TSQ file, a string is the directory to
+        put it in instead, which is useful when the tank directory is read
+        only or shouldn't be written to. Defaults to ``False``.
+    event_cache_bytes : int or None, optional
+        Memory budget for keeping previously read events around. The least
+        recently used events are dropped first. ``None`` means no limit and
+        ``0`` disables caching. Every read of a cached event copies it, so
+        the cache trades memory for TEV reads. Defaults to ``0``.
+    dtype : dtype or None, optional
+        Sample type of the data read from the tank. ``None`` keeps the type
+        each store was recorded with, e.g., ``float32`` for ``Spik`` and
+        ``int16`` for ``LFPs``, except that integer stores are read as
+        ``float32`` when `clean` is set, since cleaning sets samples to
+        ``NaN``. Defaults to ``float64``.
+    scale : float or None, optional
+        Multiply samples of integer stores by this factor while reading
+        them. Unless `dtype` says otherwise they are then read as
+        ``float32``.
+    metadata_only : bool, optional
+        Compute the recording's start, end, event names and sampling rates
+        from the first and last few thousand TSQ records and an evenly spaced
+        sample of the rest instead of parsing the whole TSQ file. Events
+        that are written very rarely may be missing from `names` and `fs`.
+        Reading events still parses the whole file.
+    sample_index : bool, optional
+        Index events by sample number instead of by time. The start time and
+        sampling rate are kept on the returned SpikeDataFrame, and the
+        timestamps are only computed when asked for through its
+        ``time_index``. Requires pandas 0.18 or later, whose ``RangeIndex``
+        takes constant memory.
+
+    Raises
+    ------
+    ValueError
+        If `sample_index` is given and pandas has no ``RangeIndex``.
 
     Attributes
     ----------
@@ -91,9 +145,25 @@ class TdtTank(StringMixin):
     _header_ext = 'tsq'
     _raw_ext = 'tev'
 
-    def __init__(self, path, electrode_map, clean=False):
+    def __init__(self, path, electrode_map, clean=False, mmap=False,
+                 cache=False, event_cache_bytes=0, dtype=np.float64,
+                 scale=None, metadata_only=False, sample_index=False):
         super(TdtTank, self).__init__()
+
+        if sample_index and not hasattr(pd, 'RangeIndex'):
+            raise ValueError('sample_index requires pandas 0.18 or later')
+
         self.electrode_map = electrode_map
+        self.mmap = mmap
+        self.cache = cache
+        self.sample_dtype = dtype if dtype is None else np.dtype(dtype)
+        self.scale = scale
+        self.sample_index = sample_index
+
+        self._raw = None
+        self._tsq = None
+        self._events = {}
+        self._event_cache = _EventCache(event_cache_bytes)
 
         tank_with_ext = path + os.extsep
         tev_path = tank_with_ext + self._raw_ext
@@ -108,9 +178,16 @@ class TdtTank(StringMixin):
         self.age = _first_int_group(self._age_re, self.name)
         self.site = _first_int_group(self._site_re, self.name)
 
-        not_na_ts = self.raw.timestamp.dropna()
-        tstart = pd.datetime.fromtimestamp(not_na_ts.head(1).item())
-        tend = pd.datetime.fromtimestamp(not_na_ts.tail(1).item())
+        if metadata_only:
+            summary = _scan_tsq(self.tsq_path, self.dtype)
+        else:
+            # keep the table so that the first access to raw doesn't read it
+            # again
+            self._tsq, summary = self._load_tsq()
+
+        self._tstart = summary['tstart']
+        tstart = pd.datetime.fromtimestamp(self._tstart)
+        tend = pd.datetime.fromtimestamp(summary['tend'])
 
         self.__datetime = pd.Timestamp(tstart)
         self.time = self.__datetime.time()
@@ -120,25 +197,9 @@ class TdtTank(StringMixin):
         self.end = pd.Timestamp(tend)
 
         self.duration = np.timedelta64(self.end - self.start)
-        unames = self.raw.name.unique()
-        raw_names = map(lambda x: x or NA, map(num2name, unames))
-        self.names = Series(raw_names, index=unames)
-        names = self.names
-
-        self.raw.name = names[self.raw.name].reset_index(drop=True)
+        self.names = names = summary['names']
         self._name_mapper = dict(zip(names.str.lower(), names))
-
-        def _try_get_na(x):
-            try:
-                return x.item()
-            except (ValueError, IndexError):
-                return NA
-
-        fs_nona = self.raw.fs.dropna()
-        name_nona = self.raw.name.dropna()
-        diter = ((name, _try_get_na(fs_nona[name_nona == num].head(1)))
-                 for num, name in self.names.dropna().iteritems())
-        self.fs = Series(dict(diter))
+        self.fs = summary['fs']
         self.data_names = self.fs.dropna().index.values.astype(np.str_)
         self.clean = clean
 
@@ -173,47 +234,49 @@ class TdtTank(StringMixin):
 
         return self._tev(mapper[name], self.clean)
 
-    @thunkify
-    def _raw_tsq(self):
-        # create the path name
-        tsq_name = self.path + os.extsep + self._header_ext
+    @property
+    def tsq_path(self):
+        return self.path + os.extsep + self._header_ext
 
-        # read in the raw data as a numpy rec array and convert to
-        # DataFrame
-        tsq = DataFrame(np.fromfile(tsq_name, self.dtype))
-        inds = tsq.strobe <= np.finfo(np.float64).eps
-        tsq.strobe[inds] = NA
+    def _load_tsq(self):
+        """Parse the TSQ file, or load it from its cache file.
 
-        # zero based indexing
-        tsq.channel -= 1.0
+        Returns
+        -------
+        tsq : DataFrame
+            The TSQ table without the electrode map dependent shank column.
+        summary : dict
+            The recording's start and end in seconds since the epoch and the
+            event names and sampling rates.
+        """
+        tsq_name = self.tsq_path
+        cache = self.cache
+        cache_dir = cache if isinstance(cache, six.string_types) else None
 
-        # -1s are invalid
-        tsq.channel[tsq.channel == -1.0] = NA
-        ind = self.electrode_map.raw
-        tsq['shank'] = ind[tsq.channel].reset_index(tsq.index, drop=True)
+        if self.cache:
+            cached = _load_tsq_cache(tsq_name, cache_dir)
 
-        tsq.type = TdtEventTypes[tsq.type].values
-        tsq.format = TdtDataTypes[tsq.format].values
+            if cached is not None:
+                return cached
 
-        tsq.timestamp[np.logical_not(tsq.timestamp)] = NA
-        tsq.fs[np.logical_not(tsq.fs)] = NA
+        tsq = _parse_tsq(tsq_name, self.dtype)
+        summary = _summarize_tsq(tsq)
 
-        # trim the fat
-        dt = self.dtype
-        stream = tsq.type == 'stream'
-        tsq.size.ix[stream] -= dt.itemsize / dt['size'].itemsize
+        if self.cache:
+            _save_tsq_cache(tsq_name, tsq, summary, cache_dir)
 
-        not_null_strobe = tsq.strobe.notnull()
+        return tsq, summary
 
-        for key in ('channel', 'sort_code', 'fp_loc'):
-            try:
-                tsq[key][not_null_strobe] = NA
-            except ValueError:
-                tsq[key] = tsq[key].astype(np.float64)
-                tsq[key][not_null_strobe] = NA
+    @thunkify
+    def _raw_tsq(self):
+        tsq, self._tsq = self._tsq, None
 
-        tsq.sort_index(axis=1, inplace=True)
+        if tsq is None:
+            tsq, _ = self._load_tsq()
 
+        ind = self.electrode_map.raw
+        tsq['shank'] = ind[tsq.channel].reset_index(tsq.index, drop=True)
+        tsq.sort_index(axis=1, inplace=True)
         return tsq
 
     @thunkify
@@ -228,6 +291,10 @@ class TdtTank(StringMixin):
         -------
         b : pandas.DataFrame
             Recording metadata
+        dtype : dtype
+            Sample type of the event.
+        block_size : int
+            Number of samples in each block of the event.
         """
         tsq = self.raw
 
@@ -250,14 +317,53 @@ class TdtTank(StringMixin):
             pass
 
         first_row = row.argmax()
-        return tsq, tsq.format[first_row], tsq.size[first_row]
+        dtype = np.dtype(tsq.format[first_row])
+
+        # sizes count words as wide as the size field, not samples
+        nbytes = int(tsq.size[first_row]) * self.dtype['size'].itemsize
+        return tsq, dtype, nbytes // dtype.itemsize
 
     def tsq(self, event_name):
-        return self._get_tsq_event(event_name)()
+        try:
+            return self._events[event_name]
+        except KeyError:
+            r = self._events[event_name] = self._get_tsq_event(event_name)()
+            return r
 
     @property
     def raw(self):
-        return self._raw_tsq()()
+        if self._raw is None:
+            self._raw = self._raw_tsq()()
+        return self._raw
+
+    def invalidate(self):
+        """Forget the TSQ table and every event read so far."""
+        self._raw = self._tsq = None
+        self._events.clear()
+        self._event_cache.clear()
+
+    @property
+    def tev_path(self):
+        return self.path + os.extsep + self._raw_ext
+
+    def blocks(self, event_name):
+        """Return a read-only view of the TEV blocks of an event.
+
+        Parameters
+        ----------
+        event_name : str
+
+        Returns
+        -------
+        blocks : array_like
+            An ``(nblocks, block_size)`` array backed by a memory map of the
+            TEV file, one row per TSQ row of `event_name`. No data are read
+            until the view is indexed.
+        """
+        meta, dtype, block_size = self.tsq(event_name)
+        return _block_view(_tev_memmap(self.tev_path),
+                           meta.fp_loc.values.astype(np.int64), block_size,
+                           dtype)
 
     def _tev(self, event_name, clean):
         """Return the data from a particular event.
@@ -272,7 +378,121 @@ class TdtTank(StringMixin):
         tev : SpikeDataFrame
             The raw data from the TEV file
         """
-        return self._read_tev(event_name, clean)()
+        key = event_name, clean
+        tev = self._event_cache.get(key)
+
+        if tev is None:
+            tev = self._read_tev(event_name, clean)()
+
+            if self._event_cache.put(key, tev):
+                tev = tev.copy()
+
+        return tev
+
+    def read_stores(self, event_names, clean=None):
+        """Read several events with a single pass over the TEV file.
+
+        Tanks usually interleave the blocks of their stream events, so
+        reading them together fetches every part of the file once instead of
+        once per event.
+
+        Parameters
+        ----------
+        event_names : sequence of str
+        clean : bool, optional
+            Whether to remove the first principal component of each event.
+            Defaults to the tank's `clean` attribute.
+
+        Returns
+        -------
+        events : dict
+            A SpikeDataFrame per event name, each indexed at the event's own
+            sampling rate.
+        """
+        if clean is None:
+            clean = self.clean
+
+        events = {}
+        todo = []
+
+        for event_name in event_names:
+            tev = self._event_cache.get((event_name, clean))
+
+            if tev is not None:
+                events[event_name] = tev
+            elif event_name not in todo:
+                todo.append(event_name)
+
+        if todo:
+            read = self._read_stores(todo, clean)()
+
+            for event_name, tev in zip(todo, read):
+                if self._event_cache.put((event_name, clean), tev):
+                    tev = tev.copy()
+
+                events[event_name] = tev
+
+        return events
+
+    @thunkify
+    def _read_stores(self, event_names, clean):
+        chans = self.electrode_map.channel
+        nchans = chans.size
+        plans = []
+        fp_locs, starts, block_sizes, fmts, itemsizes = [], [], [], [], []
+        offset = 0
+
+        # every event gets an (nsamples, nchans) column-major slab of one
+        # flat output, so that each block is a contiguous run of it
+        for event_name in event_names:
+            meta, dtype, block_size = self.tsq(event_name)
+            dtype = np.dtype(dtype)
+            nslots = _channel_slots(meta.channel.values, chans)
+            nsamples = nslots * block_size
+            keep, cols, slots = _block_destinations(meta.channel.values, chans,
+                                                    nslots)
+            nblocks = cols.size
+
+            fp_locs.append(meta.fp_loc.values[keep].astype(np.int64))
+            starts.append(offset + cols * nsamples + slots * block_size)
+            block_sizes.append(np.repeat(block_size, nblocks))
+            fmts.append(np.repeat(_format_code(dtype), nblocks))
+            itemsizes.append(np.repeat(dtype.itemsize, nblocks))
+
+            out_dtype = _sample_dtype(dtype, self.sample_dtype, self.scale,
+                                  clean)
+            plans.append((event_name, dtype, out_dtype, offset, nsamples))
+            offset += nsamples * nchans
+
+        fp_locs = np.concatenate(fp_locs)
+        starts = np.concatenate(starts).astype(np.int64)
+        block_sizes = np.concatenate(block_sizes).astype(np.intp)
+        fmts = np.concatenate(fmts).astype(np.intc)
+        itemsizes = np.concatenate(itemsizes).astype(np.intp)
+
+        flat = np.empty((offset, 1), dtype=np.result_type(*[plan[2] for plan
+                                                            in plans]))
+        order, runs = _coalesce_blocks(fp_locs, block_sizes * itemsizes)
+        _multi_reader(self.tev_path, fp_locs[order], starts[order],
+                      block_sizes[order], fmts[order], itemsizes[order], runs,
+                      flat)
+
+        columns = np.arange(nchans)
+        events = []
+
+        for event_name, dtype, out_dtype, lo, nsamples in plans:
+            out = flat[lo:lo + nsamples * nchans, 0]
+            out = out.reshape(nsamples, nchans, order='F')
+            fs = self.fs[event_name]
+            index = self._create_index(self.datetime, fs, nsamples)
+            sdf = _finish_read(out.astype(out_dtype, copy=False), dtype,
+                               index, self.electrode_map, clean, columns,
+                               self.scale)
+            sdf.isclean = clean
+            sdf._start, sdf._fs = self.datetime, fs
+            events.append(sdf)
+
+        return events
 
     @thunkify
     def _read_tev(self, event_name, clean):
@@ -289,36 +509,166 @@ class TdtTank(StringMixin):
         Raises
         ------
         ValueError
-            If there are duplicate file pointer locations
+            * If there are duplicate file pointer locations
+            * If a channel of the electrode map has no blocks
 
         See Also
         --------
         span.tdt.SpikeDataFrame
         """
         meta, dtype, block_size = self.tsq(event_name)
+        return self._read_blocks(event_name, meta, dtype, block_size,
+                                 self.datetime, clean)
+
+    def read(self, event_name, start=None, end=None, channels=None,
+             shanks=None, clean=None):
+        """Read the part of an event that lies within a time window and on a
+        subset of the electrodes.
+
+        Only the TEV blocks whose time span overlaps ``[start, end)`` and
+        whose channel is selected are read from disk.
+
+        Parameters
+        ----------
+        event_name : str
+        start, end : number, timedelta, datetime or str, optional
+            Bounds of the window. Numbers and timedeltas are offsets in
+            seconds from the start of the recording, anything else is
+            converted to a ``Timestamp``. Defaults to the start and end of
+            the event.
+        channels, shanks : int or sequence of int, optional
+            Electrodes to read, see :meth:`ElectrodeMap.select`. Defaults to
+            every electrode.
+        clean : bool, optional
+            Defaults to the value the tank was created with.
+
+        Returns
+        -------
+        d : SpikeDataFrame
+        """
+        if clean is None:
+            clean = self.clean
+
+        meta, dtype, block_size, columns = self._select(event_name, channels,
+                                                        shanks)
+        lo = _to_epoch_seconds(start, self._tstart, -np.inf)
+        hi = _to_epoch_seconds(end, self._tstart, np.inf)
+        return self._read_window(event_name, meta, dtype, block_size, columns,
+                                 lo, hi, clean)
 
-        nchannels = meta.channel.dropna().nunique()
-        nblocks = meta.shape[0]
-        nsamples = nblocks * block_size // nchannels
+    def iter_chunks(self, event_name, duration='60s', overlap=None,
+                    channels=None, shanks=None, clean=None):
+        """Iterate over an event in chunks of bounded size.
 
-        # raw ndarray for data
-        spikes = DataFrame(np.empty((nblocks, block_size), dtype=dtype))
+        Only the TEV blocks of the current chunk are held in memory.
+
+        Parameters
+        ----------
+        event_name : str
+        duration : str, number or timedelta, optional
+            Length of each chunk, either a pandas offset string or a number
+            of seconds. Defaults to 60 seconds.
+        overlap : str, number or timedelta, optional
+            Length of time shared by consecutive chunks. Defaults to no
+            overlap.
+        channels, shanks : int or sequence of int, optional
+            Electrodes to read, see :meth:`ElectrodeMap.select`.
+        clean : bool, optional
+            Defaults to the value the tank was created with.
+
+        Raises
+        ------
+        ValueError
+            * If `overlap` is not shorter than `duration`
+
+        Returns
+        -------
+        chunks : generator of SpikeDataFrame
+        """
+        if clean is None:
+            clean = self.clean
+
+        length = _to_seconds(duration)
+        step = length - _to_seconds(overlap or 0)
+
+        if step <= 0:
+            raise ValueError('overlap must be shorter than duration')
+
+        meta, dtype, block_size, columns = self._select(event_name, channels,
+                                                        shanks)
+        ts = meta.timestamp.values
+        end = ts[-1] + block_size / self.fs[event_name]
+        lo = ts[0]
+
+        while lo < end:
+            yield self._read_window(event_name, meta, dtype, block_size,
+                                    columns, lo, min(lo + length, end), clean)
+            lo += step
+
+    def _select(self, event_name, channels, shanks):
+        meta, dtype, block_size = self.tsq(event_name)
+        columns = self.electrode_map.select(channels, shanks)
+
+        if columns.size != self.electrode_map.nchannel:
+            chans = self.electrode_map.channel[columns]
+            meta = meta[meta.channel.isin(chans).values]
+
+        return meta, dtype, block_size, columns
+
+    def _read_window(self, event_name, meta, dtype, block_size, columns, lo,
+                     hi, clean):
+        fs = self.fs[event_name]
+        ts = meta.timestamp.values
+
+        # blocks are sorted by time, keep those that overlap [lo, hi)
+        first = ts.searchsorted(lo - block_size / fs, side='right')
+        last = ts.searchsorted(hi, side='left')
+        assert first < last, 'no %s data in the requested window' % event_name
+
+        selected = meta.iloc[first:last]
+        ts0 = ts[first]
+
+        # index by whole samples from the start, as a full read does
+        offset = int(round((ts0 - ts[0]) * fs / block_size)) * block_size
+        sdf = self._read_blocks(event_name, selected, dtype, block_size,
+                                self.datetime, clean, columns, offset)
+
+        # trim the partially overlapping blocks at either end
+        n = sdf.nsamples
+        i, j = np.clip(np.ceil((np.array([lo, hi]) - ts0) * fs), 0, n)
+        return sdf._with_metadata(sdf.iloc[int(i):int(j)])
+
+    def _read_blocks(self, event_name, meta, dtype, block_size, start, clean,
+                     columns=None, offset=0):
+        if columns is None:
+            columns = np.arange(self.electrode_map.nchannel)
+
+        chans = self.electrode_map.channel[columns]
+        nsamples = _channel_slots(meta.channel.values, chans) * block_size
 
         # realign
-        meta.reset_index(drop=True, inplace=True)
+        meta = meta.reset_index(drop=True)
 
-        # convert timestamps to datetime objects
-        meta.timestamp = fromtimestamp(meta.timestamp)
         meta.fp_loc = meta.fp_loc.astype(int)
 
-        index = _create_ns_datetime_index(self.datetime, self.fs[event_name],
-                                          nsamples)
-        tev_name = self.path + os.extsep + self._raw_ext
-        sdf = _read_tev(tev_name, meta, block_size, spikes, index,
-                        self.electrode_map, clean)
+        fs = self.fs[event_name]
+        index = self._create_index(start, fs, nsamples, offset)
+
+        out_dtype = _sample_dtype(dtype, self.sample_dtype, self.scale,
+                                  clean)
+        reader = _read_tev_mmap if self.mmap else _read_tev
+        sdf = reader(self.tev_path, meta, block_size, dtype, index,
+                     self.electrode_map, clean, columns, out_dtype,
+                     self.scale)
         sdf.isclean = clean
+        sdf._start, sdf._fs = start, fs
         return sdf
 
+    def _create_index(self, start, fs, nsamples, offset=0):
+        if self.sample_index:
+            return _create_sample_index(nsamples, offset=offset)
+        return _create_ns_datetime_index(start, fs, nsamples, offset=offset)
+
     def __hash__(self):
         return hash(self.datetime)
 
@@ -368,71 +718,703 @@ PandasTank = TdtTank
 Tank = PandasTank
 
 
-def _create_ns_datetime_index(start, fs, nsamples, name='datetime'):
-    """Create a DatetimeIndex in nanoseconds
+class _EventCache(object):
+    """Least recently used cache of frames bounded by their total size.
+
+    The cache holds on to the frames it is given and hands out copies, so
+    changing a frame that came out of it never changes what a later read
+    returns. A frame that went in must not be changed afterwards.
+
+    Parameters
+    ----------
+    max_bytes : int or None
+        The most bytes to hold, ``None`` for no limit.
+    """
+    def __init__(self, max_bytes):
+        super(_EventCache, self).__init__()
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key):
+        try:
+            value, nbytes = self._data.pop(key)
+        except KeyError:
+            return None
+
+        # move to the most recently used end
+        self._data[key] = value, nbytes
+        return value.copy()
+
+    def put(self, key, value):
+        """Keep `value` around if it fits.
+
+        Returns
+        -------
+        kept : bool
+            Whether the cache holds on to `value`, which the caller then
+            must not hand out.
+        """
+        self.pop(key)
+        max_bytes = self.max_bytes
+
+        if max_bytes == 0:
+            return False
+
+        nbytes = value.values.nbytes + value.index.nbytes
+
+        if max_bytes is not None and nbytes > max_bytes:
+            return False
+
+        self._data[key] = value, nbytes
+        self.nbytes += nbytes
+
+        while max_bytes is not None and self.nbytes > max_bytes:
+            _, (_, n) = self._data.popitem(last=False)
+            self.nbytes -= n
+
+        return True
+
+    def pop(self, key):
+        try:
+            _, nbytes = self._data.pop(key)
+        except KeyError:
+            return
+        self.nbytes -= nbytes
+
+    def clear(self):
+        self._data.clear()
+        self.nbytes = 0
+
+
+def _create_sample_index(nsamples, name='sample', offset=0):
+    """Create an index of sample numbers.
 
     Parameters
     ----------
-    start : datetime
-    fs : float
     nsamples : int
     name : str, optional
+    offset : int, optional
+        The first sample number.
+
+    Returns
+    -------
+    index : RangeIndex
+        Takes constant memory, no matter how many samples there are.
+    """
+    return pd.RangeIndex(offset, offset + nsamples, name=name)
+
+
+def _parse_tsq(tsq_name, dtype):
+    """Read a TSQ file into a DataFrame.
+
+    Parameters
+    ----------
+    tsq_name : str
+    dtype : dtype
+        The TSQ record layout.
+
+    Returns
+    -------
+    tsq : DataFrame
+    """
+    # read in the raw data as a numpy rec array and convert to
+    # DataFrame
+    return _tsq_frame(np.fromfile(tsq_name, dtype), dtype)
+
+
+def _tsq_frame(records, dtype):
+    """Convert raw TSQ records to a DataFrame.
+
+    Parameters
+    ----------
+    records : array_like
+        TSQ records with layout `dtype`.
+    dtype : dtype
+        The TSQ record layout.
+
+    Returns
+    -------
+    tsq : DataFrame
+    """
+    tsq = DataFrame(records)
+    inds = tsq.strobe <= np.finfo(np.float64).eps
+    tsq.strobe[inds] = NA
+
+    # zero based indexing
+    tsq.channel -= 1.0
 
-    returns
+    # -1s are invalid
+    tsq.channel[tsq.channel == -1.0] = NA
+
+    tsq.type = TdtEventTypes[tsq.type].values
+    tsq.format = TdtDataTypes[tsq.format].values
+
+    tsq.timestamp[np.logical_not(tsq.timestamp)] = NA
+    tsq.fs[np.logical_not(tsq.fs)] = NA
+
+    # trim the fat
+    stream = tsq.type == 'stream'
+    tsq.size.ix[stream] -= dtype.itemsize / dtype['size'].itemsize
+
+    not_null_strobe = tsq.strobe.notnull()
+
+    for key in ('channel', 'sort_code', 'fp_loc'):
+        try:
+            tsq[key][not_null_strobe] = NA
+        except ValueError:
+            tsq[key] = tsq[key].astype(np.float64)
+            tsq[key][not_null_strobe] = NA
+
+    return tsq
+
+
+def _summarize_tsq(tsq):
+    """Compute the recording-wide quantities of a TSQ table.
+
+    Parameters
+    ----------
+    tsq : DataFrame
+
+    Returns
+    -------
+    summary : dict
+        ``tstart`` and ``tend`` in seconds since the epoch, ``names``, the
+        event names indexed by their TDT number, and ``fs``, the sampling
+        rate of each event indexed by name.
+    """
+    not_na_ts = tsq.timestamp.dropna()
+    unames = tsq.name.unique()
+    names = Series(num2name(unames), index=unames, dtype=object)
+    names[names == ''] = NA
+
+    # first nonnull sampling rate of each named event
+    valid = names.dropna()
+    fs = tsq.fs.groupby(tsq.name.values).first().reindex(valid.index)
+    return {'tstart': not_na_ts.head(1).item(),
+            'tend': not_na_ts.tail(1).item(), 'names': names,
+            'fs': Series(fs.values, index=valid.values)}
+
+
+def _scan_tsq(tsq_name, dtype, nrecords=2 ** 12):
+    """Summarize a TSQ file without reading all of it.
+
+    Parameters
+    ----------
+    tsq_name : str
+    dtype : dtype
+        The TSQ record layout.
+    nrecords : int, optional
+        Number of records read from the start and from the end of the file
+        and, roughly, of records sampled in between.
+
+    Returns
+    -------
+    summary : dict
+        The same quantities as :func:`_summarize_tsq` computes. The start
+        and end come from the first and last records, the event names and
+        sampling rates from the sample.
+    """
+    n = os.path.getsize(tsq_name) // dtype.itemsize
+    records = np.memmap(tsq_name, dtype=dtype, mode='r', shape=(n,))
+    step = max(n // nrecords, 1)
+
+    # order matters: the first and last timestamps are the recording's span
+    sample = np.concatenate((records[:nrecords], records[::step],
+                             records[-nrecords:]))
+    del records
+    return _summarize_tsq(_tsq_frame(sample, dtype))
+
+
+_TSQ_CACHE_VERSION = 1
+_TSQ_CACHE_EXT = 'npz'
+
+
+def _tsq_fingerprint(tsq_name):
+    st = os.stat(tsq_name)
+    return np.array([_TSQ_CACHE_VERSION, st.st_size, st.st_mtime])
+
+
+def _tsq_cache_name(tsq_name, cache_dir=None):
+    """Return the name of the cache file of `tsq_name`.
+
+    The cache file sits next to the TSQ file unless `cache_dir` is given, in
+    which case a hash of the TSQ file's directory keeps tanks with the same
+    name apart.
+    """
+    if cache_dir is None:
+        return tsq_name + os.extsep + _TSQ_CACHE_EXT
+
+    dirname, basename = os.path.split(os.path.abspath(tsq_name))
+    digest = hashlib.md5(dirname.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(cache_dir, '%s-%s%s%s' % (basename, digest, os.extsep,
+                                                  _TSQ_CACHE_EXT))
+
+
+def _load_tsq_cache(tsq_name, cache_dir=None):
+    """Load a parsed TSQ file from its cache file.
+
+    Parameters
+    ----------
+    tsq_name : str
+    cache_dir : str or None, optional
+        Directory of the cache file, ``None`` means next to `tsq_name`.
+
+    Returns
+    -------
+    cached : tuple of (DataFrame, dict) or None
+        ``None`` if there's no cache file or it is stale.
+    """
+    try:
+        with np.load(_tsq_cache_name(tsq_name, cache_dir)) as npz:
+            if not np.array_equal(npz['fingerprint'],
+                                  _tsq_fingerprint(tsq_name)):
+                return None
+
+            columns = npz['columns']
+            tsq = DataFrame(dict((c, npz['col_' + c]) for c in columns),
+                            columns=columns)
+            tsq.type = tsq.type.astype(object)
+            tsq.format = tsq.format.astype(object)
+
+            names = Series(npz['names'].astype(object),
+                           index=npz['names_index'])
+            names[names == ''] = NA
+            summary = {'tstart': npz['span'][0], 'tend': npz['span'][1],
+                       'names': names,
+                       'fs': Series(npz['fs'], index=npz['fs_index'])}
+    except (IOError, OSError, KeyError, ValueError, BadZipfile):
+        return None
+
+    return tsq, summary
+
+
+def _save_tsq_cache(tsq_name, tsq, summary, cache_dir=None):
+    """Write a parsed TSQ file to its cache file.
+
+    Failing to write the cache file, e.g., in a read-only directory, is not
+    an error.
+    """
+    names = summary['names']
+    arrays = dict(('col_' + c, tsq[c].values) for c in tsq.columns)
+    arrays['col_type'] = tsq.type.values.astype(np.str_)
+    arrays['col_format'] = tsq.format.values.astype(np.str_)
+    arrays.update(fingerprint=_tsq_fingerprint(tsq_name),
+                  columns=np.asarray(tsq.columns, dtype=np.str_),
+                  names=names.fillna('').values.astype(np.str_),
+                  names_index=names.index.values,
+                  fs=summary['fs'].values,
+                  fs_index=summary['fs'].index.values.astype(np.str_),
+                  span=np.array([summary['tstart'], summary['tend']]))
+
+    cache_name = _tsq_cache_name(tsq_name, cache_dir)
+    dirname = os.path.dirname(cache_name) or os.curdir
+
+    try:
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+
+        f = tempfile.NamedTemporaryFile(dir=dirname, delete=False)
+    except (IOError, OSError):
+        return
+
+    # write then rename so concurrent readers never see a partial file
+    try:
+        with f:
+            np.savez(f, **arrays)
+        os.rename(f.name, cache_name)
+    except (IOError, OSError):
+        try:
+            os.remove(f.name)
+        except OSError:
+            pass
+
+
+def _to_epoch_seconds(t, origin, default):
+    """Convert a time window bound to seconds since the epoch.
+
+    Parameters
+    ----------
+    t : number, timedelta, datetime, str or None
+        Numbers and timedeltas are taken as offsets in seconds from `origin`.
+    origin : float
+        Seconds since the epoch of the start of the recording.
+    default : float
+        The value to return if `t` is ``None``.
+
+    Returns
     -------
-    index : DatetimeIndex
+    secs : float
     """
-    ns = int(1e9 / fs)
-    dtstart = np.datetime64(start)
-    dt = dtstart + np.arange(nsamples) * np.timedelta64(ns, 'ns')
-    freq = ns * pd.datetools.Nano()
-    return DatetimeIndex(dt, freq=freq, name=name, tz=LOCAL_TZ)
+    if t is None:
+        return default
+
+    if isinstance(t, (numbers.Real, np.number)):
+        return origin + t
+
+    if isinstance(t, (datetime.timedelta, np.timedelta64)):
+        return origin + np.timedelta64(t, 'ns').astype(np.int64) / 1e9
 
+    ts = pd.Timestamp(t)
 
-def _reshape_spikes(df, group_inds):
-    out = df.take(group_inds, axis=0)
-    shp = out.shape
-    shpsrt = np.argsort(shp)[::-1]
-    nchannels = shp[shpsrt[-1]]
-    return out.transpose(shpsrt).reshape(out.size // nchannels, -1)
+    # TSQ timestamps are wall clock time, naive datetimes are local time
+    if ts.tzinfo is not None:
+        return ts.value / 1e9
 
+    return time.mktime(ts.timetuple()) + ts.microsecond / 1e6
 
-def _read_tev(filename, meta, block_size, spikes, index, electrode_map, clean):
+
+def _read_tev(filename, meta, block_size, dtype, index, electrode_map, clean,
+              columns, out_dtype=np.float64, scale=None):
     assert isinstance(filename, basestring), 'filename must be a string'
     assert isinstance(block_size, (numbers.Integral, np.integer)), \
         'block_size must be an integer'
     assert ispower2(block_size), 'block_size must be a power of 2'
-    assert isinstance(spikes, DataFrame), 'spikes must be a DataFrame'
-    assert spikes.shape[1] == block_size, \
-        'number of columns of spikes must equal block_size'
     assert isinstance(index, pd.Index), 'index must be an instance of Index'
 
-    return _read_tev_impl(filename, meta, block_size, spikes, index,
-                          electrode_map, clean)
+    return _read_tev_impl(filename, meta, block_size, dtype, index,
+                          electrode_map, clean, columns, out_dtype, scale)
+
+
+_scatter_reader = _read_tev_scatter
+_multi_reader = _read_tev_multi
+
+
+def _sample_dtype(dtype, requested, scale, clean=False):
+    """Return the type samples of a store with type `dtype` are read into.
 
+    Parameters
+    ----------
+    dtype : dtype
+        The type the store was recorded with.
+    requested : dtype or None
+        The type asked for by the caller, ``None`` means the native type.
+    scale : float or None
+        Scaling factor applied to integer stores.
+    clean : bool or str, optional
+        Whether the first principal component is removed, which needs a
+        floating point type to hold ``NaN``.
+
+    Returns
+    -------
+    out_dtype : dtype
+    """
+    if requested is not None:
+        return np.dtype(requested)
 
-_raw_reader = _read_tev_raw
+    dtype = np.dtype(dtype)
 
+    if (scale is not None or clean) and dtype.kind in 'iu':
+        return np.dtype(np.float32)
 
-def _read_tev_impl(filename, meta, block_size, spikes, index, electrode_map,
-                   clean):
-    fp_loc, channel = meta.fp_loc, meta.channel
-    _raw_reader(filename, fp_loc.values, block_size, spikes.values)
+    return dtype
 
-    items = spikes.groupby(channel).indices.items()
-    items.sort()
 
-    d = OrderedDict(items)
+def _finish_read(out, dtype, index, electrode_map, clean, columns, scale):
+    if scale is not None and np.dtype(dtype).kind in 'iu':
+        out *= scale
 
-    group_inds = np.column_stack(d.itervalues())
-    reshaped = _reshape_spikes(spikes.values, group_inds)
-    raw = reshaped.take(electrode_map.channel, axis=1)
-    df = SpikeDataFrame(raw, index, electrode_map.index, dtype=float)
-    if clean:
+    df = SpikeDataFrame(out, index, electrode_map.index.take(columns),
+                        copy=False)
+    if clean == 'streaming':
+        remove_first_pc_streaming(df)
+    elif clean:
         remove_first_pc(df)
     return df
 
 
+def _format_code(dtype):
+    """Return the TDT data format code of `dtype`."""
+    name = np.dtype(dtype).name
+    return TdtDataTypes.index[(TdtDataTypes == name).values][0]
+
+
+def _read_tev_impl(filename, meta, block_size, dtype, index, electrode_map,
+                   clean, columns, out_dtype=np.float64, scale=None):
+    chans = electrode_map.channel[columns]
+    nsamples = index.size
+    out = np.empty((nsamples, chans.size), dtype=out_dtype)
+
+    keep, cols, slots = _block_destinations(meta.channel.values, chans,
+                                            nsamples // block_size)
+    fp_locs = meta.fp_loc.values[keep].astype(np.int64)
+    itemsize = np.dtype(dtype).itemsize
+    order, runs = _coalesce_blocks(fp_locs, block_size * itemsize)
+    _scatter_reader(filename, fp_locs[order], cols[order], slots[order],
+                    runs, block_size, _format_code(dtype), itemsize, out)
+    return _finish_read(out, dtype, index, electrode_map, clean, columns,
+                        scale)
+
+
+def _coalesce_blocks(fp_locs, num_bytes, max_gap=2 ** 16, max_run=2 ** 23):
+    """Group blocks into runs that can be fetched with one read each.
+
+    Parameters
+    ----------
+    fp_locs : array_like
+        Byte offset of each block.
+    num_bytes : int or array_like
+        Number of bytes in a block, or in each block.
+    max_gap : int, optional
+        Largest number of unused bytes between two blocks of the same run.
+        Reading through a small gap is cheaper than issuing another read.
+    max_run : int, optional
+        Rough upper bound on the number of bytes covered by a run, this also
+        bounds the read buffer each thread needs.
+
+    Returns
+    -------
+    order : array_like
+        Indices that sort the blocks by `fp_locs`.
+    runs : array_like
+        Run ``k`` spans sorted blocks ``runs[k]`` through
+        ``runs[k + 1] - 1``.
+    """
+    fp_locs = np.asarray(fp_locs, dtype=np.int64)
+    order = np.argsort(fp_locs, kind='mergesort')
+    srt = fp_locs[order]
+    n = srt.size
+
+    if not n:
+        return order, np.zeros(1, dtype=np.intp)
+
+    num_bytes = np.asarray(num_bytes)
+
+    if num_bytes.ndim:
+        num_bytes = num_bytes[order][:-1]
+
+    gaps = srt[1:] - srt[:-1] - num_bytes
+    starts = np.r_[0, np.flatnonzero((gaps < 0) | (gaps > max_gap)) + 1]
+
+    # split runs that grow beyond max_run bytes
+    counts = np.diff(np.r_[starts, n])
+    offset = srt - np.repeat(srt[starts], counts)
+    chunk = offset // max_run
+    splits = np.flatnonzero(np.diff(chunk) > 0) + 1
+    starts = np.union1d(starts, splits)
+
+    return order, np.r_[starts, n].astype(np.intp)
+
+
+def _tev_memmap(filename):
+    """Memory map a TEV file as read-only bytes."""
+    return np.memmap(filename, dtype=np.uint8, mode='r')
+
+
+def _block_view(tev, fp_loc, block_size, dtype):
+    """Create an ``(nblocks, block_size)`` view of the blocks in `tev`.
+
+    Parameters
+    ----------
+    tev : array_like
+        Memory mapped bytes of a TEV file.
+    fp_loc : array_like
+        Byte offset of each block in `tev`.
+    block_size : int
+        Number of samples in a block.
+    dtype : dtype
+        Sample type of the blocks.
+
+    Returns
+    -------
+    blocks : array_like
+        A strided view of `tev` if the blocks are evenly spaced, which is the
+        usual layout of a stream event, otherwise a copy of the blocks.
+    """
+    dtype = np.dtype(dtype)
+    fp_loc = np.asarray(fp_loc, dtype=np.int64)
+    nblocks, itemsize = fp_loc.size, dtype.itemsize
+
+    if not nblocks:
+        return np.empty((0, block_size), dtype=dtype)
+
+    steps = np.diff(fp_loc)
+
+    if not steps.size:
+        stride = block_size * itemsize
+    else:
+        stride = steps[0]
+
+    if stride > 0 and (steps == stride).all():
+        return np.ndarray((nblocks, block_size), dtype=dtype, buffer=tev,
+                          offset=fp_loc[0], strides=(stride, itemsize))
+
+    out = np.empty((nblocks * block_size, 1), dtype=dtype)
+    _copy_blocks(tev, fp_loc, np.zeros(nblocks, dtype=np.intp),
+                 np.arange(nblocks), block_size, dtype, out)
+    return out.reshape(nblocks, block_size)
+
+
+def _copy_blocks(tev, fp_locs, columns, slots, block_size, dtype, out):
+    """Copy blocks from `tev` into `out` in channel-major order.
+
+    Blocks are copied one run of neighbouring blocks at a time, straight from
+    the memory map, so no more than a run is ever held in an intermediate
+    array.
+
+    Parameters
+    ----------
+    tev : array_like
+        Memory mapped bytes of a TEV file.
+    fp_locs : array_like
+        Byte offset of each block in `tev`.
+    columns, slots : array_like
+        The output column and the block number within that column of each
+        block.
+    block_size : int
+        Number of samples in a block.
+    dtype : dtype
+        Sample type of the blocks.
+    out : array_like
+        ``(nsamples, nchannels)`` output array.
+    """
+    dtype = np.dtype(dtype)
+    itemsize = dtype.itemsize
+    nsamples, nchannels = out.shape
+    nslots = nsamples // block_size
+
+    fp_locs = np.asarray(fp_locs, dtype=np.int64)
+    columns, slots = np.asarray(columns), np.asarray(slots)
+    order, runs = _coalesce_blocks(fp_locs, block_size * itemsize)
+
+    # a trailing partial block of rows is left alone
+    whole = out[:nslots * block_size].reshape(nslots, block_size, nchannels)
+
+    for start, stop in zip(runs[:-1], runs[1:]):
+        inds = order[start:stop]
+        locs = fp_locs[inds]
+        steps = np.diff(locs)
+
+        if not steps.size or (steps == steps[0]).all():
+            stride = steps[0] if steps.size else block_size * itemsize
+            blocks = np.ndarray((locs.size, block_size), dtype=dtype,
+                                buffer=tev, offset=locs[0],
+                                strides=(stride, itemsize))
+            whole[slots[inds], :, columns[inds]] = blocks
+        else:
+            for i, loc in zip(inds, locs):
+                block = tev[loc:loc + block_size * itemsize].view(dtype)
+                whole[slots[i], :, columns[i]] = block
+
+    return out
+
+
+def _channel_columns(channel, channels):
+    """Return the position of each element of `channel` in `channels`."""
+    channels = np.asarray(channels)
+    lookup = np.empty(max(channels.max(), np.max(channel)) + 1, dtype=np.intp)
+    lookup.fill(-1)
+    lookup[channels] = np.arange(channels.size)
+    return lookup[channel]
+
+
+def _block_slots(channel):
+    """Return the position of each block within the blocks of its channel.
+
+    Parameters
+    ----------
+    channel : array_like
+        The channel of each block, in file order.
+
+    Returns
+    -------
+    slots : array_like
+        ``slots[i]`` is the number of blocks of ``channel[i]`` that come
+        before block ``i``.
+    """
+    channel = np.asarray(channel)
+    n = channel.size
+    order = np.argsort(channel, kind='mergesort')
+    srt = channel[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(srt)) + 1]
+    counts = np.diff(np.r_[starts, n])
+    slots = np.empty(n, dtype=np.intp)
+    slots[order] = np.arange(n) - np.repeat(starts, counts)
+    return slots
+
+
+def _block_destinations(channel, channels, nslots):
+    """Compute where each block goes in a channel-major array.
+
+    Parameters
+    ----------
+    channel : array_like
+        The channel of each block, in file order.
+    channels : array_like
+        The channel of each column of the output.
+    nslots : int
+        The number of blocks per channel that fit in the output.
+
+    Returns
+    -------
+    keep : array_like
+        Boolean mask of the blocks that are part of the output.
+    columns, slots : array_like
+        The output column and the block number within that column of each
+        kept block.
+    """
+    columns = _channel_columns(channel, channels)
+    slots = _block_slots(channel)
+
+    # drop blocks of other channels and trailing blocks of channels with
+    # more blocks than the others
+    keep = (slots < nslots) & (columns >= 0)
+    return keep, columns[keep], slots[keep]
+
+
+def _channel_slots(channel, channels):
+    """Return the number of blocks that every channel in `channels` has.
+
+    Parameters
+    ----------
+    channel : array_like
+        The channel of each block.
+    channels : array_like
+        The channels being read.
+
+    Raises
+    ------
+    ValueError
+        If a channel in `channels` has no blocks.
+
+    Returns
+    -------
+    nslots : int
+        The smallest number of blocks of a channel in `channels`, any later
+        blocks of the other channels don't fit in the output.
+    """
+    channels = np.asarray(channels)
+    columns = _channel_columns(channel, channels)
+    counts = np.bincount(columns[columns >= 0], minlength=channels.size)
+    missing = channels[counts == 0]
+
+    if missing.size:
+        raise ValueError('no blocks for channel(s) %s'
+                         % ', '.join(map(str, missing)))
+
+    return int(counts.min())
+
+
+def _read_tev_mmap(filename, meta, block_size, dtype, index, electrode_map,
+                   clean, columns, out_dtype=np.float64, scale=None):
+    chans = electrode_map.channel[columns]
+    nsamples = index.size
+    out = np.empty((nsamples, chans.size), dtype=out_dtype)
+
+    keep, cols, slots = _block_destinations(meta.channel.values, chans,
+                                            nsamples // block_size)
+    _copy_blocks(_tev_memmap(filename), meta.fp_loc.values[keep], cols,
+                 slots, block_size, dtype, out)
+    return _finish_read(out, dtype, index, electrode_map, clean, columns,
+                        scale)
+
+
 if __name__ == '__main__':
     from span import ElectrodeMap, NeuroNexusMap
     span_data_path = os.environ['SPAN_DATA_PATH']
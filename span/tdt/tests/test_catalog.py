@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+
+import numpy as np
+
+from span.tdt import catalog as tdt_catalog
+from span.tdt.catalog import find_tanks, build_catalog, _catalog_record
+from span.testing import create_tank
+
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.paths = [os.path.join(self.root, 'Spont_Spikes_p17rat_s4'),
+                      os.path.join(self.root, 'sub', 'Spont_Spikes_p21_s2')]
+        os.mkdir(os.path.join(self.root, 'sub'))
+
+        for path in self.paths:
+            create_tank(path)
+
+        # a TSQ file without its TEV file isn't a tank
+        with open(os.path.join(self.root, 'orphan.tsq'), 'wb') as f:
+            f.write(b'\0')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_find_tanks(self):
+        self.assertEqual(find_tanks(self.root), sorted(self.paths))
+
+    def test_build_catalog(self):
+        for processes in (1, 2):
+            catalog = build_catalog(self.root, processes=processes)
+            self.assertEqual(list(catalog.index), sorted(self.paths))
+            self.assertEqual(sorted(catalog.age), [17, 21])
+            self.assertEqual(sorted(catalog.site), [2, 4])
+            self.assertTrue((catalog.stores == 'Spik').all())
+            np.testing.assert_allclose(catalog.fs_Spik, 1024.0)
+            self.assertTrue(catalog.error.isnull().all())
+
+    def test_broken_tank(self):
+        broken = os.path.join(self.root, 'Spont_Spikes_p30_s1')
+        create_tank(broken)
+
+        # shorter than a single TSQ record
+        with open(broken + os.extsep + 'tsq', 'wb') as f:
+            f.write(b'\0')
+
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            catalog = build_catalog(self.root, processes=1)
+
+        self.assertTrue(any(broken in str(x.message) for x in w))
+        self.assertEqual(list(catalog.index), sorted(self.paths + [broken]))
+        self.assertTrue(catalog.error[broken].startswith('ValueError'))
+        self.assertEqual(catalog.tsq_size[broken], 1)
+        self.assertTrue(catalog.error[self.paths].isnull().all())
+
+    def test_unexpected_error(self):
+        def broken_tank(*args, **kwargs):
+            raise KeyError('Spik')
+
+        tank = tdt_catalog.TdtTank
+        tdt_catalog.TdtTank = broken_tank
+
+        try:
+            path, record = _catalog_record(self.paths[0])
+        finally:
+            tdt_catalog.TdtTank = tank
+
+        self.assertEqual(path, self.paths[0])
+        self.assertEqual(record['error'], repr(KeyError('Spik')))
+        self.assertIn('tsq_size', record)
+
+    def test_incremental(self):
+        filename = os.path.join(self.root, 'catalog.h5')
+        catalog = build_catalog(self.root, filename, processes=1)
+
+        os.remove(self.paths[0] + os.extsep + 'tev')
+        create_tank(self.paths[1], nslots=12)
+        new = os.path.join(self.root, 'Spont_Spikes_p30_s1')
+        create_tank(new)
+
+        updated = build_catalog(self.root, filename, processes=1)
+        self.assertEqual(list(updated.index), sorted([self.paths[1], new]))
+        self.assertNotEqual(updated.tsq_size[self.paths[1]],
+                            catalog.tsq_size[self.paths[1]])
@@ -32,6 +32,21 @@ class TestDistanceMap(unittest.TestCase):
         self.assertIsInstance(dm, ndarray)
 
 
+def test_electrode_map_select():
+    from span.tdt.spikeglobals import NeuroNexusMap
+    em = ElectrodeMap(NeuroNexusMap.values, 50, 125)
+    assert em.select().size == em.nchannel
+
+    shank = em.select(shanks=1)
+    assert (em.shank[shank] == 1).all()
+    assert shank.size == em.nchannel // em.nshank
+
+    chan = em.select(channels=[3, 5])
+    assert sorted(em.channel[chan]) == [3, 5]
+
+    nose.tools.assert_raises(ValueError, em.select, channels=[0], shanks=[3])
+
+
 @nose.tools.nottest
 class TestElectrodeMap(unittest.TestCase):
     def tearDown(self):
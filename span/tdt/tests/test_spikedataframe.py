@@ -1,3 +1,4 @@
+import datetime
 import itertools as itools
 
 import numpy as np
@@ -5,10 +6,11 @@ from numpy.random import rand, randint
 from numpy.testing.decorators import slow
 
 import pandas as pd
+from pandas import DataFrame
 from pandas.util.testing import assert_frame_equal
 
 
-from span.tdt.spikedataframe import SpikeDataFrame
+from span.tdt.spikedataframe import SpikeDataFrame, _align_bins
 from span.utils import detrend_mean, detrend_linear, detrend_none
 from span.testing import (assert_all_dtypes, create_spike_df,
                           assert_array_equal, assert_raises,
@@ -66,6 +68,57 @@ class TestSpikeDataFrame(object):
         expected = round((self.spik.nsamples / fs) * fs)
         assert nsamps == expected
 
+    def test_sample_index(self):
+        fs = self.spik.fs
+        start = datetime.datetime(2012, 9, 10, 12)
+        sp = SpikeDataFrame(self.raw, columns=self.spik.columns, start=start,
+                            fs=fs)
+        assert sp.fs == fs
+        assert sp.start == start
+
+        time_index = sp.time_index
+        assert isinstance(time_index, pd.DatetimeIndex)
+        assert time_index.size == sp.nsamples
+        assert time_index.freq is not None
+        assert_array_equal(np.diff(time_index.asi8), int(1e9 / fs))
+
+        sliced = sp.time_slice(0.01, 0.02)
+        assert sliced.fs == fs
+        assert sliced.index[0] == np.ceil(0.01 * fs)
+        assert sliced.index[-1] == np.ceil(0.02 * fs) - 1
+        assert_array_equal(sliced.values,
+                           self.raw[int(np.ceil(0.01 * fs)):
+                                    int(np.ceil(0.02 * fs))])
+        assert_array_equal(sliced.time_index.asi8,
+                           time_index.asi8[sliced.index.values])
+
+        thr = sp.threshold(3 * sp.std())
+        assert thr.fs == fs
+        binned = thr.clear_refrac(2).bin('10L')
+        assert isinstance(binned.index, pd.DatetimeIndex)
+
+    def test_fs_needs_time_index(self):
+        sp = SpikeDataFrame(self.raw, columns=self.spik.columns)
+        assert_raises(ValueError, getattr, sp, 'fs')
+
+    def test_sample_index_metadata(self):
+        fs = self.spik.fs
+        start = datetime.datetime(2012, 9, 10, 12)
+        sp = SpikeDataFrame(self.raw, columns=self.spik.columns, start=start,
+                            fs=fs)
+        derived = (sp.iloc[10:20], sp.iloc[:, :3], sp[sp.columns[:3]],
+                   sp.copy(), sp * 2, sp + sp, -sp)
+
+        for df in derived:
+            assert isinstance(df, SpikeDataFrame)
+            assert df._fs == fs and df.fs == fs
+            assert df._start == start and df.start == start
+
+    def test_time_slice_datetime_index(self):
+        sp = self.spik
+        n = int(np.ceil(0.01 * sp.fs))
+        assert_frame_equal(sp.time_slice(end=0.01), sp.iloc[:n])
+
     def test_threshold_std_array(self):
         sp = self.spik
         std = sp.std()
@@ -95,6 +148,101 @@ class TestSpikeDataFrame(object):
         assert_all_dtypes(thr, np.bool_)
         assert thr.shape == sp.shape
 
+    def test_threshold_float32(self):
+        sp = self.spik.astype(np.float32)
+        std = sp.std()
+        thr = sp.threshold(2.0 * std)
+        expected = self.spik.threshold(2.0 * self.spik.std())
+        assert_all_dtypes(thr, np.bool_)
+        assert isinstance(thr, SpikeDataFrame)
+        assert (thr.values != expected.values).mean() < 1e-4
+
+    def test_std_native(self):
+        for dtype in (np.float32, np.int16):
+            sp = SpikeDataFrame((self.raw * 1e6).astype(dtype),
+                                self.spik.index, self.spik.columns)
+            sp.values[3, 1] = np.nan if dtype == np.float32 else 0
+            expected = DataFrame(sp.values.astype(float)).std().values
+            np.testing.assert_allclose(sp.std().values, expected, rtol=1e-5)
+
+    def test_std_int32(self):
+        # odd values above 2 ** 24 have no float32 representation
+        values = 2 ** 26 + np.random.randint(0, 100, size=self.raw.shape)
+        sp = SpikeDataFrame(values.astype(np.int32), self.spik.index,
+                            self.spik.columns)
+        expected = DataFrame(values.astype(float)).std().values
+        np.testing.assert_allclose(sp.std().values, expected, rtol=1e-10)
+
+    def test_bin(self):
+        thr = self.spik.threshold(3 * self.spik.std())
+
+        for binsize in ('10L', '7L', 'S', '7S'):
+            binned = thr.bin(binsize)
+            expected = thr.resample(binsize, how='sum')
+            assert_array_equal(binned.index.asi8, expected.index.asi8)
+            assert_array_equal(binned.values, expected.values)
+
+        binned = thr.bin(10)
+        n = thr.nsamples // 10 * 10
+        expected = thr.values[:n].reshape(-1, 10, thr.nchannels).sum(axis=1)
+        assert_array_equal(binned.index[:n // 10], thr.index[:n:10])
+        assert_array_equal(binned.values[:n // 10], expected)
+        assert_array_equal(binned.values.sum(axis=0), thr.values.sum(axis=0))
+        assert_raises(ValueError, thr.bin, 10, how='mean')
+
+    def test_bin_type(self):
+        fs = self.spik.fs
+        start = datetime.datetime(2012, 9, 10, 12)
+        thr = self.spik.threshold(3 * self.spik.std())
+        sp = SpikeDataFrame(thr.values, columns=thr.columns, start=start,
+                            fs=fs)
+
+        for df in (thr, sp):
+            for how in ('sum', 'mean'):
+                binned = df.bin('10L', how=how)
+                assert isinstance(binned, SpikeDataFrame)
+                assert isinstance(binned.index, pd.DatetimeIndex)
+                assert binned._fs is None and binned._start is None
+                assert binned.isclean == df.isclean
+
+        binned = sp.bin(10)
+        assert isinstance(binned, SpikeDataFrame)
+        assert binned.fs == fs and binned.start == start
+        assert_array_equal(binned.time_index.asi8,
+                           sp.time_index.asi8[::10])
+
+    def test_bin_multi(self):
+        thr = self.spik.threshold(3 * self.spik.std())
+        bin_sizes = '10L', '7L', 'S', '7S'
+        binned = thr.bin_multi(bin_sizes)
+        assert list(binned.keys()) == list(bin_sizes)
+
+        for bin_size in bin_sizes:
+            assert_frame_equal(binned[bin_size], thr.bin(bin_size))
+
+    def test_bin_spikes(self):
+        sp = self.spik
+        threshes = 2 * sp.std()
+
+        binned = sp.bin_spikes(threshes, '10L', 2)
+        expected = sp.threshold(threshes).clear_refrac(2).bin('10L')
+        assert_array_equal(binned.index.asi8, expected.index.asi8)
+        assert_array_equal(binned.values, expected.values)
+
+    def test_bin_spikes_multi(self):
+        sp = self.spik
+        sd = sp.std()
+        levels = DataFrame(np.outer([2.0, 3.0], sd), index=[2.0, 3.0],
+                           columns=sp.columns)
+        binned = sp.bin_spikes_multi(levels, '10L', 2)
+        assert_array_equal(binned.items, levels.index)
+
+        for level in levels.index:
+            expected = sp.bin_spikes(level * sd, '10L', 2)
+            assert_frame_equal(binned[level], expected)
+
+        assert_raises(ValueError, sp.bin_spikes_multi, np.ones((2, 3)))
+
     def test_clear_refrac(self):
         thr = self.spik.threshold(3 * self.spik.std())
 
@@ -112,6 +260,17 @@ class TestSpikeDataFrame(object):
         assert isinstance(s_new, SpikeDataFrame)
         assert isinstance(s, type(s_new))
 
+    def test_xcorr_lags(self):
+        sp = self.spik
+        binned = sp.threshold(2 * sp.std()).bin('10L')
+        kwargs = dict(detrend=detrend_mean, scale_type='normalize',
+                      nan_auto=True)
+        full = sp.xcorr(binned, **kwargs)
+        xc = sp.xcorr(binned, lags=[-1, 0], **kwargs)
+        assert_array_equal(xc.index, [-1, 0])
+        assert_array_equal(xc.columns, full.columns)
+        np.testing.assert_allclose(xc.values, full.loc[[-1, 0]].values)
+
     @slow
     def test_xcorr(self):
         maxlags = None, 2
@@ -149,3 +308,22 @@ class TestSpikeDataFrame(object):
     def test_basic_jitter(self):
         jittered = self.spik.basic_jitter()
         assert not np.array_equal(jittered, self.spik)
+
+
+def test_align_bins():
+    period = 10 ** 6
+    t0 = 1300000000 * 10 ** 9 + 123456 * period
+
+    # a second divides a day, so its bins start on the second
+    first, width, offset, freq, _ = _align_bins(t0, period, None, 'S')
+    assert first == t0 - t0 % 10 ** 9
+    assert width == 1000.0 and offset == 456.0
+    assert freq.nanos == 10 ** 9
+
+    # seven seconds doesn't, so the first bin starts at the first sample
+    first, width, offset, _, _ = _align_bins(t0, period, None, '7S')
+    assert first == t0
+    assert width == 7000.0 and offset == 0.0
+
+    first, width, _, freq, _ = _align_bins(t0, period, None, 0.25)
+    assert freq.nanos == 25 * 10 ** 7 and width == 250.0
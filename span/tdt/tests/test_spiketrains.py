@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from span.tdt.spiketrains import SpikeTrains
+from span.testing import create_spike_df
+
+
+class TestSpikeTrains(unittest.TestCase):
+    def setUp(self):
+        self.spik = create_spike_df()
+        self.threshes = 2 * self.spik.std()
+        self.ms = 2
+        self.trains = self.spik.spike_trains(self.threshes, self.ms)
+
+    def test_matches_dense(self):
+        dense = self.spik.threshold(self.threshes)
+        cleared = dense.clear_refrac(self.ms)
+        assert_array_equal(self.trains.to_dense(), cleared.values)
+
+        without = self.spik.spike_trains(self.threshes, 0)
+        assert_array_equal(without.to_dense(), dense.values)
+
+    def test_layout(self):
+        trains = self.trains
+        self.assertEqual(trains.nchannels, self.spik.nchannels)
+        self.assertEqual(trains.counts.sum(), trains.nspikes)
+
+        for k in range(trains.nchannels):
+            assert np.all(np.diff(trains[k]) > 0)
+
+    def test_bin(self):
+        cleared = self.spik.threshold(self.threshes).clear_refrac(self.ms)
+
+        for binsize in ('10L', '7L', 'S', '7S'):
+            binned = self.trains.bin(binsize)
+            expected = cleared.bin(binsize)
+            assert_array_equal(binned.index.asi8, expected.index.asi8)
+            assert_array_equal(binned.values, expected.values)
+
+        assert_array_equal(binned.sum().values, self.trains.counts.values)
+
+    def test_bin_no_start(self):
+        trains = self.trains
+        trains = SpikeTrains(trains.indices, trains.indptr, trains.nsamples,
+                             trains.fs, trains.columns)
+        binned = trains.bin('10L')
+        width = 0.01 * trains.fs
+        dense = trains.to_dense()
+        bins = (np.arange(dense.shape[0]) / width).astype(int)
+        assert_array_equal(binned.index, np.arange(binned.shape[0]))
+
+        for k in range(trains.nchannels):
+            expected = np.bincount(bins, weights=dense[:, k],
+                                   minlength=binned.shape[0])
+            assert_array_equal(binned.values[:, k], expected)
+
+        assert_array_equal(trains.bin_multi(['10L'])['10L'].values,
+                           binned.values)
+
+    def test_bin_multi(self):
+        binsizes = '10L', '7L', 'S', 0.0125
+        binned = self.trains.bin_multi(binsizes)
+        self.assertEqual(list(binned.keys()), list(binsizes))
+
+        for binsize in binsizes:
+            expected = self.trains.bin(binsize)
+            assert_array_equal(binned[binsize].index, expected.index)
+            assert_array_equal(binned[binsize].values, expected.values)
+
+    def test_xcorr(self):
+        xc = self.trains.xcorr('10L', maxlags=5)
+        self.assertEqual(xc.shape, (11, self.trains.nchannels ** 2))
+
+    def test_jitter(self):
+        window = 0.005
+        width = int(round(window * self.trains.fs))
+        jittered = self.trains.jitter(window)
+        assert_array_equal(jittered.indptr, self.trains.indptr)
+
+        for k in range(self.trains.nchannels):
+            assert np.all(np.diff(jittered[k]) >= 0)
+            assert_array_equal(np.sort(jittered[k] // width),
+                               self.trains[k] // width)
+
+    def test_save_load(self):
+        fd, filename = tempfile.mkstemp(suffix='.npz')
+        os.close(fd)
+
+        try:
+            self.trains.save(filename)
+            loaded = SpikeTrains.load(filename)
+        finally:
+            os.remove(filename)
+
+        assert_array_equal(loaded.indices, self.trains.indices)
+        assert_array_equal(loaded.indptr, self.trains.indptr)
+        self.assertEqual(loaded.nsamples, self.trains.nsamples)
+        self.assertEqual(loaded.fs, self.trains.fs)
+        self.assert_(loaded.columns.equals(self.trains.columns))
+        self.assertEqual(loaded.start, self.trains.start)
@@ -1,9 +1,10 @@
 import os
+import shutil
+import tempfile
 import types
 import numbers
 import unittest
 import datetime
-import warnings
 import itertools
 
 import numpy as np
@@ -12,78 +13,515 @@ import pandas as pd
 from six.moves import zip
 import six
 
-from span.tdt.tank import (TdtTank, _python_read_tev_raw,
-                           _create_ns_datetime_index, _reshape_spikes,
-                           _raw_reader)
-from span.tdt import SpikeDataFrame
-from span.testing import slow, create_stsq
-from span.utils import OrderedDict
+from span.tdt.tank import (TdtTank, _scatter_reader, _block_destinations,
+                           _format_code, _tev_memmap, _block_view,
+                           _copy_blocks, _block_slots, _to_epoch_seconds,
+                           _parse_tsq, _summarize_tsq, _load_tsq_cache,
+                           _save_tsq_cache, _tsq_cache_name, _EventCache,
+                           _sample_dtype, _coalesce_blocks, _scan_tsq,
+                           _channel_slots)
+from span.tdt import SpikeDataFrame, tank as tdt_tank
+from span.testing import slow, create_tank
 from span import ElectrodeMap, NeuroNexusMap
 
 
-class TestReadTev(object):
+def test_to_epoch_seconds():
+    origin = 1.3e9
+    assert _to_epoch_seconds(None, origin, np.inf) == np.inf
+    assert _to_epoch_seconds(2.5, origin, None) == origin + 2.5
+    td = datetime.timedelta(seconds=3, microseconds=500000)
+    assert _to_epoch_seconds(td, origin, None) == origin + 3.5
+
+    now = datetime.datetime.fromtimestamp(origin)
+    np.testing.assert_allclose(_to_epoch_seconds(now, 0, None), origin)
+
+
+def test_event_cache():
+    frame = pd.DataFrame(np.zeros((10, 2)))
+    nbytes = frame.values.nbytes + frame.index.nbytes
+    cache = _EventCache(2 * nbytes)
+
+    assert cache.put('a', frame)
+    assert cache.put('b', frame)
+    assert cache.nbytes == 2 * nbytes
+    pd.util.testing.assert_frame_equal(cache.get('a'), frame)
+
+    # changing a frame handed out by the cache leaves the cache alone
+    cache.get('a').values[:] = 2
+    assert not cache.get('a').values.any()
+
+    # 'b' is the least recently used
+    cache.put('c', frame)
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+    assert cache.nbytes == 2 * nbytes
+
+    # too big to ever fit
+    assert not cache.put('d', pd.DataFrame(np.zeros((100, 2))))
+    assert 'd' not in cache
+    assert len(cache) == 2
+
+    disabled = _EventCache(0)
+    assert not disabled.put('a', frame)
+    assert disabled.get('a') is None
+
+    cache.clear()
+    assert not len(cache) and not cache.nbytes
+    assert cache.get('a') is None
+
+
+def test_sample_dtype():
+    assert _sample_dtype(np.float32, np.float64, None) == np.float64
+    assert _sample_dtype(np.float32, None, None) == np.float32
+    assert _sample_dtype(np.int16, None, None) == np.int16
+    assert _sample_dtype(np.int16, None, 1e-6) == np.float32
+    assert _sample_dtype(np.float32, None, 1e-6) == np.float32
+    assert _sample_dtype(np.int16, np.float64, 1e-6) == np.float64
+    assert _sample_dtype(np.int16, None, None, True) == np.float32
+    assert _sample_dtype(np.int16, None, None, 'streaming') == np.float32
+    assert _sample_dtype(np.float64, None, None, True) == np.float64
+
+
+class TestMemmapReader(unittest.TestCase):
     def setUp(self):
-        span_data_path = os.environ['SPAN_DATA_PATH']
-        assert os.path.isdir(span_data_path)
-        self.filename = os.path.join(span_data_path,
-                                     'Spont_Spikes_091210_p17rat_s4_657umV')
+        self.elec_map = ElectrodeMap(NeuroNexusMap.values, 50, 125)
+        self.nchannels = self.elec_map.nchannel
+        self.block_size = 8
+        self.nslots = 5
+
+        nblocks = self.nslots * self.nchannels
+        self.channel = np.tile(np.arange(self.nchannels), self.nslots)
+        self.data = np.random.randn(nblocks,
+                                    self.block_size).astype(np.float32)
+
+        # a 40 byte header before each block, like a TEV file
+        header = 40
+        stride = header + self.data[0].nbytes
+        self.fp_loc = header + stride * np.arange(nblocks)
+
+        fd, self.filename = tempfile.mkstemp(suffix='.tev')
+        raw = np.zeros(stride * nblocks, dtype=np.uint8)
+
+        for loc, block in zip(self.fp_loc, self.data):
+            raw[loc:loc + block.nbytes] = block.view(np.uint8)
 
-        self.tank = TdtTank(self.filename, ElectrodeMap(NeuroNexusMap.values,
-                                                        50, 125))
-        self.names = 'Spik', 'LFPs', 'Tick'
+        with os.fdopen(fd, 'wb') as f:
+            f.write(raw.tostring())
 
     def tearDown(self):
-        del self.names, self.tank, self.filename
+        os.remove(self.filename)
+
+    def test_block_view(self):
+        tev = _tev_memmap(self.filename)
+        blocks = _block_view(tev, self.fp_loc, self.block_size, np.float32)
+        np.testing.assert_array_equal(blocks, self.data)
+
+        # irregular layout falls back to a copy
+        perm = np.random.permutation(self.fp_loc.size)
+        blocks = _block_view(tev, self.fp_loc[perm], self.block_size,
+                             np.float32)
+        np.testing.assert_array_equal(blocks, self.data[perm])
+
+    def test_block_slots(self):
+        slots = _block_slots(self.channel)
+        expected = np.repeat(np.arange(self.nslots), self.nchannels)
+        np.testing.assert_array_equal(slots, expected)
+
+    def _expected(self, chans, dtype=np.float32):
+        # the samples of each channel, block after block
+        data = self.data.view(dtype)
+        return np.column_stack([data[self.channel == chan].ravel()
+                                for chan in chans])
+
+    def _copy(self, chans, out, shuffle=False):
+        keep, cols, slots = _block_destinations(self.channel, chans,
+                                                self.nslots)
+        fp_locs = self.fp_loc[keep]
+        inds = np.random.permutation(fp_locs.size) if shuffle else slice(None)
+        _copy_blocks(_tev_memmap(self.filename), fp_locs[inds], cols[inds],
+                     slots[inds], self.block_size, np.float32, out)
+
+    def test_copy_blocks(self):
+        # a subset of channels leaves gaps of different sizes between blocks
+        for chans in (self.elec_map.channel,
+                      self.elec_map.channel[self.elec_map.select(shanks=1)]):
+            expected = self._expected(chans)
+
+            for shuffle in (False, True):
+                out = np.empty_like(expected)
+                self._copy(chans, out, shuffle)
+                np.testing.assert_array_equal(out, expected)
+
+    def test_copy_blocks_partial(self):
+        chans = self.elec_map.channel
+        expected = self._expected(chans)
+        nsamples = expected.shape[0]
+        out = np.zeros((nsamples + 3, chans.size))
+        self._copy(chans, out)
+        np.testing.assert_array_equal(out[:nsamples], expected)
+        assert not out[nsamples:].any()
+
+    def _read_scattered(self, block_size, dtype, out, **kwargs):
+        keep, cols, slots = _block_destinations(self.channel,
+                                                self.elec_map.channel,
+                                                self.nslots)
+        fp_locs = self.fp_loc[keep].astype(np.int64)
+        itemsize = np.dtype(dtype).itemsize
+
+        # shuffle to check that the blocks are put back in file order
+        perm = np.random.permutation(fp_locs.size)
+        fp_locs, cols, slots = fp_locs[perm], cols[perm], slots[perm]
+
+        order, runs = _coalesce_blocks(fp_locs, block_size * itemsize,
+                                       **kwargs)
+        _scatter_reader(self.filename, fp_locs[order], cols[order],
+                        slots[order], runs, block_size, _format_code(dtype),
+                        itemsize, out)
+
+    def test_coalesce_blocks(self):
+        num_bytes = self.data[0].nbytes
+        perm = np.random.permutation(self.fp_loc.size)
+        order, runs = _coalesce_blocks(self.fp_loc[perm], num_bytes)
+        np.testing.assert_array_equal(self.fp_loc[perm][order], self.fp_loc)
+        np.testing.assert_array_equal(runs, [0, self.fp_loc.size])
+
+        # the 40 byte headers are too big a gap
+        _, runs = _coalesce_blocks(self.fp_loc, num_bytes, max_gap=39)
+        np.testing.assert_array_equal(runs, np.arange(self.fp_loc.size + 1))
+
+        stride = self.fp_loc[1] - self.fp_loc[0]
+        _, runs = _coalesce_blocks(self.fp_loc, num_bytes,
+                                   max_run=3 * stride)
+        assert np.all(np.diff(runs) <= 3)
+        assert runs[0] == 0 and runs[-1] == self.fp_loc.size
+
+        # per block sizes, each block fills the gap after it
+        sizes = np.repeat(stride, self.fp_loc.size)
+        _, runs = _coalesce_blocks(self.fp_loc, sizes, max_gap=0)
+        np.testing.assert_array_equal(runs, [0, self.fp_loc.size])
+
+        order, runs = _coalesce_blocks([], num_bytes)
+        assert not order.size
+        np.testing.assert_array_equal(runs, [0])
+
+    def test_scatter_reader(self):
+        expected = self._expected(self.elec_map.channel)
+
+        kwargs = {}, dict(max_gap=0), dict(max_run=100)
+
+        for dtype, kw in itertools.product((np.float32, np.float64), kwargs):
+            out = np.empty(expected.shape, dtype=dtype)
+            self._read_scattered(self.block_size, np.float32, out, **kw)
+            np.testing.assert_array_equal(out, expected)
+
+    def test_scatter_reader_integer(self):
+        chans = self.elec_map.channel
+        block_size = 2 * self.block_size
+        expected = self._expected(chans, np.int16)
+        out = np.empty_like(expected)
+        self._read_scattered(block_size, np.int16, out)
+        np.testing.assert_array_equal(out, expected)
+
+    def test_channel_slots(self):
+        chans = self.elec_map.channel
+        self.assertEqual(_channel_slots(self.channel, chans), self.nslots)
+
+        # the channel with one block less bounds every channel
+        channel = self.channel[:-1]
+        self.assertEqual(_channel_slots(channel, chans), self.nslots - 1)
+
+        missing = channel != chans[0]
+        self.assertRaises(ValueError, _channel_slots, channel[missing], chans)
+        self.assertEqual(_channel_slots(channel[missing], chans[1:]),
+                         self.nslots - 1)
+
+
+class TestTsqCache(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        path = os.path.join(self.root, 'Spont_Spikes_p17rat_s4')
+        create_tank(path, nslots=8, block_size=16, nchannels=4,
+                    fs=24414.0625)
+        self.tsq_name = path + os.extsep + 'tsq'
 
-    def _reader_builder(self, reader):
-        for name in self.names:
-            tsq, _, _ = self.tank.tsq(name)
+    def tearDown(self):
+        shutil.rmtree(self.root)
 
-            with warnings.catch_warnings():
-                warnings.simplefilter('ignore', FutureWarning)
-                tsq.reset_index(drop=True, inplace=True)
+    def test_roundtrip(self):
+        self.assertIsNone(_load_tsq_cache(self.tsq_name))
 
-            fp_locs = tsq.fp_loc.astype(int)
+        tsq = _parse_tsq(self.tsq_name, TdtTank.dtype)
+        summary = _summarize_tsq(tsq)
+        _save_tsq_cache(self.tsq_name, tsq, summary)
 
-            assert np.issubdtype(fp_locs.dtype, np.integer)
+        cached_tsq, cached_summary = _load_tsq_cache(self.tsq_name)
+        pd.util.testing.assert_frame_equal(cached_tsq, tsq)
+        pd.util.testing.assert_series_equal(cached_summary['fs'],
+                                            summary['fs'])
+        pd.util.testing.assert_series_equal(cached_summary['names'],
+                                            summary['names'])
+        self.assertEqual(cached_summary['tstart'], summary['tstart'])
+        self.assertEqual(cached_summary['tend'], summary['tend'])
 
-            chunk_size = tsq.size.unique().max()
+    def test_stale(self):
+        tsq = _parse_tsq(self.tsq_name, TdtTank.dtype)
+        _save_tsq_cache(self.tsq_name, tsq, _summarize_tsq(tsq))
 
-            spikes = np.empty((tsq.shape[0], chunk_size), np.float32)
+        with open(self.tsq_name, 'ab') as f:
+            f.write(np.zeros(1, dtype=TdtTank.dtype).tostring())
 
-            reader(self.filename + os.extsep + 'tev', fp_locs, chunk_size,
-                   spikes)
+        self.assertIsNone(_load_tsq_cache(self.tsq_name))
 
-            # mean should be at least on the order of millivolts if not less
-            mag = np.log10(np.abs(spikes).mean())
-            assert mag <= -3.0
+    def test_cache_dir(self):
+        cache_dir = os.path.join(self.root, 'cache')
+        tsq = _parse_tsq(self.tsq_name, TdtTank.dtype)
+        _save_tsq_cache(self.tsq_name, tsq, _summarize_tsq(tsq), cache_dir)
+
+        cache_name = _tsq_cache_name(self.tsq_name, cache_dir)
+        self.assertEqual(os.path.dirname(cache_name), cache_dir)
+        assert os.path.exists(cache_name)
+        assert not os.path.exists(_tsq_cache_name(self.tsq_name))
+
+        cached_tsq, _ = _load_tsq_cache(self.tsq_name, cache_dir)
+        pd.util.testing.assert_frame_equal(cached_tsq, tsq)
+        self.assertIsNone(_load_tsq_cache(self.tsq_name))
+
+    def test_scan(self):
+        summary = _summarize_tsq(_parse_tsq(self.tsq_name, TdtTank.dtype))
+
+        for nrecords in (2, 5, 100):
+            scanned = _scan_tsq(self.tsq_name, TdtTank.dtype, nrecords)
+            pd.util.testing.assert_series_equal(scanned['fs'], summary['fs'])
+            pd.util.testing.assert_series_equal(scanned['names'],
+                                                summary['names'])
+            self.assertEqual(scanned['tstart'], summary['tstart'])
+            self.assertEqual(scanned['tend'], summary['tend'])
 
-    def test_read_tev(self):
-        for reader in {_python_read_tev_raw, _raw_reader}:
-            yield self._reader_builder, reader
 
+class TestSyntheticTank(unittest.TestCase):
+    dtype = np.float32
 
-def test_create_ns_datetime_index():
-    start, fs, nsamples = datetime.datetime.now().date(), 103.342, 10
-    index = _create_ns_datetime_index(start, fs, nsamples)
-    assert isinstance(index, pd.DatetimeIndex)
-    assert int(1e9 / fs) == index.freq.n
-    assert index.size == nsamples
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'Spont_Spikes_p17rat_s4')
+        self.elec_map = ElectrodeMap(NeuroNexusMap.values, 50, 125)
+        self.block_size = 8
+        self.stores = create_tank(self.path, block_size=self.block_size,
+                                  dtype=self.dtype, names=('Spik', 'LFPs'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _expected(self, columns=None, name='Spik'):
+        chans = self.elec_map.channel
+        data = self.stores[name]
 
+        if columns is not None:
+            chans = chans[columns]
 
-def test_reshape_spikes():
-    meta = create_stsq(size=64, samples_per_channel=17)
-    nblocks, block_size = meta.shape[0], meta.size[0]
-    df = pd.DataFrame(np.empty((nblocks, block_size)))
-    items = df.groupby(meta.channel.values).indices.items()
-    items.sort()
-    group_inds = np.column_stack(OrderedDict(items).itervalues())
-    nchannels = group_inds.shape[1]
-    nsamples = nblocks * block_size // nchannels
-    reshaped = _reshape_spikes(df.values, group_inds)
+        return np.column_stack([data[:, chan].ravel() for chan in chans])
 
-    a, b = reshaped.shape, (nsamples, nchannels)
-    assert a == b
+    def test_tsq(self):
+        tank = TdtTank(self.path, self.elec_map, dtype=None)
+        meta, dtype, block_size = tank.tsq('Spik')
+        self.assertEqual(dtype, self.dtype)
+        self.assertEqual(block_size, self.block_size)
+        nslots, nchannels, _ = self.stores['Spik'].shape
+        self.assertEqual(meta.shape[0], nslots * nchannels)
+
+    def test_read(self):
+        for mmap in (False, True):
+            tank = TdtTank(self.path, self.elec_map, mmap=mmap, dtype=None)
+            sp = tank.read('Spik')
+            self.assertEqual(sp.values.dtype, self.dtype)
+            np.testing.assert_array_equal(sp.values, self._expected())
+
+    def test_tsq_parsed_once(self):
+        calls = []
+        parse_tsq = tdt_tank._parse_tsq
+
+        def counting_parse_tsq(*args):
+            calls.append(args)
+            return parse_tsq(*args)
+
+        tdt_tank._parse_tsq = counting_parse_tsq
+
+        try:
+            tank = TdtTank(self.path, self.elec_map, cache=False, dtype=None)
+            tank.read('Spik')
+            tank.read_stores(['LFPs'])
+            self.assertEqual(len(calls), 1)
+
+            tank.invalidate()
+            tank.read('Spik')
+            self.assertEqual(len(calls), 2)
+        finally:
+            tdt_tank._parse_tsq = parse_tsq
+
+    def test_cache_opt_in(self):
+        tsq_name = self.path + os.extsep + 'tsq'
+        TdtTank(self.path, self.elec_map).read('Spik')
+        assert not os.path.exists(_tsq_cache_name(tsq_name))
+
+        cache_dir = os.path.join(self.root, 'cache')
+        TdtTank(self.path, self.elec_map, cache=cache_dir).read('Spik')
+        assert os.path.exists(_tsq_cache_name(tsq_name, cache_dir))
+        assert not os.path.exists(_tsq_cache_name(tsq_name))
+
+        TdtTank(self.path, self.elec_map, cache=True).read('Spik')
+        assert os.path.exists(_tsq_cache_name(tsq_name))
+
+    def test_clean_native_dtype(self):
+        # integer stores can't hold the NaNs that cleaning leaves
+        for mmap in (False, True):
+            tank = TdtTank(self.path, self.elec_map, mmap=mmap, dtype=None,
+                           clean='streaming')
+            sp = tank.read('Spik')
+            self.assertEqual(sp.values.dtype, np.float32)
+
+    def test_missing_channel(self):
+        path = os.path.join(self.root, 'Spont_Spikes_p18rat_s1')
+        create_tank(path, block_size=self.block_size, dtype=self.dtype,
+                    nchannels=15)
+
+        for mmap in (False, True):
+            tank = TdtTank(path, self.elec_map, mmap=mmap, dtype=None)
+            self.assertRaises(ValueError, tank.read, 'Spik')
+
+    def test_read_window(self):
+        fs = 1024.0
+        expected = self._expected()
+
+        # blocks are 8 samples long, so both bounds fall inside a block
+        for start, end in ((0.01, 0.03), (datetime.timedelta(seconds=0.01),
+                                          datetime.timedelta(seconds=0.03))):
+            for mmap in (False, True):
+                tank = TdtTank(self.path, self.elec_map, mmap=mmap,
+                               dtype=None)
+                sp = tank.read('Spik', start, end)
+                lo, hi = int(np.ceil(0.01 * fs)), int(np.ceil(0.03 * fs))
+                np.testing.assert_array_equal(sp.values, expected[lo:hi])
+
+        tank = TdtTank(self.path, self.elec_map, dtype=None)
+        np.testing.assert_array_equal(tank.read('Spik', end=0.01).values,
+                                      expected[:int(np.ceil(0.01 * fs))])
+        self.assertRaises(AssertionError, tank.read, 'Spik', 1.0)
+
+    def test_read_subset(self):
+        chans = self.elec_map.channel[[3, 5, 12]]
+        selections = (dict(shanks=1), dict(channels=chans),
+                      dict(channels=chans, shanks=0))
+
+        for mmap in (False, True):
+            tank = TdtTank(self.path, self.elec_map, mmap=mmap, dtype=None)
+
+            for selection in selections:
+                columns = self.elec_map.select(**selection)
+                sp = tank.read('Spik', **selection)
+                self.assertEqual(sp.nchannels, columns.size)
+                np.testing.assert_array_equal(sp.values,
+                                              self._expected(columns))
+
+        self.assertRaises(ValueError, tank.read, 'Spik', shanks=100)
+
+    def test_iter_chunks(self):
+        fs = 1024.0
+        expected = self._expected()
+        tank = TdtTank(self.path, self.elec_map, dtype=None)
+
+        chunks = list(tank.iter_chunks('Spik', 16 / fs))
+        self.assertEqual(len(chunks), 3)
+        np.testing.assert_array_equal(np.vstack([c.values for c in chunks]),
+                                      expected)
+
+        # the last chunks are cut short at the end of the event
+        chunks = list(tank.iter_chunks('Spik', 16 / fs, overlap=8 / fs,
+                                       shanks=2))
+        columns = self.elec_map.select(shanks=2)
+        self.assertEqual(len(chunks), 6)
+
+        for k, chunk in enumerate(chunks):
+            np.testing.assert_array_equal(
+                chunk.values, self._expected(columns)[8 * k:8 * k + 16])
+
+        self.assertRaises(ValueError, next,
+                          tank.iter_chunks('Spik', '10L', overlap='10L'))
+
+    def test_iter_chunks_index(self):
+        fs = 1024.0
+
+        for sample_index in (False, True):
+            tank = TdtTank(self.path, self.elec_map, dtype=None,
+                           sample_index=sample_index)
+            expected = tank.read('Spik')
+
+            # chunk edges fall inside blocks as well as on them
+            for length in (8 / fs, 12 / fs):
+                chunks = list(tank.iter_chunks('Spik', length))
+                self.assert_(pd.concat(chunks).index.equals(expected.index))
+
+    def test_metadata_only(self):
+        full = TdtTank(self.path, self.elec_map, cache=False, dtype=None)
+        tank = TdtTank(self.path, self.elec_map, cache=False, dtype=None,
+                       metadata_only=True)
+
+        for name in ('start', 'end', 'duration', 'age', 'site'):
+            self.assertEqual(getattr(tank, name), getattr(full, name))
+
+        pd.util.testing.assert_series_equal(tank.fs, full.fs)
+        self.assertEqual(sorted(tank.data_names), ['LFPs', 'Spik'])
+
+        # the TSQ file is read on demand
+        np.testing.assert_array_equal(tank.read('Spik').values,
+                                      self._expected())
+
+    def test_read_stores(self):
+        tank = TdtTank(self.path, self.elec_map, dtype=None)
+        events = tank.read_stores(['LFPs', 'Spik', 'LFPs'])
+        self.assertEqual(sorted(events), ['LFPs', 'Spik'])
+
+        for name, sp in events.items():
+            self.assertEqual(sp.values.dtype, self.dtype)
+            np.testing.assert_array_equal(sp.values,
+                                          self._expected(name=name))
+            pd.util.testing.assert_frame_equal(tank.read_stores([name])[name],
+                                               sp)
+
+    def test_event_cache_off_by_default(self):
+        tank = TdtTank(self.path, self.elec_map, dtype=None)
+        tank.spik
+        tank.read_stores(['LFPs'])
+        self.assertEqual(len(tank._event_cache), 0)
+
+    def test_cached_read_is_a_copy(self):
+        tank = TdtTank(self.path, self.elec_map, dtype=None,
+                       event_cache_bytes=None)
+        expected = self._expected()
+
+        for read in (lambda: tank.spik,
+                     lambda: tank.read_stores(['Spik'])['Spik']):
+            read().values[:] = 0
+            np.testing.assert_array_equal(read().values, expected)
+            read().values[:] = 0
+            np.testing.assert_array_equal(read().values, expected)
+
+    def test_sample_index(self):
+        timed = TdtTank(self.path, self.elec_map, dtype=None)
+        tank = TdtTank(self.path, self.elec_map, dtype=None,
+                       sample_index=True)
+
+        for window in ((), (0.01, 0.03)):
+            expected = timed.read('Spik', *window)
+            sp = tank.read('Spik', *window)
+            self.assertNotIsInstance(sp.index, pd.DatetimeIndex)
+            self.assertEqual(sp.index[-1] - sp.index[0], sp.nsamples - 1)
+            np.testing.assert_array_equal(sp.values, expected.values)
+            np.testing.assert_array_equal(sp.time_index.asi8,
+                                          expected.index.asi8)
+
+
+class TestInt16Tank(TestSyntheticTank):
+    dtype = np.int16
 
 
 class TestTdtTank(unittest.TestCase):
@@ -133,6 +571,81 @@ class TestTdtTank(unittest.TestCase):
             self.assertIsNotNone(tev)
             self.assertIsInstance(tev, SpikeDataFrame)
 
+    def test_read_window(self):
+        name = 'Spik'
+        fs = self.tank.fs[name]
+        window = self.tank.read(name, start=1, end=3)
+        self.assertIsInstance(window, SpikeDataFrame)
+        self.assertLessEqual(abs(window.nsamples - 2 * fs), 1)
+
+        sp = self.tank._tev(name, False)
+        i = np.searchsorted(sp.index.values, window.index.values[0])
+        np.testing.assert_array_equal(window.values,
+                                      sp.values[i:i + window.nsamples])
+
+    def test_read_shank(self):
+        em = self.tank.electrode_map
+        sp = self.tank.read('Spik', end=1)
+        shank = self.tank.read('Spik', end=1, shanks=2)
+        columns = em.index.take(em.select(shanks=2))
+        self.assert_(shank.columns.equals(columns))
+        np.testing.assert_array_equal(shank.values, sp[columns].values)
+
+    @slow
+    def test_iter_chunks(self):
+        sp = self.tank.read('Spik', end=10)
+        chunks = list(self.tank.iter_chunks('Spik', duration=1))
+        joined = pd.concat(chunks[:10])
+        self.assertEqual(joined.shape[1], sp.shape[1])
+        np.testing.assert_array_equal(joined.values, sp.values)
+        np.testing.assert_array_equal(joined.index.values, sp.index.values)
+
+        overlapping = self.tank.iter_chunks('Spik', duration=2, overlap=1)
+        first, second = next(overlapping), next(overlapping)
+        self.assert_(second.index[0] in first.index)
+        self.assertEqual(first.index[-1], second.index[first.nsamples -
+                                                     first.index.get_loc(
+                                                         second.index[0]) -
+                                                     1])
+
+        self.assertRaises(ValueError, next,
+                          self.tank.iter_chunks('Spik', duration=1, overlap=1))
+
+    def test_memoized(self):
+        self.assert_(self.tank.raw is self.tank.raw)
+        self.assert_(self.tank.tsq('Spik') is self.tank.tsq('Spik'))
+
+    def test_read_stores(self):
+        names = list(self.names)
+        tank = TdtTank(self.tank.path, self.tank.electrode_map)
+        events = tank.read_stores(names + names[:1], clean=False)
+        self.assertEqual(sorted(events), sorted(names))
+
+        for name in names:
+            expected = self.tank._read_tev(name, False)()
+            pd.util.testing.assert_frame_equal(events[name], expected)
+            pd.util.testing.assert_frame_equal(tank._tev(name, False),
+                                               events[name])
+
+    def test_sample_index(self):
+        tank = TdtTank(self.tank.path, self.tank.electrode_map,
+                       sample_index=True)
+        sp = tank.read('Spik', end=1)
+        expected = self.tank.read('Spik', end=1)
+        assert not isinstance(sp.index, pd.DatetimeIndex)
+        np.testing.assert_array_equal(sp.values, expected.values)
+        self.assertEqual(sp.fs, expected.fs)
+        np.testing.assert_array_equal(sp.time_index.asi8,
+                                      expected.index.asi8)
+
+    def test_metadata_only(self):
+        tank = TdtTank(self.tank.path, self.tank.electrode_map,
+                       metadata_only=True)
+        self.assertEqual(tank.start, self.tank.start)
+        self.assertEqual(tank.end, self.tank.end)
+        self.assertEqual(tank.duration, self.tank.duration)
+        pd.util.testing.assert_series_equal(tank.fs, self.tank.fs)
+
     def test_read_tsq(self):
         for name in self.names:
             tsq, _, _ = self.tank._get_tsq_event(name)()
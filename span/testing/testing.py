@@ -1,4 +1,5 @@
 import functools
+import os
 import warnings
 
 import numpy as np
@@ -17,7 +18,7 @@ import pandas as pd
 from numpy.random import uniform as randrange, randint
 
 import span
-from span.tdt import SpikeDataFrame
+from span.tdt import SpikeDataFrame, TdtTank, TdtDataTypes
 
 
 def assert_all_dtypes(df, dtype, msg='dtypes not all the same'):
@@ -75,6 +76,64 @@ def create_stsq(size=None, typ='stream', name=span.utils.name2num('Spik'),
     return d
 
 
+def create_tank(path, nslots=6, block_size=8, dtype=np.float32,
+                nchannels=16, fs=1024.0, names=('Spik',)):
+    """Write a TSQ and TEV pair of stream events whose blocks are
+    interleaved, one slot of each event after the other.
+
+    Parameters
+    ----------
+    path : str
+        The path to the tank sans extension.
+    nslots : int, optional
+        Number of blocks per channel of each event.
+    block_size : int, optional
+        Number of samples in a block.
+    dtype : dtype, optional
+        Sample type of the blocks.
+    nchannels : int, optional
+        Number of channels, numbered from 1 as in TDT files.
+    fs : float, optional
+        Sampling rate of every event.
+    names : sequence of str, optional
+        Names of the events.
+
+    Returns
+    -------
+    data : dict
+        ``(nslots, nchannels, block_size)`` array of the samples written,
+        per event name.
+    """
+    data = np.random.randn(nslots, len(names), nchannels, block_size) * 1000
+    data = data.astype(dtype)
+    nrows = data.size // block_size
+    num_bytes = data[0, 0, 0].nbytes
+
+    # sizes count words as wide as the size field, header included
+    word = TdtTank.dtype['size'].itemsize
+
+    raw = np.zeros(nrows, dtype=TdtTank.dtype)
+    raw['size'] = (TdtTank.dtype.itemsize + num_bytes) // word
+    raw['type'] = 0x8101
+    raw['name'] = np.tile(np.repeat([span.utils.name2num(name)
+                                     for name in names], nchannels), nslots)
+    raw['channel'] = np.tile(np.arange(1, nchannels + 1), nrows // nchannels)
+    raw['timestamp'] = 1.3e9 + np.repeat(np.arange(nslots) * block_size / fs,
+                                         nrows // nslots)
+    raw['fp_loc'] = num_bytes * np.arange(nrows)
+    raw['format'] = TdtDataTypes.index[(TdtDataTypes ==
+                                        np.dtype(dtype).name).values][0]
+    raw['fs'] = fs
+
+    with open(path + os.extsep + 'tsq', 'wb') as f:
+        f.write(raw.tostring())
+
+    with open(path + os.extsep + 'tev', 'wb') as f:
+        f.write(data.tostring())
+
+    return dict((name, data[:, i]) for i, name in enumerate(names))
+
+
 def create_elec_map(channels_per_shank, nshanks):
     nchannels = channels_per_shank * nshanks
     wthn = randint(20, 100)
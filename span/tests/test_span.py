@@ -0,0 +1,22 @@
+import importlib
+import unittest
+
+import span
+
+
+class TestLazyExports(unittest.TestCase):
+    def test_exports_match_subpackages(self):
+        for module_name, names in span._EXPORTS.items():
+            module = importlib.import_module(module_name)
+            self.assertEqual(sorted(set(names)), sorted(set(module.__all__)),
+                             '{0} exports differ'.format(module_name))
+
+    def test_exported_names(self):
+        for module_name, names in span._EXPORTS.items():
+            module = importlib.import_module(module_name)
+
+            for name in names:
+                self.assertIs(getattr(span, name), getattr(module, name))
+
+    def test_missing_name(self):
+        self.assertRaises(AttributeError, getattr, span, 'not_a_span_name')
@@ -21,14 +21,18 @@
 from span.utils.utils import (name2num, ndtuples, iscomplex,
                               get_fft_funcs, isvector,
                               assert_nonzero_existing_file,
-                              clear_refrac, ispower2, fromtimestamp,
+                              clear_refrac, bin_samples, bin_samples_multi,
+                              bin_spikes, bin_spikes_multi, ispower2,
+                              fromtimestamp,
                               create_repeating_multi_index, _diag_inds_n,
                               num2name, LOCAL_TZ, bold, randcolors,
                               blue, green, red, magenta, white, yellow, puts)
 from span.utils.ordereddict import OrderedDict
 from span.utils.math import (detrend_none, detrend_mean, detrend_linear,
                              cartesian, nextpow2, samples_per_ms, compose,
-                             compose2, composemap, remove_first_pc)
+                             compose2, composemap, remove_first_pc,
+                             remove_first_pc_streaming, first_pc_threshold,
+                             mask_first_pc)
 from span.utils.decorate import thunkify, cached_property
 
 __all__ = ('name2num', 'ndtuples', 'iscomplex', 'get_fft_funcs', 'isvector',
@@ -38,4 +42,7 @@ __all__ = ('name2num', 'ndtuples', 'iscomplex', 'get_fft_funcs', 'isvector',
            'compose', 'compose2', 'composemap', 'num2name',
            'create_repeating_multi_index', 'OrderedDict', '_diag_inds_n',
            'LOCAL_TZ', 'remove_first_pc', 'bold', 'randcolors', 'red',
-           'blue', 'green', 'magenta', 'white', 'yellow', 'puts')
+           'blue', 'green', 'magenta', 'white', 'yellow', 'puts',
+           'remove_first_pc_streaming', 'first_pc_threshold', 'mask_first_pc',
+           'bin_samples', 'bin_samples_multi', 'bin_spikes',
+           'bin_spikes_multi')
@@ -19,52 +19,135 @@
 
 
 cimport cython
-from numpy cimport (npy_intp as ip, uint8_t as u1, uint16_t as u2,
-                    uint32_t as u4, uint64_t as u8, int8_t as i1,
-                    int16_t as i2, int32_t as i4, int64_t as i8)
+from cython cimport floating
+from cython.parallel cimport prange, parallel
+from numpy cimport npy_intp as ip, uint8_t as u1, int64_t as i8
 
-ctypedef fused integral:
-    u1
-    u2
-    u4
-    u8
 
-    i1
-    i2
-    i4
-    i8
-
-    size_t
-    Py_ssize_t
-    bint
-
-    ip
+@cython.wraparound(False)
+@cython.boundscheck(False)
+cpdef int _clear_refrac(u1[:, :] a, ip[:] windows,
+                        i8[:] last) nogil except -1:
+    """Clear the refractory period of every channel of `a` in place.
+
+    A spike of channel ``c`` is kept if it comes more than ``windows[c]``
+    samples after the last kept spike of that channel, whose row is
+    ``last[c]``. It may be negative, i.e., in an earlier chunk of the
+    recording. `last` is updated so that a following chunk can carry on
+    where this one stops. Channels are processed in parallel.
+    """
+    cdef ip channel, i, nsamples = a.shape[0], nchannels = a.shape[1]
+
+    with nogil, parallel():
+        for channel in prange(nchannels, schedule='dynamic'):
+            for i in range(nsamples):
+                if a[i, channel]:
+                    if i > last[channel] + windows[channel]:
+                        last[channel] = i
+                    else:
+                        a[i, channel] = 0
+    return 0
 
 
 @cython.wraparound(False)
 @cython.boundscheck(False)
-cdef int _clear_refrac_impl(integral[:, :] a, ip window) nogil except -1:
-    cdef ip channel, i, sample, sp1, nsamples, nchannels
+cpdef int _clear_refrac_sparse(i8[:] indices, ip[:] indptr, ip window,
+                               u1[:] keep) nogil except -1:
+    """Mark the spikes that survive clearing the refractory period.
 
-    nsamples = a.shape[0]
-    nchannels = a.shape[1]
+    The spikes of channel ``k`` are the sorted sample numbers
+    ``indices[indptr[k]:indptr[k + 1]]``. A spike is kept if it comes more
+    than `window` samples after the last kept spike of its channel.
+    """
+    cdef ip channel, i, last
 
     with nogil:
-        for channel in range(nchannels):
-            sample = 0
+        for channel in range(indptr.shape[0] - 1):
+            last = -window - 1
 
-            while sample + window < nsamples:
+            for i in range(indptr[channel], indptr[channel + 1]):
+                keep[i] = indices[i] > last + window
+
+                if keep[i]:
+                    last = indices[i]
+    return 0
 
-                if a[sample, channel]:
-                    sp1 = sample + 1
-                    a[sp1:sp1 + window, channel] = False
-                    sample += window
 
-                sample += 1
+@cython.wraparound(False)
+@cython.boundscheck(False)
+cpdef int _threshold_clear_bin(floating[:, :] a, floating[:] threshes,
+                               bint below, ip window, double bin_width,
+                               double offset,
+                               i8[:, :] counts) nogil except -1:
+    """Threshold, clear the refractory period and bin in a single pass.
+
+    Sample ``i`` of channel ``c`` is a spike if it is above ``threshes[c]``,
+    or below it if `below` is true, and comes more than `window` samples
+    after the previous spike of that channel. It is counted in row
+    ``floor((i + offset) / bin_width)`` of `counts`, which must be zeroed.
+    """
+    cdef:
+        ip channel, i, last, nsamples = a.shape[0], nchannels = a.shape[1]
+        floating thresh, v
+        bint spike
+
+    with nogil, parallel():
+        for channel in prange(nchannels, schedule='dynamic'):
+            thresh = threshes[channel]
+            last = -window - 1
+
+            for i in range(nsamples):
+                v = a[i, channel]
+
+                if below:
+                    spike = v < thresh
+                else:
+                    spike = v > thresh
+
+                if spike and i > last + window:
+                    last = i
+                    counts[<ip> ((i + offset) / bin_width), channel] += 1
     return 0
 
 
 @cython.wraparound(False)
 @cython.boundscheck(False)
-cpdef int _clear_refrac(integral[:, :] a, ip window) nogil except -1:
-    return _clear_refrac_impl(a, window)
+cpdef int _threshold_clear_bin_multi(floating[:, :] a, floating[:, :] threshes,
+                                     ip[:, :] order, bint below, ip window,
+                                     double bin_width, double offset,
+                                     i8[:, :] last,
+                                     i8[:, :, :] counts) nogil except -1:
+    """Run :func:`_threshold_clear_bin` for several thresholds in one pass.
+
+    ``threshes[:, c]`` are the thresholds of channel ``c`` sorted from the
+    easiest to cross to the hardest, so that a sample that doesn't cross one
+    of them doesn't cross any of the following ones either. Every threshold
+    has its own refractory period, tracked in `last`. The spikes of
+    ``threshes[t, c]`` are counted in ``counts[order[t, c], :, c]``, which
+    must be zeroed.
+    """
+    cdef:
+        ip channel, i, t, b, nsamples = a.shape[0], nchannels = a.shape[1]
+        ip nthresh = threshes.shape[0]
+        floating v
+
+    with nogil, parallel():
+        for channel in prange(nchannels, schedule='dynamic'):
+            for t in range(nthresh):
+                last[t, channel] = -window - 1
+
+            for i in range(nsamples):
+                v = a[i, channel]
+
+                for t in range(nthresh):
+                    if below:
+                        if not v < threshes[t, channel]:
+                            break
+                    elif not v > threshes[t, channel]:
+                        break
+
+                    if i > last[t, channel] + window:
+                        last[t, channel] = i
+                        b = <ip> ((i + offset) / bin_width)
+                        counts[order[t, channel], b, channel] += 1
+    return 0
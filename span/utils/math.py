@@ -26,9 +26,8 @@ import functools as fntools
 
 import numpy as np
 from numpy import nan as NA
-from scipy.linalg import svd
 from pandas import Series, DataFrame, Panel, Panel4D
-from six.moves import map
+from six.moves import map, range
 
 
 def detrend_none(x):
@@ -245,8 +244,10 @@ def composemap(*args):
 
 
 def remove_first_pc(data, sc=2.0):
+    from scipy.linalg import svd
+
     v = svd(data, full_matrices=False, check_finite=False)[-1]
-    first_pc = v[:, 0]
+    first_pc = v[0]
 
     try:
         first_proj = data.values.dot(first_pc)
@@ -254,3 +255,159 @@ def remove_first_pc(data, sc=2.0):
         first_proj = data.dot(first_pc)
 
     data.ix[np.absolute(first_proj) > first_proj.std(ddof=1) * sc] = NA
+
+
+def _assert_floating(data):
+    """Raise unless every column of `data` can hold ``NaN``."""
+    dtypes = getattr(data, 'dtypes', None)
+
+    if dtypes is None or isinstance(dtypes, np.dtype):
+        dtypes = [data.dtype]
+
+    if any(np.dtype(dtype).kind not in 'fc' for dtype in dtypes):
+        raise TypeError('samples are set to NaN in place, which needs '
+                        'floating point data, convert it with '
+                        'astype(float) first')
+
+
+def _first_pc_moments(chunk):
+    chunk = np.asarray(chunk, dtype=np.float64)
+    chunk = chunk[~np.isnan(chunk).any(axis=1)]
+    return chunk.shape[0], chunk.sum(axis=0), chunk.T.dot(chunk)
+
+
+def first_pc_threshold(chunks, sc=2.0, nthreads=None):
+    """Compute the first principal component of data that arrive in chunks.
+
+    Only the channel by channel second moment matrix is kept around, so the
+    data need not fit in memory. Chunks are reduced by a pool of threads,
+    most of the work happens in BLAS, which doesn't hold the GIL. The pool
+    takes `nthreads` chunks at a time from `chunks`, so at most twice that
+    many are in memory at once.
+
+    Parameters
+    ----------
+    chunks : iterable of array_like
+        Blocks of rows of a ``(nsamples, nchannels)`` array, e.g., from
+        :meth:`span.tdt.TdtTank.iter_chunks` without overlap and with
+        ``clean=False``, otherwise each chunk has already been cleaned on its
+        own. Rows containing ``NaN`` are ignored.
+    sc : float, optional
+        Number of standard deviations of the projection onto the first
+        principal component beyond which a sample is removed.
+    nthreads : int, optional
+        Defaults to the number of CPUs.
+
+    Returns
+    -------
+    first_pc : array_like
+        The first right singular vector of the data.
+    thresh : float
+        Samples whose projection onto `first_pc` exceeds `thresh` in
+        absolute value are removed by :func:`mask_first_pc`.
+    """
+    from multiprocessing import cpu_count
+    from multiprocessing.pool import ThreadPool
+
+    nthreads = nthreads or cpu_count()
+    pool = ThreadPool(nthreads)
+    chunks = iter(chunks)
+    n, colsum, gram = 0, 0.0, 0.0
+
+    # imap_unordered would pull every chunk off of the iterator up front
+    batches = iter(lambda: list(itools.islice(chunks, nthreads)), [])
+
+    try:
+        for batch in batches:
+            for chunk_n, chunk_sum, chunk_gram in pool.imap_unordered(
+                    _first_pc_moments, batch):
+                n += chunk_n
+                colsum = colsum + chunk_sum
+                gram = gram + chunk_gram
+    finally:
+        pool.close()
+        pool.join()
+
+    if n < 2:
+        raise ValueError('need at least 2 samples to compute the first '
+                         'principal component')
+
+    # the largest eigenvalue of X'X is the sum of the squared projections
+    w, v = np.linalg.eigh(gram)
+    first_pc = v[:, -1]
+    mean = colsum.dot(first_pc) / n
+    var = (w[-1] - n * mean ** 2) / (n - 1)
+    return first_pc, sc * np.sqrt(max(var, 0.0))
+
+
+def mask_first_pc(data, first_pc, thresh):
+    """Set the samples that load heavily on the first principal component to
+    ``NaN``, in place.
+
+    Parameters
+    ----------
+    data : array_like
+        A ``(nsamples, nchannels)`` floating point array or DataFrame, e.g.,
+        a chunk.
+    first_pc, thresh : array_like, float
+        The output of :func:`first_pc_threshold`.
+
+    Raises
+    ------
+    TypeError
+        If `data` has integer columns, which can't hold ``NaN``.
+
+    Returns
+    -------
+    data : array_like
+        The input.
+    """
+    _assert_floating(data)
+    values = getattr(data, 'values', data)
+    mask = np.absolute(values.dot(first_pc)) > thresh
+
+    try:
+        data.ix[mask] = NA
+    except AttributeError:
+        data[mask] = NA
+
+    return data
+
+
+def remove_first_pc_streaming(data, sc=2.0, chunksize=2 ** 16,
+                              nthreads=None):
+    """Remove the first principal component without a full SVD.
+
+    Gives the same result as :func:`remove_first_pc` up to floating point
+    error, but reads the data in two passes of `chunksize` rows.
+
+    Parameters
+    ----------
+    data : array_like
+        A ``(nsamples, nchannels)`` floating point array or DataFrame,
+        modified in place.
+    sc : float, optional
+    chunksize : int, optional
+    nthreads : int, optional
+
+    Raises
+    ------
+    TypeError
+        If `data` has integer columns, which can't hold ``NaN``.
+
+    See Also
+    --------
+    first_pc_threshold, mask_first_pc
+    """
+    _assert_floating(data)
+    values = getattr(data, 'values', data)
+    starts = range(0, values.shape[0], chunksize)
+    first_pc, thresh = first_pc_threshold((values[i:i + chunksize]
+                                           for i in starts), sc, nthreads)
+    mask = np.concatenate([np.absolute(values[i:i + chunksize].dot(first_pc))
+                           > thresh for i in starts])
+
+    try:
+        data.ix[mask] = NA
+    except AttributeError:
+        data[mask] = NA
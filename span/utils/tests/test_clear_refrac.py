@@ -32,3 +32,43 @@ class TestClearRefrac(unittest.TestCase):
         clear_refrac(cleared, self.window)
 
         self.assertFalse(np.array_equal(thr, cleared))
+
+    def test_bool(self):
+        thr = rand(100, 4) > 0.5
+        cleared = thr.copy()
+        clear_refrac(cleared, 3)
+        self.assertEqual(cleared.dtype, np.bool_)
+
+        for channel in cleared.T:
+            self.assertTrue(np.all(np.diff(np.flatnonzero(channel)) > 3))
+
+    def test_per_channel_window(self):
+        thr = rand(200, 4) > 0.5
+        windows = np.array([1, 2, 5, 9])
+        cleared = thr.copy()
+        clear_refrac(cleared, windows)
+
+        for k, window in enumerate(windows):
+            expected = thr[:, [k]].copy()
+            clear_refrac(expected, window)
+            np.testing.assert_array_equal(cleared[:, k], expected[:, 0])
+
+    def test_chunked(self):
+        thr = rand(1000, 4) > 0.7
+        windows = randint(1, 20, size=thr.shape[1])
+        whole = thr.copy()
+        clear_refrac(whole, windows)
+
+        chunked = thr.copy()
+        state = None
+
+        for start in range(0, thr.shape[0], 97):
+            state = clear_refrac(chunked[start:start + 97], windows, state)
+
+        np.testing.assert_array_equal(chunked, whole)
+
+    def test_bad_window(self):
+        thr = self.x > 0.5
+        self.assertRaises(AssertionError, clear_refrac, thr, 0)
+        self.assertRaises(AssertionError, clear_refrac, thr, 1.5)
+        self.assertRaises(AssertionError, clear_refrac, thr, [1, 2])
@@ -1,5 +1,6 @@
 from unittest import TestCase
 import itertools as itools
+import weakref
 
 import numpy as np
 from numpy.random import randn, randint
@@ -11,7 +12,8 @@ from span.utils import ndtuples
 from span.utils.math import (detrend_none, detrend_mean,
                              detrend_linear, cartesian, nextpow2,
                              samples_per_ms, compose, composemap, compose2,
-                             remove_first_pc)
+                             remove_first_pc, remove_first_pc_streaming,
+                             first_pc_threshold, mask_first_pc)
 
 from span.utils.tests.test_utils import rand_int_tuple
 from six.moves import map
@@ -235,3 +237,62 @@ class TestRemoveFirstPc(TestCase):
         x = self.x
         xhat = remove_first_pc(DataFrame(x))
         self.assertIsInstance(xhat, DataFrame)
+
+
+class TestRemoveFirstPcStreaming(TestCase):
+    def setUp(self):
+        # a strong common mode signal on every channel
+        self.x = randn(10000, 8) + 3 * randn(10000, 1)
+
+    def test_matches_svd(self):
+        x, y = self.x.copy(), self.x.copy()
+        remove_first_pc(DataFrame(x))
+        remove_first_pc_streaming(y, chunksize=999)
+        assert np.isnan(y).any()
+        assert_array_equal(np.isnan(x), np.isnan(y))
+
+    def test_chunks(self):
+        x = self.x
+        chunks = [x[i:i + 1000] for i in range(0, x.shape[0], 1000)]
+        first_pc, thresh = first_pc_threshold(iter(chunks), nthreads=2)
+        first_pc_all, thresh_all = first_pc_threshold([x], nthreads=1)
+        assert_allclose(np.abs(first_pc), np.abs(first_pc_all))
+        assert_allclose(thresh, thresh_all)
+
+        y = x.copy()
+        remove_first_pc_streaming(y)
+
+        for chunk in chunks:
+            mask_first_pc(chunk, first_pc, thresh)
+
+        assert_array_equal(np.isnan(np.vstack(chunks)), np.isnan(y))
+
+    def test_bounded_chunks(self):
+        nthreads, refs, alive = 2, [], []
+
+        def chunks():
+            for i in range(0, self.x.shape[0], 500):
+                chunk = self.x[i:i + 500].copy()
+                refs.append(weakref.ref(chunk))
+                alive.append(sum(ref() is not None for ref in refs))
+                yield chunk
+
+        first_pc_threshold(chunks(), nthreads=nthreads)
+        self.assertEqual(len(refs), 20)
+        self.assertLessEqual(max(alive), 2 * nthreads)
+
+    def test_too_few_samples(self):
+        self.assertRaises(ValueError, first_pc_threshold, [self.x[:1]])
+
+    def test_integer_data(self):
+        x = (100 * self.x).astype(np.int16)
+        first_pc, thresh = first_pc_threshold([x])
+
+        for data in (x, DataFrame(x), DataFrame({0: x[:, 0],
+                                                 1: self.x[:, 1]})):
+            self.assertRaises(TypeError, remove_first_pc_streaming, data)
+            self.assertRaises(TypeError, mask_first_pc, data, first_pc,
+                              thresh)
+
+        # nothing was changed before raising
+        assert_array_equal(x, (100 * self.x).astype(np.int16))
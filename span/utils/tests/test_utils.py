@@ -5,19 +5,24 @@ import types
 import unittest
 import copy
 import time
+import datetime
 
+import nose
 import numpy as np
 import six
 from numpy.random import randint, randn
-from pandas import Series, DataFrame
+from pandas import Series, DataFrame, DatetimeIndex
 from six.moves import zip, map
 
 from span.testing import assert_allclose, assert_array_equal
-from span.utils import (nextpow2, name2num, isvector,
+from span.utils import (nextpow2, name2num, num2name, isvector,
                         iscomplex, get_fft_funcs,
                         assert_nonzero_existing_file, LOCAL_TZ,
-                        ispower2)
-from span.utils.utils import _diag_inds_n, _get_local_tz
+                        ispower2, fromtimestamp, bin_samples,
+                        bin_samples_multi, bin_spikes, bin_spikes_multi,
+                        clear_refrac)
+from span.utils.utils import (_diag_inds_n, _get_local_tz,
+                              _create_ns_datetime_index, _to_seconds)
 
 
 def rand_int_tuple(high=5, n=10):
@@ -84,6 +89,112 @@ def test_name2num():
         assert mn <= num <= mx
 
 
+def test_num2name():
+    letters = string.ascii_letters
+    names = [''.join(random.sample(letters, 4)) for _ in xrange(10)]
+    nums = np.array(list(map(name2num, names)))
+
+    for name, num in zip(names, nums):
+        assert num2name(num) == name
+
+    assert_array_equal(num2name(nums), names)
+
+    # names are text, not bytes, on python 3
+    assert isinstance(num2name(nums[0]), str)
+    assert all(isinstance(name, str) for name in num2name(nums))
+    assert num2name(np.append(nums, 0))[-1] == ''
+
+    assert num2name(0) == ''
+    assert num2name(name2num('ab1c')) == ''
+    assert num2name(256 ** 4 + name2num('abcd')) == ''
+
+
+def test_fromtimestamp():
+    import pytz
+    ts = 1.3e9 + np.random.rand(10) * 1e7
+    ts[3] = np.nan
+
+    utc = fromtimestamp(ts, tz=pytz.utc)
+    assert utc.dtype == np.dtype('M8[ns]')
+    assert utc.view(np.int64)[3] == np.iinfo(np.int64).min
+
+    def assert_close_us(x, y):
+        diff = x.astype('M8[us]').view(np.int64) - y.view(np.int64)
+        assert np.abs(diff).max() <= 1
+
+    valid = np.isfinite(ts)
+    expected = np.array([datetime.datetime.utcfromtimestamp(t)
+                         for t in ts[valid]], dtype='M8[us]')
+    assert_close_us(utc[valid], expected)
+
+    tz = pytz.timezone('US/Eastern')
+    local = fromtimestamp(ts, tz)
+    expected = np.array([datetime.datetime.fromtimestamp(t, tz).replace(
+        tzinfo=None) for t in ts[valid]], dtype='M8[us]')
+    assert_close_us(local[valid], expected)
+
+    local = fromtimestamp(ts)
+    expected = np.array([datetime.datetime.fromtimestamp(t)
+                         for t in ts[valid]], dtype='M8[us]')
+    assert_close_us(local[valid], expected)
+
+
+class TestFromTimestampDst(unittest.TestCase):
+    def setUp(self):
+        if not hasattr(time, 'tzset'):
+            raise nose.SkipTest('cannot change the local time zone')
+
+        self.tz = os.environ.get('TZ')
+
+    def tearDown(self):
+        if self.tz is None:
+            del os.environ['TZ']
+        else:
+            os.environ['TZ'] = self.tz
+
+        time.tzset()
+
+    def _check(self, tz, ts):
+        os.environ['TZ'] = tz
+        time.tzset()
+
+        expected = np.array([datetime.datetime.fromtimestamp(t) for t in ts],
+                            dtype='M8[us]')
+        result = fromtimestamp(ts).astype('M8[us]')
+        assert_array_equal(result.view(np.int64), expected.view(np.int64))
+
+    def test_spring_forward(self):
+        # 2012-03-11 07:00 UTC, clocks jump from 2:00 EST to 3:00 EDT
+        ts = 1331449200 + np.arange(-7200, 7200, 421) + 0.25
+        self._check('US/Eastern', ts)
+
+    def test_fall_back(self):
+        # 2012-11-04 06:00 UTC, clocks fall back from 2:00 EDT to 1:00 EST
+        ts = 1352008800 + np.arange(-7200, 7200, 421) + 0.5
+        self._check('US/Eastern', ts)
+
+    def test_half_hour_offset(self):
+        # 2012-03-31 16:30 UTC, clocks fall back from 3:00 ACDT to 2:00 ACST
+        # in the middle of a whole UTC hour
+        ts = 1333211400 + np.arange(-7200, 7200, 97) + 0.125
+        self._check('Australia/Adelaide', ts)
+
+
+def test_create_ns_datetime_index():
+    start, fs, nsamples = datetime.datetime.now().date(), 103.342, 10
+    index = _create_ns_datetime_index(start, fs, nsamples)
+    assert isinstance(index, DatetimeIndex)
+    assert int(1e9 / fs) == index.freq.n
+    assert index.size == nsamples
+
+
+def test_to_seconds():
+    assert _to_seconds(2) == 2.0
+    assert _to_seconds('60s') == 60.0
+    assert _to_seconds('500L') == 0.5
+    assert _to_seconds(datetime.timedelta(minutes=1)) == 60.0
+
+
 class TestIsVector(unittest.TestCase):
     def setUp(self):
         self.matrix = np.random.randn(2, 3)
@@ -165,3 +276,124 @@ class TestGetLocalTz(unittest.TestCase):
         time.tzname = old_tzs
         self.assertIsInstance(_get_local_tz(),
                               (types.NoneType,) + six.string_types)
+
+
+class TestBinSamples(unittest.TestCase):
+    def setUp(self):
+        self.x = randn(1001, 3) > 0
+
+    def _expected(self, bin_width, offset):
+        bins = ((np.arange(self.x.shape[0]) + offset) /
+                bin_width).astype(int)
+        return np.column_stack([np.bincount(bins, weights=col)
+                                for col in self.x.T])
+
+    def test_bin_samples(self):
+        for bin_width, offset in ((10, 0), (7, 3), (24.4140625, 0),
+                                  (97.5, 13.25), (0.5, 0.25)):
+            sums = bin_samples(self.x, bin_width, offset)
+            self.assertEqual(sums.dtype, np.int64)
+            assert_array_equal(sums, self._expected(bin_width, offset))
+
+    def test_fractional_bin_width(self):
+        x = self.x[:11]
+        sums = bin_samples(x, 0.1)
+        self.assertEqual(sums.shape, (101, 3))
+        assert_array_equal(sums, bin_spikes(x.astype(float),
+                                            np.repeat(0.5, 3), 0, 0.1))
+        assert_array_equal(bin_samples_multi(x, [0.1])[0], sums)
+
+    def test_floats(self):
+        x = randn(100, 2)
+        assert_allclose(bin_samples(x, 10), x.reshape(10, 10, 2).sum(axis=1))
+
+    def test_bin_samples_multi(self):
+        bin_widths = 10, 7, 24.4140625, 0.5
+        offsets = 0, 3, 1.5, 0.25
+        sums = bin_samples_multi(self.x, bin_widths, offsets)
+        self.assertEqual(len(sums), len(bin_widths))
+
+        for total, bin_width, offset in zip(sums, bin_widths, offsets):
+            assert_array_equal(total, bin_samples(self.x, bin_width, offset))
+
+    def test_bad_args(self):
+        self.assertRaises(AssertionError, bin_samples, self.x, 0)
+        self.assertRaises(AssertionError, bin_samples, self.x[:, 0], 1)
+        self.assertRaises(AssertionError, bin_samples_multi, self.x, [1, 0])
+        self.assertRaises(AssertionError, bin_samples_multi, self.x, [1, 2],
+                          [0, 0, 0])
+
+
+class TestBinSpikes(unittest.TestCase):
+    def setUp(self):
+        self.window = 10
+        self.x = randn(20000, 5)
+
+    def _dense_counts(self, x, threshes, bin_width, offset):
+        thr = x < threshes if np.all(threshes < 0) else x > threshes
+        thr = thr.astype(np.uint8)
+        clear_refrac(thr, self.window)
+        bins = ((np.arange(x.shape[0]) + offset) / bin_width).astype(int)
+        return np.column_stack([np.bincount(bins, weights=col)
+                                for col in thr.T])
+
+    def test_bin_spikes(self):
+        for threshes, bin_width, offset in ((np.repeat(2.0, 5), 100, 0),
+                                            (-np.arange(1, 6.0), 97.5, 13.25)):
+            for dtype in (np.float32, np.float64):
+                x = self.x.astype(dtype)
+                counts = bin_spikes(x, threshes, self.window, bin_width,
+                                    offset)
+                expected = self._dense_counts(x, threshes, bin_width, offset)
+                assert_array_equal(counts, expected)
+
+    def test_fractional_bin_width(self):
+        # 10.0 // 0.1 == 99.0 but 10.0 / 0.1 == 100.0
+        x = self.x[:11]
+        threshes = np.repeat(0.0, 5)
+        counts = bin_spikes(x, threshes, self.window, 0.1)
+        self.assertEqual(counts.shape[0], 101)
+        assert_array_equal(counts, self._dense_counts(x, threshes, 0.1, 0))
+
+    def test_no_refractory_period(self):
+        counts = bin_spikes(self.x, np.repeat(1.0, 5), 0, 1)
+        assert_array_equal(counts, self.x > 1)
+
+    def test_bin_spikes_multi(self):
+        levels = np.linspace(3, 1, 5)
+
+        for sign in (1, -1):
+            threshes = sign * np.outer(levels, np.arange(1, 6.0) / 3)
+            counts = bin_spikes_multi(self.x, threshes, self.window, 97.5,
+                                      13.25)
+            self.assertEqual(counts.shape[0], levels.size)
+
+            for count, thresh in zip(counts, threshes):
+                assert_array_equal(count, bin_spikes(self.x, thresh,
+                                                     self.window, 97.5,
+                                                     13.25))
+
+    def test_bin_spikes_multi_fractional_bin_width(self):
+        x = self.x[:11]
+        threshes = np.outer([1.0, 0.0], np.ones(5))
+        counts = bin_spikes_multi(x, threshes, self.window, 0.1)
+        self.assertEqual(counts.shape, (2, 101, 5))
+
+        for count, thresh in zip(counts, threshes):
+            assert_array_equal(count, bin_spikes(x, thresh, self.window, 0.1))
+
+    def test_bin_spikes_multi_mixed_signs(self):
+        for threshes in (np.outer([1.0, -1.0], np.ones(5)),
+                         np.outer([0.0, -1.0], np.ones(5)),
+                         [[1.0, 1.0, -1.0, 1.0, 1.0]]):
+            self.assertRaises(ValueError, bin_spikes_multi, self.x, threshes,
+                              self.window, 1)
+
+    def test_bad_args(self):
+        self.assertRaises(AssertionError, bin_spikes, self.x, [1.0], 1, 1)
+        self.assertRaises(AssertionError, bin_spikes, self.x,
+                          np.ones(5), -1, 1)
+        self.assertRaises(AssertionError, bin_spikes, self.x,
+                          np.ones(5), 1, 0)
+        self.assertRaises(AssertionError, bin_spikes_multi, self.x,
+                          np.ones((2, 4)), 1, 1)
@@ -21,6 +21,8 @@
 
 
 """A collection of utility functions."""
+import calendar
+import datetime
 import functools
 import itertools
 import numbers
@@ -34,12 +36,16 @@ import warnings
 import numpy as np
 from numpy.random import rand
 from numpy.fft import fft, ifft, rfft, irfft
-from scipy.constants import golden_ratio
-from pandas import datetime, MultiIndex
+from pandas import DatetimeIndex, MultiIndex, tslib
+from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import Nano
+import six
 from six.moves import map
 import pytz
 
-from span.utils._clear_refrac import _clear_refrac as _clear_refrac_cython
+from span.utils._clear_refrac import (_clear_refrac as _clear_refrac_cython,
+                                      _threshold_clear_bin,
+                                      _threshold_clear_bin_multi)
 from span.utils.math import cartesian
 
 try:
@@ -53,7 +59,7 @@ else:
         return '{0}{1}{2}'.format(Style.BRIGHT, s, Style.RESET_ALL)
 
 
-fromtimestamp = np.vectorize(datetime.fromtimestamp)
+_GOLDEN_RATIO = (1.0 + np.sqrt(5.0)) / 2.0
 
 
 def hsv_to_rgb(h, s, v):
@@ -70,7 +76,7 @@ def hsv_to_rgb(h, s, v):
 def randcolor(h, s, v):
     if h is None:
         h = rand()
-    h += golden_ratio - 1
+    h += _GOLDEN_RATIO - 1
     h %= 1
     return hsv_to_rgb(h, s, v)
 
@@ -134,17 +140,43 @@ def name2num(name, base=256):
 
 _ORDS = list(map(ord, _LETTERS))
 _MAXLEN = 4
-_BIG_ORDS = cartesian(*([_ORDS] * _MAXLEN))
 
 
 def num2name(num, base=256, maxlen=_MAXLEN):
-    # if the number could not possibly be a name
-    if (num < _BIG_ORDS[0]).all():
-        return ''
+    """Convert TDT's numerical representation of an event name to a string.
 
-    rhs = base ** np.arange(maxlen)
-    out = _BIG_ORDS[_BIG_ORDS.dot(rhs) == num].ravel()
-    return ''.join(map(chr, out))
+    This is the inverse of :func:`name2num`.
+
+    Parameters
+    ----------
+    num : int or array_like
+        The number(s) to decode.
+
+    base : int, optional
+        The base used to encode the name.
+
+    maxlen : int, optional
+        The number of characters in a name.
+
+    Returns
+    -------
+    name : str or array_like
+        The decoded name, or the empty string if `num` is not made up of
+        exactly `maxlen` ASCII letters. An array of names is returned if `num`
+        is an array.
+    """
+    num = np.asarray(num, dtype=np.int64)
+
+    # least significant digit is the first character
+    digits = num[..., np.newaxis] // base ** np.arange(maxlen) % base
+    valid = np.in1d(digits, _ORDS).reshape(digits.shape).all(axis=-1)
+    valid &= num < base ** maxlen
+
+    chars = np.ascontiguousarray(digits, dtype=np.uint8)
+    names = chars.view('S%d' % maxlen)[..., 0].astype(np.str_)
+    names = np.where(valid, names, '')
+
+    return names.item() if not names.ndim else names
 
 
 def iscomplex(x):
@@ -211,30 +243,299 @@ def assert_nonzero_existing_file(f):
         '%s exists and is a file, but it has a size of 0' % f
 
 
-def clear_refrac(a, window):
-    """Clear the refractory period of a boolean array.
+def clear_refrac(a, window, state=None):
+    """Clear the refractory period of a boolean array in place.
+
+    A spike is kept if it comes more than `window` samples after the last
+    kept spike of its channel. Channels are processed in parallel.
 
     Parameters
     ----------
     a : array_like
-    window : npy_intp
-
-    Notes
-    -----
-    If ``a.dtype == np.bool_`` in Python then this function will not work
-    unless ``a.view(uint8)`` is passed.
+        ``(nsamples, nchannels)`` array of ``bool``, ``int8`` or ``uint8``.
+    window : int or array_like
+        Refractory period in samples, either the same for every channel or
+        one per channel.
+    state : array_like, optional
+        The `state` returned by the call on the previous chunk of the
+        recording, so that clearing a recording chunk by chunk gives the
+        same result as clearing it whole. Defaults to no spikes before `a`.
 
     Raises
     ------
     AssertionError
-    If `window` is less than or equal to 0
+        * If `a` isn't a 2D array of one byte integers or booleans
+        * If `window` is less than or equal to 0
+        * If `window` or `state` doesn't have one value per channel
+
+    Returns
+    -------
+    state : array_like
+        The position of the last kept spike of each channel relative to the
+        sample following `a`.
     """
     assert isinstance(a, np.ndarray), 'a must be a numpy array'
     assert a.dtype in (np.int8, np.uint8, np.bool_)
+    assert a.ndim == 2, 'a must be 2D'
+
+    nchannels = a.shape[1]
+
+    windows = np.asarray(window)
+    assert windows.dtype.kind in 'iu', '"window" must be an integer'
+    assert np.all(windows > 0), '"window" must be greater than 0'
+    assert windows.size in (1, nchannels), \
+        'need one window or one window per channel'
+    windows = np.resize(windows.astype(np.intp), nchannels)
+
+    if state is None:
+        last = -windows.astype(np.int64) - 1
+    else:
+        last = np.array(state, dtype=np.int64).ravel()
+        assert last.size == nchannels, 'need one state value per channel'
+
+    # bools are bytes, so this neither copies nor converts
+    _clear_refrac_cython(a.view(np.uint8), windows, last)
+    last -= a.shape[0]
+    return last
+
+
+def _nbins(nsamples, bin_width, offset=0.0):
+    """Number of bins that ``nsamples`` samples fall in, computed with the
+    same floating point arithmetic as the binning kernels so that the last
+    sample's bin is always in bounds.
+    """
+    if not nsamples:
+        return 0
+    return int((nsamples - 1 + float(offset)) / float(bin_width)) + 1
+
+
+def bin_spikes(a, threshes, window, bin_width, offset=0.0):
+    """Threshold, clear the refractory period and bin in one pass.
+
+    This computes the same counts as thresholding `a`, calling
+    :func:`clear_refrac` on the result and summing it in bins, without any
+    intermediate arrays. Channels are processed in parallel.
+
+    Parameters
+    ----------
+    a : array_like
+        ``(nsamples, nchannels)`` array of samples.
+    threshes : array_like
+        One threshold per channel. If they are all negative, samples below
+        them are spikes, otherwise samples above them are.
+    window : int
+        Refractory period in samples, 0 keeps every spike.
+    bin_width : float
+        Width of a bin in samples.
+    offset : float, optional
+        Position of sample 0 within its bin, in samples.
+
+    Raises
+    ------
+    AssertionError
+        * If `threshes` doesn't have one value per channel
+        * If `window` is negative or `bin_width` isn't positive
+
+    Returns
+    -------
+    counts : array_like
+        ``(nbins, nchannels)`` array of spike counts.
+    """
+    assert isinstance(a, np.ndarray) and a.ndim == 2, \
+        'a must be a 2D numpy array'
     assert isinstance(window, (numbers.Integral, np.integer)), \
         '"window" must be an integer'
-    assert window > 0, '"window" must be greater than 0'
-    _clear_refrac_cython(a.view(np.int8), window)
+    assert window >= 0, '"window" must be nonnegative'
+    assert bin_width > 0, '"bin_width" must be positive'
+
+    if a.dtype not in (np.float32, np.float64):
+        a = a.astype(np.float64)
+
+    threshes = np.asarray(threshes, dtype=a.dtype).ravel()
+    assert threshes.size == a.shape[1], 'need one threshold per channel'
+
+    nbins = _nbins(a.shape[0], bin_width, offset) if a.size else 0
+    counts = np.zeros((nbins, a.shape[1]), dtype=np.int64)
+    _threshold_clear_bin(a, threshes, np.all(threshes < 0), window,
+                         float(bin_width), float(offset), counts)
+    return counts
+
+
+def bin_spikes_multi(a, threshes, window, bin_width, offset=0.0):
+    """Threshold, clear the refractory period and bin at several thresholds
+    in one pass.
+
+    ``bin_spikes_multi(a, threshes, ...)[t]`` equals
+    ``bin_spikes(a, threshes[t], ...)``, but `a` is only read once, which
+    makes threshold sweeps about as fast as a single threshold.
+
+    Parameters
+    ----------
+    a : array_like
+        ``(nsamples, nchannels)`` array of samples.
+    threshes : array_like
+        ``(nthresh, nchannels)`` array with one row of thresholds per
+        threshold level. If they are all negative, samples below them are
+        spikes, otherwise samples above them are.
+    window : int
+        Refractory period in samples, 0 keeps every spike.
+    bin_width : float
+        Width of a bin in samples.
+    offset : float, optional
+        Position of sample 0 within its bin, in samples.
+
+    Raises
+    ------
+    AssertionError
+        * If `threshes` doesn't have one column per channel
+        * If `window` is negative or `bin_width` isn't positive
+    ValueError
+        If some of `threshes` are negative and others aren't.
+
+    Returns
+    -------
+    counts : array_like
+        ``(nthresh, nbins, nchannels)`` array of spike counts.
+    """
+    assert isinstance(a, np.ndarray) and a.ndim == 2, \
+        'a must be a 2D numpy array'
+    assert isinstance(window, (numbers.Integral, np.integer)), \
+        '"window" must be an integer'
+    assert window >= 0, '"window" must be nonnegative'
+    assert bin_width > 0, '"bin_width" must be positive'
+
+    if a.dtype not in (np.float32, np.float64):
+        a = a.astype(np.float64)
+
+    threshes = np.atleast_2d(np.asarray(threshes, dtype=a.dtype))
+    assert threshes.ndim == 2 and threshes.shape[1] == a.shape[1], \
+        'need one column of thresholds per channel'
+
+    below = bool(np.all(threshes < 0))
+
+    # the kernel compares every threshold in the same direction
+    if not below and np.any(threshes < 0):
+        raise ValueError('threshes must be all negative or all nonnegative')
+
+    # easiest to cross first, so that the kernel can stop at the first miss
+    order = np.argsort(-threshes if below else threshes, axis=0,
+                       kind='mergesort').astype(np.intp)
+    sorted_threshes = np.ascontiguousarray(
+        threshes[order, np.arange(threshes.shape[1])])
+
+    nthresh = threshes.shape[0]
+    nbins = _nbins(a.shape[0], bin_width, offset) if a.size else 0
+    counts = np.zeros((nthresh, nbins, a.shape[1]), dtype=np.int64)
+    last = np.empty((nthresh, a.shape[1]), dtype=np.int64)
+    _threshold_clear_bin_multi(a, sorted_threshes, order, below, window,
+                               float(bin_width), float(offset), last, counts)
+    return counts
+
+
+def _bin_starts(nsamples, bin_width, offset=0.0):
+    """Index of the first sample of each bin, where sample ``i`` is in bin
+    ``floor((i + offset) / bin_width)``.
+    """
+    k = np.arange(_nbins(nsamples, bin_width, offset))
+    starts = np.ceil(k * bin_width - offset).astype(np.int64)
+
+    # nudge the boundaries that rounding put on the wrong sample
+    starts[np.floor((starts + offset) / bin_width) < k] += 1
+    starts[np.floor((starts - 1 + offset) / bin_width) >= k] -= 1
+    return np.clip(starts, 0, nsamples)
+
+
+def bin_samples(a, bin_width, offset=0.0):
+    """Sum the rows of an array in bins of equal width.
+
+    Parameters
+    ----------
+    a : array_like
+        ``(nsamples, nchannels)`` array, e.g., of booleans marking spikes.
+    bin_width : float
+        Width of a bin in samples, need not be a whole number.
+    offset : float, optional
+        Position of sample 0 within its bin, in samples.
+
+    Raises
+    ------
+    AssertionError
+        If `bin_width` isn't positive
+
+    Returns
+    -------
+    sums : array_like
+        ``(nbins, nchannels)`` array, sample ``i`` is in row
+        ``floor((i + offset) / bin_width)``. Integers are summed as 64 bit
+        integers and booleans are counted.
+    """
+    assert isinstance(a, np.ndarray) and a.ndim == 2, \
+        'a must be a 2D numpy array'
+    assert bin_width > 0, '"bin_width" must be positive'
+
+    dtype = np.float64 if a.dtype.kind in 'fc' else np.int64
+    nsamples = a.shape[0]
+    starts = _bin_starts(nsamples, float(bin_width), float(offset))
+
+    if not starts.size:
+        return np.zeros((0, a.shape[1]), dtype=dtype)
+
+    # reduceat wants indices inside a and returns a[i] for empty bins
+    empty = np.diff(np.append(starts, nsamples)) == 0
+    sums = np.add.reduceat(a, np.minimum(starts, nsamples - 1), axis=0,
+                           dtype=dtype)
+    sums[empty] = 0
+    return sums
+
+
+def bin_samples_multi(a, bin_widths, offsets=0.0):
+    """Sum the rows of an array in bins of several widths at once.
+
+    Every width is computed by differencing a single cumulative sum of `a`
+    at its bin edges, so extra widths cost next to nothing.
+
+    Parameters
+    ----------
+    a : array_like
+        ``(nsamples, nchannels)`` array, e.g., of booleans marking spikes.
+    bin_widths : array_like
+        Widths of the bins in samples.
+    offsets : float or array_like, optional
+        Position of sample 0 within its bin for each width, as for
+        :func:`bin_samples`.
+
+    Raises
+    ------
+    AssertionError
+        * If any width isn't positive
+        * If there isn't one offset or one offset per width
+
+    Returns
+    -------
+    sums : list of array_like
+        The ``(nbins, nchannels)`` sums of each width, like
+        :func:`bin_samples` would compute them. Sums of floating point
+        numbers may differ from it by rounding.
+    """
+    assert isinstance(a, np.ndarray) and a.ndim == 2, \
+        'a must be a 2D numpy array'
+
+    bin_widths = np.asarray(bin_widths, dtype=float).ravel()
+    assert np.all(bin_widths > 0), '"bin_widths" must be positive'
+
+    offsets = np.asarray(offsets, dtype=float).ravel()
+    assert offsets.size in (1, bin_widths.size), \
+        'need one offset or one offset per bin width'
+    offsets = np.resize(offsets, bin_widths.size)
+
+    dtype = np.float64 if a.dtype.kind in 'fc' else np.int64
+    nsamples = a.shape[0]
+    cumsum = np.zeros((nsamples + 1, a.shape[1]), dtype=dtype)
+    np.cumsum(a, axis=0, dtype=dtype, out=cumsum[1:])
+
+    return [np.diff(cumsum[np.append(_bin_starts(nsamples, width, offset),
+                                     nsamples)], axis=0)
+            for width, offset in zip(bin_widths, offsets)]
 
 
 def ispower2(x):
@@ -326,3 +627,124 @@ def _get_local_tz():
 
 
 LOCAL_TZ = _get_local_tz()
+
+
+def _local_utc_offsets(secs, bucket=3600):
+    """Return the UTC offset of the local time zone at each time in `secs`.
+
+    The OS is asked for the offset at both ends of every `bucket` seconds
+    long interval that a time falls in, and only the times in an interval
+    during which the offset changes are looked up one by one.
+
+    Parameters
+    ----------
+    secs : array_like
+        Whole seconds since the epoch.
+    bucket : int, optional
+
+    Returns
+    -------
+    offsets : array_like
+        Seconds to add to `secs` to get local wall clock time.
+    """
+    def offset(t):
+        t = int(t)
+        return calendar.timegm(time.localtime(t)) - t
+
+    buckets, inverse = np.unique(secs // bucket, return_inverse=True)
+    first = np.array([offset(b * bucket) for b in buckets], dtype=np.int64)
+    last = np.array([offset(b * bucket + bucket - 1) for b in buckets],
+                    dtype=np.int64)
+
+    offsets = first[inverse]
+    changes = (first != last)[inverse]
+
+    if changes.any():
+        offsets[changes] = list(map(offset, secs[changes]))
+
+    return offsets
+
+
+def fromtimestamp(ts, tz=None):
+    """Convert seconds since the epoch to wall clock times.
+
+    This is a vectorized version of ``datetime.fromtimestamp``.
+
+    Parameters
+    ----------
+    ts : array_like
+        Seconds since the epoch. ``NaN`` values become ``NaT``.
+    tz : str or tzinfo, optional
+        The time zone of the wall clock. Defaults to the local time zone as
+        the OS sees it, daylight saving time included.
+
+    Returns
+    -------
+    dt : array_like
+        Naive ``datetime64[ns]`` times.
+    """
+    ts = np.asanyarray(ts, dtype=np.float64)
+    nat = np.isnan(ts)
+
+    # split off the whole seconds so that nanoseconds aren't lost to rounding
+    secs = np.floor(np.where(nat, 0.0, ts)).astype(np.int64)
+    ns = secs * 10 ** 9
+    ns += np.round((ts - secs) * 1e9).astype(np.int64)
+
+    if tz is None:
+        ns[~nat] += _local_utc_offsets(secs[~nat]) * 10 ** 9
+    else:
+        if isinstance(tz, six.string_types):
+            tz = pytz.timezone(tz)
+
+        ns[~nat] = tslib.tz_convert(ns[~nat], pytz.utc, tz)
+
+    ns[nat] = tslib.iNaT
+    return ns.view('M8[ns]')
+
+
+def _create_ns_datetime_index(start, fs, nsamples, name='datetime',
+                              offset=0):
+    """Create a DatetimeIndex in nanoseconds
+
+    Parameters
+    ----------
+    start : datetime
+        The time of sample 0.
+    fs : float
+    nsamples : int
+    name : str, optional
+    offset : int, optional
+        The sample number of the first element of the index.
+
+    returns
+    -------
+    index : DatetimeIndex
+    """
+    ns = int(1e9 / fs)
+    dtstart = np.datetime64(start)
+    samples = np.arange(offset, offset + nsamples)
+    dt = dtstart + samples * np.timedelta64(ns, 'ns')
+    freq = ns * Nano()
+    return DatetimeIndex(dt, freq=freq, name=name, tz=LOCAL_TZ)
+
+
+def _to_seconds(d):
+    """Convert a duration to seconds.
+
+    Parameters
+    ----------
+    d : str, number or timedelta
+        Strings are pandas offset aliases, e.g., ``'60s'`` or ``'500L'``.
+
+    Returns
+    -------
+    secs : float
+    """
+    if isinstance(d, (numbers.Real, np.number)):
+        return float(d)
+
+    if isinstance(d, (datetime.timedelta, np.timedelta64)):
+        return np.timedelta64(d, 'ns').astype(np.int64) / 1e9
+
+    return to_offset(d).nanos / 1e9
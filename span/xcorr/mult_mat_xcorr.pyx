@@ -36,16 +36,23 @@ ctypedef fused floating:
 
 @cython.wraparound(False)
 @cython.boundscheck(False)
-cpdef int _mult_mat_xcorr_parallel(floating[:, :] X, floating[:, :] Xc,
-                                   floating[:, :] c, ip n,
-                                   ip nx) nogil except -1:
-
-    cdef ip i, r, j, k
+cpdef int _mult_mat_xcorr_upper_parallel(floating[:, :] X, floating[:, :] Xc,
+                                         floating[:, :] c, ip n, ip nx,
+                                         bint diagonal) nogil except -1:
+    """Multiply the spectra of the column pairs ``i <= j``, or ``i < j`` if
+    `diagonal` is false, stored row after row of the upper triangle.
+    """
+    cdef ip i, j, k, row, first
 
     # guided < dynamic < runtime < static
     with nogil, parallel():
         for i in prange(n, schedule='guided'):
-            for r, j in enumerate(range(i * n, (i + 1) * n)):
+            first = i if diagonal else i + 1
+
+            # number of pairs in the rows of the triangle above row i
+            row = i * n - i * (i - 1) // 2 - (0 if diagonal else i)
+
+            for j in range(first, n):
                 for k in range(nx):
-                    c[j, k] = X[i, k] * Xc[r, k]
+                    c[row + j - first, k] = X[i, k] * Xc[j, k]
     return 0
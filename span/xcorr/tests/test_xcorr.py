@@ -12,9 +12,7 @@ from pandas import DataFrame, Series, MultiIndex
 
 from six.moves import map
 
-from span.xcorr.xcorr import (xcorr, _mult_mat_xcorr,
-                              _mult_mat_xcorr_cython_parallel,
-                              _mult_mat_xcorr_python,
+from span.xcorr.xcorr import (xcorr, _mult_mat_xcorr_upper, _pair_inds,
                               create_repeating_multi_index)
 from span.utils import (nextpow2, get_fft_funcs, detrend_mean, detrend_none,
                         detrend_linear, cartesian)
@@ -120,6 +118,47 @@ class TestXCorr(object):
         assert_allclose(np_lag0.ravel(), sp_lag0.ix[0])
         assert_allclose(pd_lag0.values.ravel(), sp_lag0.ix[0])
 
+    def test_lags(self):
+        inputs = (self.x,), (self.matrix,), (self.xsame, self.ysame)
+        scale_types = None, 'unbiased', 'normalize'
+
+        for inp, scale_type in itertools.product(inputs, scale_types):
+            kwargs = dict(detrend=detrend_mean, scale_type=scale_type)
+            full = xcorr(*inp, **kwargs)
+            lsize = max(map(len, inp))
+
+            for lags in ([0], [-1, 0, 2], list(range(1 - lsize, lsize))):
+                xc = xcorr(*inp, lags=lags, **kwargs)
+                assert_allclose(xc, full[np.asarray(lags) + lsize - 1])
+
+        xc = xcorr(DataFrame(self.matrix), lags=[0])
+        assert_array_equal(xc.index, [0])
+
+        assert_raises(AssertionError, xcorr, self.x, maxlags=1, lags=[0])
+        assert_raises(AssertionError, xcorr, self.x, lags=[self.m])
+
+    def test_pairs(self):
+        x = randn(20, 4)
+        df = DataFrame(x)
+
+        for scale_type in (None, 'unbiased', 'normalize'):
+            full = xcorr(df, detrend=detrend_mean, scale_type=scale_type)
+
+            for pairs, k in (('upper', 0), ('strict_upper', 1)):
+                i, j = np.triu_indices(x.shape[1], k)
+                xc = xcorr(df, detrend=detrend_mean, scale_type=scale_type,
+                           pairs=pairs)
+                assert_allclose(xc, full.values[:, i * x.shape[1] + j])
+                assert_array_equal(xc.columns,
+                                   full.columns.take(i * x.shape[1] + j))
+
+                lag0 = xcorr(x, detrend=detrend_mean, scale_type=scale_type,
+                             pairs=pairs, lags=[0])
+                assert_allclose(lag0, xc.ix[[0]])
+
+        assert_raises(AssertionError, xcorr, x, pairs='lower')
+        assert_raises(AssertionError, xcorr, self.x, pairs='upper')
+
     def test_xcorr(self):
         scale_types = None, 'biased', 'unbiased', 'normalize', 'none'
         maxlags = 1, 2, 100000
@@ -150,24 +189,19 @@ class TestMultMatXcorr(unittest.TestCase):
         m, n = x.shape
         ifft, fft = get_fft_funcs(x)
         nfft = int(2 ** nextpow2(m))
-        X = fft(x.T, nfft)
-        Xc = X.conj()
-        self.n, nx = X.shape
-        self.c = np.empty((n ** 2, nx), X.dtype)
-        self.ground_truth = self.c.copy()
-
-        self.X, self.Xc = X, Xc
-        _mult_mat_xcorr_python(X, Xc, self.ground_truth, n)
+        self.X = fft(x.T, nfft)
+        self.Xc = self.X.conj()
+        self.n = n
 
     def tearDown(self):
-        del self.ground_truth, self.X, self.Xc, self.c, self.n
-
-    def test_mult_mat_xcorrs(self):
-        _mult_mat_xcorr_cython_parallel(self.X, self.Xc, self.c, self.n)
-        assert_allclose(self.c, self.ground_truth)
-
-    def test_mult_mat_xcorr_high_level(self):
-        assert_allclose(_mult_mat_xcorr(self.X, self.Xc), self.ground_truth)
+        del self.X, self.Xc, self.n
+
+    def test_mult_mat_xcorr_upper(self):
+        for diagonal in (True, False):
+            i, j = _pair_inds(self.n, 'upper' if diagonal else 'strict_upper')
+            expected = self.X[i] * self.Xc[j]
+            assert_allclose(_mult_mat_xcorr_upper(self.X, self.Xc, diagonal),
+                            expected)
 
 
 class TestCreateRepeatingMultiIndex(unittest.TestCase):
@@ -21,71 +21,61 @@
 
 import numpy as np
 from pandas import Series, DataFrame
-from six.moves import xrange
 
 
 from span.utils import get_fft_funcs, isvector, nextpow2, compose
-from span.utils import create_repeating_multi_index, _diag_inds_n
-from span.xcorr._mult_mat_xcorr import _mult_mat_xcorr_parallel
+from span.utils import create_repeating_multi_index
+from span.xcorr._mult_mat_xcorr import _mult_mat_xcorr_upper_parallel
 
 
-def _mult_mat_xcorr_cython_parallel(X, Xc, c, n):
-    """Perform the necessary matrix-vector multiplication and fill the cross-
-    correlation array. Slightly faster than pure Python.
+def _mult_mat_xcorr_upper(X, Xc, diagonal=True):
+    """Perform the matrix-vector multiplications of the upper triangle of
+    column pairs only.
 
     Parameters
     ----------
-    X, Xc, c : c16[:, :]
-    n : ip
+    X, Xc : c16[:, :]
+    diagonal : bool, optional
+        Whether to include the pairs of a column with itself.
 
-    Raises
-    ------
-    AssertionError
-       If n <= 0 or nx <= 0
+    Returns
+    -------
+    c : c16[:, :]
+        One row per pair ``(i, j)``, ordered like ``np.triu_indices``.
     """
-    nx = c.shape[1]
-    _mult_mat_xcorr_parallel(X, Xc, c, n, nx)
-
+    assert X is not None, '1st argument "X" must not be None'
+    assert Xc is not None, '2nd argument "Xc" must not be None'
 
-def _mult_mat_xcorr_python(X, Xc, c, n):
-    """Perform the necessary matrix-vector multiplication and fill the cross-
-    correlation array. Slightly slower than cython.
+    n, nx = X.shape
+    npairs = n * (n + 1) // 2 if diagonal else n * (n - 1) // 2
+    c = np.empty((npairs, nx), dtype=X.dtype)
+    _mult_mat_xcorr_upper_parallel(X, Xc, c, n, nx, diagonal)
+    return c
 
-    Parameters
-    ----------
-    X, Xc, c : c16[:, :]
-    n : ip
 
-    Raises
-    ------
-    AssertionError
-       If n <= 0 or nx <= 0
-    """
-    for i in xrange(n):
-        c[i * n:(i + 1) * n] = X[i] * Xc
+_PAIRS = 'all', 'upper', 'strict_upper'
 
 
-def _mult_mat_xcorr(X, Xc):
-    """Perform the necessary matrix-vector multiplication and fill the cross-
-    correlation array. Slightly faster than pure Python.
+def _pair_inds(n, pairs='all'):
+    """The column pairs ``(i, j)`` of a matrix cross correlation.
 
     Parameters
     ----------
-    X, Xc, c : c16[:, :]
-    n : ip
+    n : int
+        Number of columns.
 
-    Raises
-    ------
-    AssertionError
-       If n <= 0 or nx <= 0
+    pairs : {'all', 'upper', 'strict_upper'}, optional
+        Every ordered pair, the pairs with ``i <= j`` or those with
+        ``i < j``.
+
+    Returns
+    -------
+    i, j : array_like
     """
-    assert X is not None, '1st argument "X" must not be None'
-    assert Xc is not None, '2nd argument "Xc" must not be None'
+    if pairs == 'all':
+        return np.divmod(np.arange(n * n), n)
 
-    n, nx = X.shape
-    c = np.empty((n * n, nx), dtype=X.dtype)
-    _mult_mat_xcorr_cython_parallel(X, Xc, c, n)
-    return c
+    return np.triu_indices(n, int(pairs == 'strict_upper'))
 
 
 def _autocorr(x, nfft):
@@ -130,9 +120,12 @@ def _crosscorr(x, y, nfft):
     return ifft(fft(x, nfft) * fft(y, nfft).conj(), nfft)
 
 
-def _matrixcorr(x, nfft):
+def _matrixcorr(x, nfft, lags, pairs='all'):
     """Cross-correlation of the columns of a matrix.
 
+    Only the pairs of columns ``(i, j)`` with ``i <= j`` are transformed.
+    The other half, if asked for, is the time reverse of these.
+
     Parameters
     ----------
     x : array_like
@@ -143,20 +136,92 @@ def _matrixcorr(x, nfft):
         The number of points used to compute the FFT (faster when this number
         is a power of 2).
 
+    lags : array_like
+        The lags to return.
+
+    pairs : {'all', 'upper', 'strict_upper'}, optional
+        Which pairs of columns to return, see :func:`_pair_inds`.
+
     Returns
     -------
     c : array_like
-        The cross correlation of the columns `x`.
+        The cross correlation of the columns `x`, a row per lag and a column
+        per pair.
     """
     _, n = x.shape
     ifft, fft = get_fft_funcs(x)
     X = fft(x.T, nfft)
     Xc = X.conj()
-    c = _mult_mat_xcorr(X, Xc)
-    return ifft(c, nfft).T
+    c = ifft(_mult_mat_xcorr_upper(X, Xc, pairs != 'strict_upper'), nfft).T
+
+    if pairs != 'all':
+        return c.take(lags, axis=0)
+
+    # xcorr(j, i) at lag k is the conjugate of xcorr(i, j) at lag -k
+    i, j = _pair_inds(n)
+    lo, hi = np.minimum(i, j), np.maximum(i, j)
+    src = lo * n - lo * (lo - 1) // 2 + hi - lo
+    lower = i > j
 
+    out = c.take(lags, axis=0).take(src, axis=1)
+    out[:, lower] = c.take(-lags, axis=0).take(src[lower], axis=1).conj()
+    return out
 
-def _unbiased(c, x, y, lags, lsize):
+
+def _directcorr(x, y=None, lags=None):
+    """Cross-correlation at a few lags, computed as dot products.
+
+    Parameters
+    ----------
+    x : array_like
+        A vector or a matrix whose columns are correlated with each other.
+
+    y : array_like, optional
+        A vector to correlate with the vector `x`.
+
+    lags : array_like
+        The lags at which to compute the cross correlation.
+
+    Returns
+    -------
+    c : array_like
+        One row per lag, laid out like the corresponding rows of the FFT
+        based functions.
+    """
+    x = np.asarray(x)
+    vector = x.ndim == 1
+    x = x.reshape(x.shape[0], -1)
+    y = x if y is None else np.asarray(y).reshape(-1, 1)
+
+    # zero pad to a common length like the FFT does
+    n = max(x.shape[0], y.shape[0])
+
+    if x.shape[0] < n:
+        x = np.vstack((x, np.zeros((n - x.shape[0], x.shape[1]), x.dtype)))
+    if y.shape[0] < n:
+        y = np.vstack((y, np.zeros((n - y.shape[0], y.shape[1]), y.dtype)))
+
+    yc = y.conj()
+    c = np.empty((len(lags), x.shape[1] * y.shape[1]),
+                 dtype=np.result_type(x, y))
+
+    for row, lag in enumerate(lags):
+        if lag >= 0:
+            c[row] = np.dot(x[lag:].T, yc[:n - lag]).ravel()
+        else:
+            c[row] = np.dot(x[:n + lag].T, yc[-lag:]).ravel()
+
+    return c[:, 0] if vector else c
+
+
+def _use_direct(nlags, lsize):
+    """Whether `nlags` dot products of length `lsize` are cheaper than the
+    FFTs of the whole cross correlation.
+    """
+    return nlags <= nextpow2(2 * lsize - 1)
+
+
+def _unbiased(c, x, y, lags, lsize, pairs='all'):
     r"""Compute an unbiased estimate of `c`.
 
     This function returns `c` scaled by the number of data points
@@ -193,7 +258,7 @@ def _unbiased(c, x, y, lags, lsize):
     return c / denom
 
 
-def _biased(c, x, y, lags, lsize):
+def _biased(c, x, y, lags, lsize, pairs='all'):
     """Compute a biased estimate of `c`.
 
     Parameters
@@ -229,7 +294,7 @@ def _biased(c, x, y, lags, lsize):
     return c / lsize
 
 
-def _normalize(c, x, y, lags, lsize):
+def _normalize(c, x, y, lags, lsize, pairs='all'):
     """Normalize `c` by the lag 0 cross correlation
 
     Parameters
@@ -246,6 +311,10 @@ def _normalize(c, x, y, lags, lsize):
         The size of the largest of the inputs to the cross correlation
         function
 
+    pairs : {'all', 'upper', 'strict_upper'}, optional
+        The column pairs whose cross correlations `c` holds, see
+        :func:`_pair_inds`.
+
     Raises
     ------
     AssertionError
@@ -277,17 +346,20 @@ def _normalize(c, x, y, lags, lsize):
             cdiv = np.sqrt(cdiv)
 
     else:  # matrix case
-        # locations of lag 0 in a flat arrangement
-        vals = c[lags.max(), _diag_inds_n(int(np.sqrt(c.shape[1])))]
+        # lag 0 of each column with itself, whichever lags were computed
+        vals = np.abs(np.asarray(x))
+        vals *= vals
+        vals = vals.sum(axis=0)
 
-        # scale by lag 0 of each column pair
+        # scale by lag 0 of each column pair, which may be a triangle only
         np.sqrt(vals, vals)
-        cdiv = np.outer(vals, vals).ravel()
+        i, j = _pair_inds(vals.size, pairs)
+        cdiv = vals[i] * vals[j]
 
     return c / cdiv
 
 
-def _none(c, x, y, lags, lsize):
+def _none(c, x, y, lags, lsize, pairs='all'):
     """Do nothing with the input and return `c`.
 
     Parameters
@@ -310,7 +382,8 @@ _SCALE_FUNCTIONS = {
 _SCALE_KEYS = tuple(_SCALE_FUNCTIONS.keys())
 
 
-def xcorr(x, y=None, maxlags=None, detrend=None, scale_type=None):
+def xcorr(x, y=None, maxlags=None, detrend=None, scale_type=None,
+          lags=None, pairs='all'):
     """Compute the cross correlation of `x` and `y`.
 
     This function computes the cross correlation of `x` and `y`. It uses the
@@ -343,6 +416,18 @@ def xcorr(x, y=None, maxlags=None, detrend=None, scale_type=None):
           the lag 0 cross correlation i.e., the cross correlation scaled by the
           product of the standard deviations of the arrays at lag 0.
 
+    lags : array_like, optional
+        The lags at which to compute the cross correlation, instead of every
+        lag up to `maxlags`. A few lags are computed directly as dot
+        products, skipping the FFT altogether.
+
+    pairs : {'all', 'upper', 'strict_upper'}, optional
+        Which pairs of columns ``(i, j)`` of a matrix to return: every one,
+        those with ``i <= j`` or those with ``i < j``. The rest follow by
+        symmetry, so only the upper triangle is ever transformed, but
+        ``'all'`` rebuilds the lower one, which doubles the memory of the
+        result and of everything done with it afterwards.
+
     Raises
     ------
     AssertionError
@@ -354,6 +439,9 @@ def xcorr(x, y=None, maxlags=None, detrend=None, scale_type=None):
         * If `scale_type` is not in ``(None, 'none', 'unbiased', 'biased',
           'normalize')``
         * If `maxlags` ``>`` `lsize`, see source for details.
+        * If both `maxlags` and `lags` are given or any of `lags` is not
+          less than `lsize` in absolute value.
+        * If `pairs` is invalid or isn't ``'all'`` for vectors
 
     Returns
     -------
@@ -369,6 +457,7 @@ def xcorr(x, y=None, maxlags=None, detrend=None, scale_type=None):
         '"scale_type" must be a string or None'
     assert scale_type in _SCALE_KEYS, ('"scale_type" must be one of '
                                        '{0}'.format(_SCALE_KEYS))
+    assert pairs in _PAIRS, '"pairs" must be one of {0}'.format(_PAIRS)
 
     if detrend is None:
         detrend = lambda x: x
@@ -380,6 +469,7 @@ def xcorr(x, y=None, maxlags=None, detrend=None, scale_type=None):
         lsize = x.shape[0]
         inputs = x,
         corrfunc = _matrixcorr
+        ncols = x.shape[1]
     elif (y is None or y is x or np.array_equal(x, y) or
           (x.shape == y.shape and np.allclose(x, y))):
         assert isvector(x), 'x must be 1D'
@@ -392,20 +482,46 @@ def xcorr(x, y=None, maxlags=None, detrend=None, scale_type=None):
         inputs = x, y
         corrfunc = _crosscorr
 
-    nfft = 2 ** nextpow2(2 * lsize - 1)
-    ctmp = corrfunc(*inputs, nfft=nfft)
+    if corrfunc is not _matrixcorr:
+        assert pairs == 'all', 'pairs other than "all" need a matrix'
 
-    if maxlags is None:
-        maxlags = lsize
+    if lags is None:
+        if maxlags is None:
+            maxlags = lsize
 
-    assert maxlags <= lsize, ('max lags must be less than or equal to %i'
-                              % lsize)
-    lags = np.r_[1 - maxlags:maxlags]
+        assert maxlags <= lsize, ('max lags must be less than or equal to %i'
+                                  % lsize)
+        lags = np.r_[1 - maxlags:maxlags]
+        direct = False
+    else:
+        assert maxlags is None, 'pass either "maxlags" or "lags", not both'
+        lags = np.atleast_1d(np.asarray(lags, dtype=int))
+        assert np.all(np.abs(lags) < lsize), ('lags must be less than %i in '
+                                              'absolute value' % lsize)
+        direct = _use_direct(lags.size, lsize)
+
+    if direct:
+        ctmp = _directcorr(*inputs, lags=lags)
+
+        if pairs != 'all':
+            i, j = _pair_inds(ncols, pairs)
+            ctmp = ctmp[:, i * ncols + j]
+    elif corrfunc is _matrixcorr:
+        nfft = 2 ** nextpow2(2 * lsize - 1)
+        ctmp = _matrixcorr(x, nfft, lags, pairs)
+    else:
+        nfft = 2 ** nextpow2(2 * lsize - 1)
+        ctmp = corrfunc(*inputs, nfft=nfft).take(lags, axis=0)
 
     if isinstance(x, Series):
         return_type = lambda y: Series(y, lags)
     elif isinstance(x, DataFrame):
         columns = create_repeating_multi_index(x.columns)
+
+        if pairs != 'all':
+            i, j = _pair_inds(ncols, pairs)
+            columns = columns.take(i * ncols + j)
+
         return_type = lambda y: DataFrame(y, lags, columns)
     elif isinstance(x, np.ndarray):
         return_type = lambda x: np.asanyarray(x)
@@ -413,7 +529,7 @@ def xcorr(x, y=None, maxlags=None, detrend=None, scale_type=None):
     scale_function = _SCALE_FUNCTIONS[scale_type]
     ret_func = compose(return_type, scale_function)
 
-    return ret_func(ctmp.take(lags, axis=0), x, y, lags, lsize)
+    return ret_func(ctmp, x, y, lags, lsize, pairs)
 
 
 if __name__ == '__main__':